@@ -28,6 +28,8 @@
 
 """
 from mnoptical.topo.linear_params import LinearTopology
+from mnoptical.export import ColumnarExporter
+import numpy as np
 import itertools
 import time
 
@@ -72,7 +74,7 @@ def launch_transmission(net):
     tx = net.name_to_node['tx']
     tx.turn_on()
 
-def monitor(net, test_no, c, logdata):
+def monitor(net, test_no, c, exporter):
     power_level_dBm = c[0]
     fibre_length_km = c[1]
     span_no = c[2]
@@ -80,52 +82,34 @@ def monitor(net, test_no, c, logdata):
     signal_no = c[4]
 
     rx = net.name_to_node['rx']
-    optical_signals = rx.monitor.get_optical_signals()
-    power_dict = rx.monitor.get_dict_power()
-    ase_noise_dict = rx.monitor.get_dict_ase_noise()
-    nli_noise_dict = rx.monitor.get_dict_nli_noise()
-    osnr_noise_dict = rx.monitor.get_dict_osnr()
-    gosnr_noise_dict = rx.monitor.get_dict_gosnr()
-
-    if logdata:
-        log_data(test_no, power_level_dBm, fibre_length_km,
-                 span_no, hop_no, signal_no, optical_signals,
-                 power_dict, ase_noise_dict, nli_noise_dict,
-                 osnr_noise_dict, gosnr_noise_dict)
-
-def log_data(test_no, power_level_dBm, fibre_length_km,
-             span_no, hop_no, signal_no, optical_signals,
-             power_dict, ase_noise_dict, nli_noise_dict,
-             osnr_noise_dict, gosnr_noise_dict):
+    table = rx.monitor.snapshot()
+
+    if exporter:
+        log_data(exporter, test_no, power_level_dBm, fibre_length_km,
+                 span_no, hop_no, signal_no, table)
+
+def log_data(exporter, test_no, power_level_dBm, fibre_length_km,
+             span_no, hop_no, signal_no, table):
     """
-    Write data to mo_test.csv
+    Append one row per signal to the mo_tests.csv exporter
+    :param exporter: ColumnarExporter
+    :param table: Monitor.snapshot() at the receiver
     """
-    if test_no == 1:
-        rows = [
-            "test no,frequency,launch power,fibre length,spans,hops,signal no,power,ASE noise,NLI noise,OSNR,GSNR\n"
-        ]
-    else:
-        rows = []
-    for optical_signal in optical_signals:
-        row = str(test_no) + ',' +\
-              str(optical_signal.frequency) + ',' +\
-              str(power_level_dBm) + ',' +\
-              str(fibre_length_km) + ',' +\
-              str(span_no) + ',' +\
-              str(hop_no) + ',' +\
-              str(signal_no) + ',' +\
-              str(power_dict[optical_signal]) + ',' + \
-              str(ase_noise_dict[optical_signal]) + ',' + \
-              str(nli_noise_dict[optical_signal]) + ',' + \
-              str(osnr_noise_dict[optical_signal]) + ',' + \
-              str(gosnr_noise_dict[optical_signal]) + '\n'
-        rows.append(row)
-    with open('mo_tests.csv', 'a') as mo_tests:
-        mo_tests.writelines(rows)
-
-
-
-def mnoptical_test(test_no, c, logdata=False):
+    exporter.append({'frequency': table['frequency'],
+                     'launch power': np.full(len(table), power_level_dBm),
+                     'fibre length': np.full(len(table), fibre_length_km),
+                     'spans': np.full(len(table), span_no),
+                     'hops': np.full(len(table), hop_no),
+                     'signal no': np.full(len(table), signal_no),
+                     'power': table['power'],
+                     'ASE noise': table['ase_noise'],
+                     'NLI noise': table['nli_noise'],
+                     'OSNR': table['osnr'],
+                     'GSNR': table['gosnr']},
+                    **{'test no': test_no})
+
+
+def mnoptical_test(test_no, c, exporter=None):
     """
     create Mininet-Optical model
     execute Mininet-Optical test
@@ -133,6 +117,7 @@ def mnoptical_test(test_no, c, logdata=False):
     :param test_no: int, test number
     :param c: tuple, (power_level_dBm, fibre_length_km,
                         span_no, hop_no, signal_no)
+    :param exporter: ColumnarExporter to log the results to
     :return:
     """
     # create Network object
@@ -148,7 +133,7 @@ def mnoptical_test(test_no, c, logdata=False):
     launch_transmission(net)
 
     # monitor and log
-    monitor(net, test_no, c, logdata)
+    monitor(net, test_no, c, exporter)
 
     del net
 
@@ -166,10 +151,12 @@ if __name__ == '__main__':
                                      fibre_lengths_km,
                                      span_no, hop_no, signal_no)
     start_time = time.time()
-    for test_no, combination in enumerate(combinations, start=1):
-        # remove or comment this if-clause to run the 14400 tests.
-        if test_no > 2:
-            break
-        # execute Mininet-Optical tests
-        mnoptical_test(test_no, combination, logdata=True)
+    # rows are written out in bounded chunks as the tests run
+    with ColumnarExporter('mo_tests.csv') as exporter:
+        for test_no, combination in enumerate(combinations, start=1):
+            # remove or comment this if-clause to run the 14400 tests.
+            if test_no > 2:
+                break
+            # execute Mininet-Optical tests
+            mnoptical_test(test_no, combination, exporter)
     print("It took %s seconds to run Mininet-Optical tests" % str(time.time() - start_time))
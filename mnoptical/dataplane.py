@@ -88,6 +88,16 @@ class OpticalNet( Mininet ):
            self.addMonitor( monitor )
         return switch
 
+    def monitorSweep( self ):
+        """Gather the per-channel metrics of all monitors into one
+           columnar table (see mnoptical.node.Monitor.sweep)"""
+        return PhyMonitor.sweep( [ monitor.model for monitor in self.monitors ] )
+
+    def restMonitorSweepHandler( self, query ):
+        "Support for REST monitor sweep: return table columns as lists"
+        table = self.monitorSweep()
+        return { field: table[ field ].tolist() for field in table.dtype.names }
+
     # Demo/debugging: support for setgain command
 
     def restSetrippleHandler( self, query ):
@@ -98,84 +108,59 @@ class OpticalNet( Mininet ):
         return 'OK'
 
     def set_ripple(self, amp_name, ripple):
-        srcdst = amp_name.split('-')
-        if len(srcdst) < 2:
-            print(srcdst)
-            print("couldn't find src-dst in %s" % amp_name)
-            return
-        src, dst = srcdst[0:2]
-        links = self.linksBetween(*self.get(src, dst))
-        # Find amp
-        l, amp = None, None
-        for link in links:
-            if not isinstance(link, OpticalLink):
-                continue
-            for phyLink in link.phyLink1, link.phyLink2:
-                if phyLink.boost_amp.name == amp_name:
-                    l, amp = phyLink, phyLink.boost_amp
-                    break
-                for span, spanamp in phyLink.spans:
-                    if spanamp and spanamp.name == amp_name:
-                        l, amp = phyLink, spanamp
-                        break
+        amp, _roadm = self.findAmplifier( amp_name )
         if not amp:
             return '%s not found' % amp_name
         # Set ripple function (wavelength dependent gain)
         amp.set_ripple_function(ripple)
 
-    def restSetgainHandler( self, query ):
-        "Demo/debugging: Support for REST setgain call"
-        ampName = query.amplifier
-        gain = query.gain
-        print( "**************", ampName, gain )
-        return self.setgainCmd( ampName, float( gain ) )
-
-    def setgainCmd( self, ampName, gain ):
-        "Demo/debugging: Support for demo CLI setgain command"
-        # FIXME: This is ugly and also doesn't seem to work.
-        # The amplifier gain is updated but the signals
-        # don't seem to be updating properly.
-        # Translated from mnoptical.network.mock_amp_gain_adjust()
+    def findAmplifier( self, ampName ):
+        """Find an amplifier model by name: in-line and boost
+           amplifiers of optical links, or ROADM preamps and boosts
+           returns: amplifier, owning ROADM model (or None)"""
+        for switch in self.switches:
+            model = getattr( switch, 'model', None )
+            if isinstance( model, PhyROADM ):
+                for amp in model.preamp, model.boost:
+                    if amp and amp.name == ampName:
+                        return amp, model
         srcdst = ampName.split( '-' )
-        if len( srcdst ) < 2:
-            return "couldn't find src-dst in %s" % ampName
+        if len( srcdst ) < 2 or srcdst[ 0 ] not in self or srcdst[ 1 ] not in self:
+            return None, None
         src, dst = srcdst[0:2]
-        links = self.linksBetween( *self.get(src, dst ) )
-        # Find amp
-        l, amp = None, None
-        for link in links:
+        for link in self.linksBetween( *self.get( src, dst ) ):
             if not isinstance( link, OpticalLink ):
                 continue
             for phyLink in link.phyLink1, link.phyLink2:
-                if phyLink.boost_amp.name == ampName:
-                    l, amp = phyLink, phyLink.boost_amp
-                    break
-                for span, spanamp in phyLink.spans:
+                if phyLink.boost_amp and phyLink.boost_amp.name == ampName:
+                    return phyLink.boost_amp, None
+                for _span, spanamp in phyLink.spans:
                     if spanamp and spanamp.name == ampName:
-                        l, amp = phyLink, spanamp
-                        break
+                        return spanamp, None
+        return None, None
+
+    def restSetgainHandler( self, query ):
+        "Support for REST setgain call: /setgain?amplifier=name&gain=dB"
+        ampName = query.amplifier
+        gain = query.gain
+        return self.setgainCmd( ampName, float( gain ) )
+
+    def setgainCmd( self, ampName, gain ):
+        """Set the gain of an amplifier and recompute the signals
+           it carries from there on (see PhyAmplifier.set_gain)
+           returns: 'old->new' amplifier description"""
+        amp, roadm = self.findAmplifier( ampName )
         if not amp:
             return '%s not found' % ampName
         oldAmp = str( amp )
-        src_roadm, dst_roadm = phyLink.node1, phyLink.node2
-        # Set gain
-        amp.mock_amp_gain_adjust( float( gain ) )
-        newAmp = str( amp )
-        # Reset the signal-propagation structures along the link
-        l.reset_propagation_struct()
-        op = l.output_port_node1
-        # Pass only the signals corresponding to the output port
-        pass_through_signals = src_roadm.port_to_optical_signal_power_out[op].copy()
-        ase = src_roadm.port_to_optical_signal_ase_noise_out.get(op).copy()
-        nli = src_roadm.port_to_optical_signal_nli_noise_out.get(op).copy()
-        if ase is None or nli is None:
-            print( 'WARNING: noise values not found for port', op,
-                   'signal values will probably be incorrect!' )
-        print("*** Recomputing propagation out of %s" % src_roadm.name)
-        l.propagate(pass_through_signals, ase, nli)
-        result = oldAmp + '->' + newAmp
-        print("*** setgain end...", result)
-        return result
+        gain = float( gain )
+        if roadm and amp is roadm.preamp:
+            roadm.set_preamp_gain( gain, skip_unchanged=True )
+        elif roadm:
+            roadm.set_boost_gain( gain, skip_unchanged=True )
+        else:
+            amp.set_gain( gain, skip_unchanged=True )
+        return oldAmp + '->' + str( amp )
 
 Mininet = OpticalNet
 
@@ -208,15 +193,14 @@ class Monitor:
         if query.mode:
             mode = str(query.mode)
             monitor.modify_mode(mode=mode)
-        signals = monitor.get_optical_signals(port)
-        signals = sorted(signals, key=lambda s:s.index)
-        osnr = { signal.index:
-                 dict(freq=signal.frequency, osnr=monitor.get_osnr( signal ),
-                      gosnr=monitor.get_gosnr( signal ),
-                      power=monitor.get_power( signal ),
-                      ase=monitor.get_ase_noise( signal ),
-                      nli=monitor.get_nli_noise( signal ))
-                 for signal in signals }
+        table = monitor.snapshot( port )
+        columns = [ table[ field ].tolist() for field in
+                    ( 'channel', 'frequency', 'osnr', 'gosnr',
+                      'power', 'ase_noise', 'nli_noise' ) ]
+        osnr = { index: dict( freq=freq, osnr=osnr_, gosnr=gosnr,
+                              power=power, ase=ase, nli=nli )
+                 for index, freq, osnr_, gosnr, power, ase, nli
+                 in zip( *columns ) }
         return dict( osnr=osnr )
 
     def __str__( self ):
@@ -889,14 +873,12 @@ class CombSource(ROADM):
     def turn_on(self):
         "Configure components and turn on signals"
         lt, mux = self.lt, self.model
-        # Configure transceivers
-        for i, (channel, power) in enumerate(self.power.items(), start=1):
-            outport = i
-            tx = lt.transceivers[i-1]
-            lt.assoc_tx_to_channel(tx, channel, outport)
+        channels = list(self.power)
+        ports = list(range(1, len(channels) + 1))
+        for i, channel in zip(ports, channels):
             mux.install_switch_rule(self.ADD+i, self.LINEOUT, [channel])
-        # Start transmission
-        self.lt.turn_on()
+        # Configure transceivers and start transmission
+        lt.provision(lt.transceivers[:len(channels)], channels, out_ports=ports)
 
 
 ### Support functions
@@ -0,0 +1,169 @@
+"""
+equalization.py: per-channel power equalization with ROADM VOAs
+
+A ROADM attenuates each channel to its VOA target (see
+Roadm.set_reference_power). PowerEqualizer adjusts the targets of all
+the channels of one or more ROADM degrees (ROADM, output ports toward
+a neighbor) at once so that their powers, measured at the ROADM output or at a
+downstream monitor, match a target spectrum:
+
+    equalizer = PowerEqualizer.from_path(net, ['lt_1', 'r1', 'r2', 'r3', 'lt_3'],
+                                         target_dBm=0)
+    result = equalizer.run()
+    print(result.iterations, result.errors_dB)
+
+Each iteration measures the power errors of all degrees, corrects all
+the VOA targets in one vectorized step, and applies the new targets as
+one transaction (see transaction.py), i.e., as one propagation event
+that re-propagates the line terminals whose signals reach the
+equalized ROADMs (once per terminal, not once per degree).
+Iterations continue until the largest error is within tolerance, since
+downstream effects (amplifier ripple and power excursions, fiber SRS)
+couple the channels.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from mnoptical.units import abs_to_db
+
+
+# One equalized ROADM degree; monitor is the Monitor
+# measuring it (None: output state of the ROADM)
+Degree = namedtuple('Degree', 'roadm out_ports monitor')
+
+EqualizationResult = namedtuple('EqualizationResult', 'converged iterations errors_dB')
+
+
+class PowerEqualizer(object):
+    "Equalize the channel powers of ROADM degrees with their VOAs"
+
+    def __init__(self, net, degrees, target_dBm=None, tolerance_dB=0.01,
+                 max_iterations=10, step=1.0):
+        """
+        :param net: Network object
+        :param degrees: list of (roadm, out_ports) or (roadm,
+                        out_ports, monitor) tuples, upstream degrees
+                        first; out_ports is an output port or a list
+                        of them (e.g., drop ports), nodes and monitors
+                        may be given by name
+        :param target_dBm: target power of all channels, or dict of
+                           channel to target power (dBm); default:
+                           flatten each degree at its mean power
+        :param tolerance_dB: float, largest acceptable error
+        :param max_iterations: int, maximum number of corrections
+        :param step: float, fraction of the error corrected per
+                     iteration (damping)
+        """
+        monitors = {monitor.name: monitor for monitor in net.monitors()}
+        self.net = net
+        self.degrees = []
+        for degree in degrees:
+            roadm, out_ports = net.find_node(degree[0]), degree[1]
+            out_ports = tuple(np.atleast_1d(out_ports).tolist())
+            monitor = degree[2] if len(degree) > 2 else None
+            if isinstance(monitor, str):
+                if monitor not in monitors:
+                    raise ValueError("PowerEqualizer: unknown monitor %s" % monitor)
+                monitor = monitors[monitor]
+            for out_port in out_ports:
+                if out_port not in roadm.port_to_node_out:
+                    raise ValueError("PowerEqualizer: %s has no output port %s" % (roadm, out_port))
+            self.degrees.append(Degree(roadm, out_ports, monitor))
+        self.target_dBm = target_dBm
+        self.tolerance_dB = tolerance_dB
+        self.max_iterations = max_iterations
+        self.step = step
+
+    @classmethod
+    def from_path(cls, net, path, monitors=None, **params):
+        """
+        Equalize the ROADM degrees along a path
+        :param net: Network object
+        :param path: list of nodes (or names) from source to destination
+        :param monitors: dict of ROADM name to monitor measuring its degree
+        :param params: further PowerEqualizer options
+        """
+        path = [net.find_node(node) for node in path]
+        monitors = monitors or {}
+        degrees = []
+        for node, next_node in zip(path, path[1:]):
+            if node not in net.roadms:
+                continue
+            if not net.find_links_from_nodes(node, next_node):
+                raise ValueError("PowerEqualizer.from_path: no link from %s to %s" % (node, next_node))
+            # all the ports to next_node, e.g., the drop ports to a terminal
+            out_ports = node.node_to_port_out[next_node]
+            degrees.append((node, out_ports, monitors.get(node.name)))
+        return cls(net, degrees, **params)
+
+    @staticmethod
+    def measure(degree):
+        """
+        Measure the channel powers of a degree
+        :param degree: Degree
+        :return: (channels, powers in dBm) arrays, sorted by channel
+        """
+        if degree.monitor is not None:
+            snapshot = degree.monitor.snapshot()
+            channels, power = snapshot['channel'], snapshot['power']
+        else:
+            roadm = degree.roadm
+            states = sorted((optical_signal.index, optical_signal.loc_out_to_state[roadm]['power'])
+                            for out_port in degree.out_ports
+                            for optical_signal in roadm.port_to_optical_signal_out.get(out_port, ())
+                            if roadm in optical_signal.loc_out_to_state)
+            channels = np.array([channel for channel, _power in states], dtype=int)
+            power = np.array([power for _channel, power in states], dtype=float)
+        return channels, abs_to_db(power * 1e3)
+
+    def targets(self, channels, power_dBm):
+        "Return the target powers (dBm) of channels"
+        if self.target_dBm is None:
+            return np.full(len(channels), power_dBm.mean())
+        if isinstance(self.target_dBm, dict):
+            return np.array([self.target_dBm[channel] for channel in channels.tolist()], dtype=float)
+        return np.full(len(channels), float(self.target_dBm))
+
+    def solve(self):
+        """
+        Measure all degrees and compute their corrected VOA reference
+        powers (see Roadm.set_reference_power)
+        :return: (largest error in dB, list of (degree, channels,
+                 reference powers in dBm))
+        """
+        corrections, largest = [], 0.0
+        for degree in self.degrees:
+            channels, power_dBm = self.measure(degree)
+            if not len(channels):
+                continue
+            error = power_dBm - self.targets(channels, power_dBm)
+            largest = max(largest, float(np.abs(error).max()))
+            roadm = degree.roadm
+            reference = roadm.target_output_power_dBm.take(channels) + \
+                roadm.insertion_loss_dB.take(channels)
+            corrections.append((degree, channels, reference - self.step * error))
+        return largest, corrections
+
+    def run(self):
+        """
+        Correct the VOA targets until the largest error is within
+        tolerance or max_iterations corrections were applied
+        :return: EqualizationResult (converged, number of corrections,
+                 largest error in dB before each correction and at the end)
+        """
+        errors = []
+        for iteration in range(self.max_iterations + 1):
+            largest, corrections = self.solve()
+            errors.append(largest)
+            if largest <= self.tolerance_dB:
+                return EqualizationResult(True, iteration, errors)
+            if iteration == self.max_iterations:
+                break
+            # all degrees at once, in one propagation event
+            transaction = self.net.begin()
+            for degree, channels, reference in corrections:
+                transaction.set_reference_power(degree.roadm, reference, channels)
+            transaction.commit()
+        return EqualizationResult(False, self.max_iterations, errors)
@@ -0,0 +1,238 @@
+"""
+export.py: streaming columnar export of signal state
+
+ColumnarExporter writes tables (numpy structured arrays, or dicts of
+columns) to a columnar file through a bounded buffer of chunk_rows
+rows: each time the buffer fills up, it is written out as one chunk,
+so that result sets much larger than memory can be exported while
+they are being produced. Supported formats:
+
+    npz       one .npy member per chunk (see npz_chunks)
+    parquet   one row group per chunk (requires pyarrow)
+    csv       header line, then one row per line
+
+For example, to export the monitor metrics after each test:
+
+    with ColumnarExporter('results.npz') as exporter:
+        for test_no, net in enumerate(tests, start=1):
+            ...
+            exporter.append(net.monitor_sweep(), test=test_no)
+
+location_table() and SignalTracing.path_table() provide the
+per-location signal state as tables as well.
+"""
+
+import os
+import zipfile
+
+import numpy as np
+
+from mnoptical.history import IN, location_labels, signal_states
+from mnoptical.snapshot import network_components
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+FORMATS = ('npz', 'parquet', 'csv')
+
+
+def default_format(path):
+    """
+    Return the export format for a file name: npz, parquet or csv
+    from the extension; otherwise parquet if pyarrow is present,
+    csv if not
+    :param path: file name
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.npz':
+        return 'npz'
+    if extension in ('.parquet', '.pq'):
+        return 'parquet'
+    if extension == '.csv':
+        return 'csv'
+    return 'parquet' if pyarrow else 'csv'
+
+
+class ColumnarExporter(object):
+    "Write tables to a columnar file in bounded chunks"
+
+    def __init__(self, path, format=None, chunk_rows=65536):
+        """
+        :param path: output file name (overwritten)
+        :param format: 'npz', 'parquet' or 'csv'
+                       (default: see default_format)
+        :param chunk_rows: int, number of rows buffered before
+                           a chunk is written out
+        """
+        format = format or default_format(path)
+        if format not in FORMATS:
+            raise ValueError("ColumnarExporter: unknown format %s" % format)
+        if format == 'parquet' and pyarrow is None:
+            raise ValueError("ColumnarExporter: parquet export requires pyarrow")
+        self.path = path
+        self.format = format
+        self.chunk_rows = max(1, int(chunk_rows))
+        # the buffer is allocated on the first append, with its dtype
+        self.buffer = None
+        self.fill = 0
+        self.chunks = 0
+        self.rows = 0
+        self.writer = None
+        self.closed = False
+        if format == 'npz':
+            self.file = zipfile.ZipFile(path, 'w', zipfile.ZIP_STORED, allowZip64=True)
+        elif format == 'csv':
+            self.file = open(path, 'w')
+        else:
+            self.file = None
+
+    @staticmethod
+    def table(columns, constants=None):
+        """
+        Build a structured array from columns
+        :param columns: structured array, or dict of name: array
+        :param constants: dict of name: value repeated on every row
+                          (these columns come first)
+        :return: structured array
+        """
+        constants = constants or {}
+        if isinstance(columns, np.ndarray) and columns.dtype.names:
+            if not constants:
+                return columns
+            columns = {name: columns[name] for name in columns.dtype.names}
+        columns = {name: np.asarray(values) for name, values in columns.items()}
+        size = len(next(iter(columns.values()))) if columns else 0
+        for name, values in columns.items():
+            if values.shape != (size,):
+                raise ValueError("ColumnarExporter.table: column %s has shape %s, expected (%d,)"
+                                 % (name, values.shape, size))
+        constants = {name: np.asarray(value) for name, value in constants.items()}
+        dtype = np.dtype([(name, value.dtype) for name, value in constants.items()] +
+                         [(name, values.dtype) for name, values in columns.items()])
+        result = np.empty(size, dtype=dtype)
+        for name, value in constants.items():
+            result[name] = value
+        for name, values in columns.items():
+            result[name] = values
+        return result
+
+    def append(self, columns, **constants):
+        """
+        Append rows, writing out chunks as the buffer fills up
+        :param columns: structured array, or dict of name: array;
+                        the columns must match previous appends
+                        (string columns are widened as needed)
+        :param constants: name=value columns repeated on every row
+        """
+        if self.closed:
+            raise ValueError("ColumnarExporter.append: exporter is closed")
+        table = self.table(columns, constants)
+        self._fit(table.dtype)
+        start = 0
+        while start < len(table):
+            count = min(len(table) - start, self.chunk_rows - self.fill)
+            self.buffer[self.fill:self.fill + count] = table[start:start + count]
+            self.fill += count
+            start += count
+            if self.fill == self.chunk_rows:
+                self.flush()
+        self.rows += len(table)
+
+    def _fit(self, dtype):
+        "Allocate or widen the buffer for a table dtype"
+        if self.buffer is None:
+            self.buffer = np.empty(self.chunk_rows, dtype=dtype)
+            return
+        names = self.buffer.dtype.names
+        if dtype.names != names:
+            raise ValueError("ColumnarExporter.append: columns %s do not match %s"
+                             % (dtype.names, names))
+        widened = np.dtype([(name, np.promote_types(self.buffer.dtype[name], dtype[name]))
+                            for name in names])
+        if widened != self.buffer.dtype:
+            self.flush()
+            self.buffer = np.empty(self.chunk_rows, dtype=widened)
+
+    def flush(self):
+        "Write out the buffered rows as one chunk"
+        if not self.fill:
+            return
+        chunk = self.buffer[:self.fill]
+        if self.format == 'npz':
+            name = 'chunk%06d.npy' % self.chunks
+            with self.file.open(name, 'w', force_zip64=True) as f:
+                np.lib.format.write_array(f, chunk, allow_pickle=False)
+        elif self.format == 'parquet':
+            arrays = [pyarrow.array(chunk[name]) for name in chunk.dtype.names]
+            batch = pyarrow.Table.from_arrays(arrays, names=list(chunk.dtype.names))
+            if self.writer is None:
+                self.writer = pyarrow.parquet.ParquetWriter(self.path, batch.schema)
+            self.writer.write_table(batch)
+        else:
+            if not self.chunks:
+                self.file.write(','.join(chunk.dtype.names) + '\n')
+            np.savetxt(self.file, chunk, fmt='%s', delimiter=',')
+        self.chunks += 1
+        self.fill = 0
+
+    def close(self):
+        "Write out the remaining rows and close the file"
+        if self.closed:
+            return
+        self.flush()
+        if self.format == 'csv' and not self.chunks and self.buffer is not None:
+            # no rows: header only
+            self.file.write(','.join(self.buffer.dtype.names) + '\n')
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.closed = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def npz_chunks(path):
+    """
+    Iterate over the chunks of an npz export, one at a time
+    :param path: file written by ColumnarExporter
+    :return: generator of structured arrays
+    """
+    with np.load(path, allow_pickle=False) as npz:
+        for name in sorted(npz.files):
+            yield npz[name]
+
+
+def location_table(net, components=None):
+    """
+    Return the state of all signals at all locations as a table
+    :param net: Network object
+    :param components: list of components (default: network_components)
+    :return: array with location, side ('in' or 'out'), channel,
+             power, ase_noise and nli_noise columns, ordered by
+             location, side and channel
+    """
+    if components is None:
+        components = network_components(net)
+    labels = location_labels(components)
+    states = signal_states(net, {component: i for i, component in enumerate(components)})
+    width = max([len(label) for label in labels] or [1])
+    dtype = np.dtype([('location', 'U%d' % width), ('side', 'U3'), ('channel', np.int32),
+                      ('power', np.float64), ('ase_noise', np.float64),
+                      ('nli_noise', np.float64)])
+    result = np.empty(len(states), dtype=dtype)
+    result['location'] = np.array(labels or [''])[states['location']]
+    result['side'] = np.where(states['side'] == IN, 'in', 'out')
+    for field in ('channel', 'power', 'ase_noise', 'nli_noise'):
+        result[field] = states[field]
+    return result
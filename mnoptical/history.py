@@ -0,0 +1,293 @@
+"""
+history.py: out-of-core recording of the signal state history
+
+HistoryRecorder appends, after each propagation event of a Network
+(see Network.add_listener), the state of every signal at every
+location as fixed-size RECORD_DTYPE records (epoch, location,
+side, channel, power, ASE and NLI noise) to a memory-mapped file.
+Records of an epoch are sorted by location, side and channel, and a
+small index (one EPOCH_DTYPE entry per epoch) tracks where each
+epoch starts and stops. A history is a directory holding:
+
+    records.dat      RECORD_DTYPE records
+    epochs.dat       EPOCH_DTYPE index entries
+    locations.json   location labels (node names, links and spans)
+
+History reads it back through memory maps, so that slicing by
+location, channel or epoch only touches the pages it needs:
+
+    recorder = HistoryRecorder(net, 'history')
+    lt_1.turn_on()
+    r1.delete_switch_rule(4101, 1, switch=True)
+    recorder.close()
+
+    history = History('history')
+    records = history.select(locations=['r2'], channels=[1])
+    print(records['epoch'], records['power'])
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from mnoptical.link import Link, Span
+from mnoptical.snapshot import network_components
+
+
+# Signal state sides (input and output interface of a location)
+IN, OUT = 0, 1
+
+RECORD_DTYPE = np.dtype([('epoch', np.int64), ('location', np.int32),
+                         ('side', np.int8), ('channel', np.int32),
+                         ('power', np.float64), ('ase_noise', np.float64),
+                         ('nli_noise', np.float64)])
+
+EPOCH_DTYPE = np.dtype([('epoch', np.int64), ('start', np.int64),
+                        ('stop', np.int64), ('time', np.float64)])
+
+
+def location_labels(components):
+    """
+    Return readable labels for network components: node names,
+    links as (src->dst) and spans as (src->dst).span<n>
+    :param components: list of components (see network_components)
+    :return: list of strings
+    """
+    labels, link, n = [], None, 0
+    for component in components:
+        if isinstance(component, Link):
+            link, n = component, 0
+            labels.append(str(component))
+        elif isinstance(component, Span):
+            n += 1
+            labels.append('%s.span%d' % (link, n))
+        else:
+            labels.append(component.name)
+    return labels
+
+
+def signal_states(net, component_to_location):
+    """
+    Collect the current state of all transmitted signals
+    :param net: Network object
+    :param component_to_location: dict of component to location
+                                  index; other locations are skipped
+    :return: RECORD_DTYPE array sorted by location, side, channel
+             (with epoch left to 0)
+    """
+    rows = []
+    for lt in net.line_terminals:
+        for entry in lt.tx_to_channel.values():
+            optical_signal = entry['optical_signal']
+            for side, loc_to_state in ((IN, optical_signal.loc_in_to_state),
+                                       (OUT, optical_signal.loc_out_to_state)):
+                for loc, state in loc_to_state.items():
+                    location = component_to_location.get(loc)
+                    if location is None:
+                        continue
+                    rows.append((0, location, side, optical_signal.index,
+                                 state['power'], state['ase_noise'],
+                                 state['nli_noise']))
+    states = np.array(rows, dtype=RECORD_DTYPE)
+    order = np.lexsort((states['channel'], states['side'], states['location']))
+    return states[order]
+
+
+class HistoryRecorder(object):
+    """
+    Append the signal states of a Network to a history
+    directory after each propagation event
+    """
+
+    def __init__(self, net, path, capacity=65536, attach=True):
+        """
+        :param net: Network object
+        :param path: history directory (created if needed;
+                     an existing history is overwritten)
+        :param capacity: int, initial number of records to allocate
+                         (the records file doubles when full)
+        :param attach: boolean, record after each propagation event
+                       (False to call record() explicitly)
+        """
+        os.makedirs(path, exist_ok=True)
+        self.net = net
+        self.path = path
+        self.components = network_components(net)
+        self.component_to_location = {component: i for i, component
+                                      in enumerate(self.components)}
+        with open(os.path.join(path, 'locations.json'), 'w') as f:
+            json.dump(location_labels(self.components), f)
+        self.epochs = open(os.path.join(path, 'epochs.dat'), 'wb')
+        self.size = 0
+        self.capacity = 0
+        self.records = None
+        self._grow(max(1, capacity))
+        self.attached = attach
+        if attach:
+            net.add_listener(self.record)
+
+    def _grow(self, capacity):
+        "Resize the records file and map it again"
+        filename = os.path.join(self.path, 'records.dat')
+        if self.records is not None:
+            self.records.flush()
+            self.records = None
+        with open(filename, 'r+b' if self.capacity else 'wb') as f:
+            f.truncate(capacity * RECORD_DTYPE.itemsize)
+        self.records = np.memmap(filename, dtype=RECORD_DTYPE,
+                                 mode='r+', shape=(capacity,))
+        self.capacity = capacity
+
+    def states(self):
+        """
+        Collect the current signal states of the network
+        :return: RECORD_DTYPE array sorted by location, side, channel
+                 (with epoch left to 0)
+        """
+        return signal_states(self.net, self.component_to_location)
+
+    def record(self, net=None, origin=None):
+        """
+        Append the current signal states as a new epoch
+        (called by the network after each propagation event)
+        :param net: Network object (listener argument, unused)
+        :param origin: node that started the event (unused)
+        """
+        states = self.states()
+        start, stop = self.size, self.size + len(states)
+        if stop > self.capacity:
+            capacity = self.capacity
+            while capacity < stop:
+                capacity *= 2
+            self._grow(capacity)
+        states['epoch'] = self.net.epoch
+        self.records[start:stop] = states
+        self.size = stop
+        # the index entry is written last: readers only see complete epochs
+        entry = np.array([(self.net.epoch, start, stop, time.time())], dtype=EPOCH_DTYPE)
+        self.epochs.write(entry.tobytes())
+        self.epochs.flush()
+
+    def reader(self):
+        "Return a History reading the records so far"
+        self.records.flush()
+        return History(self.path)
+
+    def close(self):
+        "Stop recording and trim the records file to its content"
+        if self.records is None:
+            return
+        if self.attached:
+            self.net.remove_listener(self.record)
+        self.records.flush()
+        self.records = None
+        with open(os.path.join(self.path, 'records.dat'), 'r+b') as f:
+            f.truncate(self.size * RECORD_DTYPE.itemsize)
+        self.epochs.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class History(object):
+    "Read-only, memory-mapped access to a recorded history"
+
+    def __init__(self, path):
+        """
+        :param path: history directory written by HistoryRecorder
+        """
+        self.path = path
+        with open(os.path.join(path, 'locations.json')) as f:
+            self.locations = json.load(f)
+        self.label_to_locations = {}
+        for location, label in enumerate(self.locations):
+            self.label_to_locations.setdefault(label, []).append(location)
+        self.epochs = np.fromfile(os.path.join(path, 'epochs.dat'), dtype=EPOCH_DTYPE)
+        filename = os.path.join(path, 'records.dat')
+        count = os.path.getsize(filename) // RECORD_DTYPE.itemsize
+        self.records = np.memmap(filename, dtype=RECORD_DTYPE, mode='r',
+                                 shape=(count,)) if count else np.zeros(0, RECORD_DTYPE)
+
+    def __len__(self):
+        "Number of recorded signal states"
+        return int(self.epochs['stop'][-1]) if len(self.epochs) else 0
+
+    def location_indices(self, locations):
+        """
+        Translate location labels (or indices) to sorted indices
+        :param locations: iterable of strings or ints
+        :return: list of ints
+        """
+        indices = set()
+        for location in locations:
+            if isinstance(location, str):
+                if location not in self.label_to_locations:
+                    raise ValueError("History.location_indices: unknown location %s" % location)
+                indices.update(self.label_to_locations[location])
+            else:
+                indices.add(int(location))
+        return sorted(indices)
+
+    def epoch(self, epoch):
+        """
+        Return the records of an epoch
+        :param epoch: int, epoch number (see Network.epoch)
+        :return: RECORD_DTYPE memmap slice
+        """
+        match = np.flatnonzero(self.epochs['epoch'] == epoch)
+        if not len(match):
+            raise ValueError("History.epoch: epoch %s not recorded" % epoch)
+        entry = self.epochs[match[-1]]
+        return self.records[entry['start']:entry['stop']]
+
+    def select(self, locations=None, channels=None, epochs=None, side=None):
+        """
+        Return the records matching all the given criteria; only
+        the selected epochs and locations are read from disk
+        :param locations: iterable of location labels or indices
+        :param channels: iterable of channel indices
+        :param epochs: iterable of epoch numbers
+        :param side: IN or OUT (default: both)
+        :return: RECORD_DTYPE array
+        """
+        entries = self.epochs
+        if epochs is not None:
+            entries = entries[np.isin(entries['epoch'], list(epochs))]
+        if locations is not None:
+            locations = self.location_indices(locations)
+        if channels is not None:
+            channels = list(channels)
+        parts = []
+
+        def add(part):
+            "Keep the matching records of a memmap slice (copying only those)"
+            if channels is None and side is None:
+                parts.append(part)
+                return
+            mask = np.ones(len(part), dtype=bool)
+            if channels is not None:
+                mask &= np.isin(part['channel'], channels)
+            if side is not None:
+                mask &= part['side'] == side
+            parts.append(part[mask])
+
+        for start, stop in zip(entries['start'].tolist(), entries['stop'].tolist()):
+            segment = self.records[start:stop]
+            if locations is None:
+                add(segment)
+                continue
+            # records of an epoch are sorted by location
+            column = segment['location']
+            for location in locations:
+                first = np.searchsorted(column, location, side='left')
+                last = np.searchsorted(column, location, side='right')
+                if last > first:
+                    add(segment[first:last])
+        if not parts:
+            return np.zeros(0, dtype=RECORD_DTYPE)
+        return np.concatenate(parts)
@@ -2,12 +2,14 @@ from collections import namedtuple
 from mnoptical.units import *
 from pprint import pprint
 from numpy import errstate
-from mnoptical.node import LineTerminal, Roadm, Amplifier
+from mnoptical.node import LineTerminal, Roadm, Amplifier, SignalSet
 from mnoptical.edfa_params import fibre_spectral_attenuation
 import math
 
 
 SpanTuple = namedtuple('Span', 'span amplifier')
+# Let pickle find SpanTuple (its type name clashes with class Span)
+SpanTuple.__qualname__ = 'SpanTuple'
 
 class SRS_Effect_Model:
 
@@ -217,6 +219,8 @@ class Link(object):
     """
     srs_models = [SRS_Effect_Model, Zirngibl_General_Model, Sylvestre_SRS_Model, Bigo_SRS_Model]
     srs_model = SRS_Effect_Model
+    # signal state recording policy (see Network.set_recording)
+    recording = 'full'
 
     def __init__(self, src_node, dst_node, src_out_port=-1, dst_in_port=-1,
                  boost_amp=None, spans=None, debugger=False, **params):
@@ -241,7 +245,7 @@ class Link(object):
 
         self.spans = spans or []
 
-        self.optical_signals = []
+        self.optical_signals = SignalSet()
 
         def connect(prev, component):
             "Connect previous component to component"
@@ -290,7 +294,7 @@ class Link(object):
         Remove all optical signals from Link
         """
         if len(self.optical_signals) > 0:
-            self.optical_signals = []
+            self.optical_signals = SignalSet()
             for span_tuple in self.spans:
                 span = span_tuple[0]
                 span.reset()
@@ -305,8 +309,8 @@ class Link(object):
     def remove_optical_signal(self, optical_signal):
         if self.debugger:
             print("*** %s removing: %s" % (self, optical_signal))
-        if optical_signal in self.optical_signals:
-            self.optical_signals.remove(optical_signal)
+        self.optical_signals.discard(optical_signal)
+        optical_signal.remove_loc(self)
 
         for span, amplifier in self.spans:
             span.remove_optical_signal(optical_signal)
@@ -326,8 +330,7 @@ class Link(object):
         :param nli_noise: nli noise  level of OpticalSignal
         :param tup_key: tuple key composed of (Link, Span)
         """
-        if optical_signal not in self.optical_signals:
-            self.optical_signals.append(optical_signal)
+        self.optical_signals.add(optical_signal)
         optical_signal.assoc_loc_in(self, power, ase_noise, nli_noise)
 
     def include_optical_signal_out(self, optical_signal, power=None, ase_noise=None, nli_noise=None):
@@ -341,19 +344,37 @@ class Link(object):
         """
         optical_signal.assoc_loc_out(self, power, ase_noise, nli_noise)
 
-    def propagate(self, is_last_port=False, safe_switch=False):
+    def retains_state(self, component):
+        """
+        Check whether signal state is kept at a component of this
+        link after propagation, according to the recording policy:
+        'full' keeps all states, 'monitored' only states at monitored
+        amplifiers, 'endpoints' none (nodes at either end keep theirs)
+        :param component: this Link, or one of its spans or amplifiers
+        """
+        if self.recording == 'full':
+            return True
+        if self.recording == 'monitored':
+            return getattr(component, 'monitor', None) is not None
+        return False
+
+    def propagate(self, is_last_port=False, safe_switch=False, skip_unchanged=False):
         """
         Propagate the signals across the link
         :param is_last_port: boolean, needed for propagation algorithm
         :param safe_switch: boolean, needed for propagation algorithm
+        :param skip_unchanged: boolean, see Roadm.switch()
         :return:
         """
         first_component = self.boost_amp or self.spans[0][0]
         for optical_signal in self.optical_signals:
             first_component.include_optical_signal_in(optical_signal, in_port=0)
+            if not self.retains_state(self):
+                optical_signal.remove_loc(self)
         first_component.propagate(optical_signals=self.optical_signals,
                                   is_last_port=is_last_port,
-                                  safe_switch=safe_switch)
+                                  safe_switch=safe_switch,
+                                  skip_unchanged=skip_unchanged)
 
 
 class Span(object):
@@ -388,7 +409,7 @@ class Span(object):
         self.raman_coefficient = self.raman_gain / (2 * self.effective_area * self.raman_amplification_band)
         # self.raman_coefficient = (8.2e-17 / 2) or (7.87e-17 / 2) for 50 or 25 km spans
 
-        self.optical_signals = []
+        self.optical_signals = SignalSet()
         self.link = None
         self.prev_component = None
         self.next_component = None
@@ -401,7 +422,7 @@ class Span(object):
         return '<%d %.1fkm>' % (self.span_id, self.length/km)
 
     def reset(self):
-        self.optical_signals = []
+        self.optical_signals = SignalSet()
 
     def get_fibre_spectral_attenuation(self):
         """
@@ -440,8 +461,8 @@ class Span(object):
     def remove_optical_signal(self, optical_signal):
         if self.debugger:
             print("*** %s removing: %s" % (self, optical_signal))
-        if optical_signal in self.optical_signals:
-            self.optical_signals.remove(optical_signal)
+        self.optical_signals.discard(optical_signal)
+        optical_signal.remove_loc(self)
 
     def include_optical_signal_in(self, optical_signal, power=None,
                                   ase_noise=None, nli_noise=None, in_port=None):
@@ -452,8 +473,7 @@ class Span(object):
         :param ase_noise: ase noise level of OpticalSignal
         :param nli_noise: nli noise  level of OpticalSignal
         """
-        if optical_signal not in self.optical_signals:
-            self.optical_signals.append(optical_signal)
+        self.optical_signals.add(optical_signal)
         optical_signal.assoc_loc_in(self, power, ase_noise, nli_noise)
 
     def include_optical_signal_out(self, optical_signal, power=None,
@@ -473,7 +493,8 @@ class Span(object):
     def set_output_port(self, *args, **kwargs):
         pass
 
-    def propagate(self, optical_signals=None, is_last_port=False, safe_switch=False):
+    def propagate(self, optical_signals=None, is_last_port=False, safe_switch=False,
+                  skip_unchanged=False):
         optical_signals = optical_signals or self.optical_signals
 
         # XXX The GN model seems to want our outputs to be preloaded
@@ -514,12 +535,19 @@ class Span(object):
             if hasattr(component, 'receiver'):
                 component.receiver(optical_signal, in_port)
 
+        if not self.link.retains_state(self):
+            # computed in transit only (see Network.set_recording)
+            for optical_signal in self.optical_signals:
+                optical_signal.remove_loc(self)
+
         if hasattr(component, 'switch'):
             if is_last_port:
-                component.switch(in_port, self.link.src_node, safe_switch=safe_switch)
+                component.switch(in_port, self.link.src_node, safe_switch=safe_switch,
+                                 skip_unchanged=skip_unchanged)
         elif hasattr(component, 'propagate'):
             component.propagate(
-                optical_signals=self.optical_signals, is_last_port=is_last_port, safe_switch=safe_switch)
+                optical_signals=self.optical_signals, is_last_port=is_last_port, safe_switch=safe_switch,
+                skip_unchanged=skip_unchanged)
 
     def output_nonlinear_noise(self):
         """
@@ -0,0 +1,29 @@
+"""
+metrics.py: per-channel monitor metrics as arrays
+
+The metrics of the signals seen by a monitor (power, ASE and NLI noise
+in linear units, OSNR and gOSNR in dB), indexed by metric and channel.
+Shared by sharedstate.py, subscription.py and timeseries.py; this
+module depends on numpy only.
+"""
+
+import numpy as np
+
+
+METRICS = ('power', 'ase_noise', 'nli_noise', 'osnr', 'gosnr')
+POWER, ASE_NOISE, NLI_NOISE, OSNR, GOSNR = range(len(METRICS))
+
+
+def monitor_metrics(monitor, channels):
+    """
+    Compute the metrics of all channels seen by a monitor
+    :param monitor: Monitor object
+    :param channels: int, number of channels
+    :return: float64 array [metric, channel], NaN if not seen
+    """
+    data = np.full((len(METRICS), channels), np.nan)
+    _optical_signals, table = monitor.signal_states()
+    table = table[(table['channel'] > 0) & (table['channel'] <= channels)]
+    for metric, field in enumerate(METRICS):
+        data[metric, table['channel'] - 1] = table[field]
+    return data
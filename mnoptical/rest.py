@@ -44,9 +44,15 @@ Terminal/transceiver operations
 Monitor operations
 
 - list monitors: /monitors
+- get data of all monitors as columns: /monitors/sweep
+  -> { monitor:[...], component:[...], channel:[...], osnr:[...], ... }
 - get monitor data (OSNR, gOSNR): /monitor?monitor=r1-r2-amp2-mon
   -> osnr:{ signal: {freq, osnr, gosnr} }
 
+Amplifier operations
+
+- set gain: /setgain?amplifier=r1-r2-amp1&gain=17.0 -> 'old->new'
+
 """
 
 def net():
@@ -74,6 +80,12 @@ def monitors():
     return dict( monitors=monitors )
 
 
+@get( '/monitors/sweep' )
+def monitorSweep():
+    "Return metrics of all monitors as columns"
+    return net().restMonitorSweepHandler( request.query )
+
+
 @get( '/monitor' )
 def monitor():
     "Return information for monitor"
@@ -231,12 +243,16 @@ def turn_on():
         abort( 404, "No turn_on handler for %s" % node )
 
 
-# Demo support (not part of SDN API)
-
 @get( '/setgain' )
 def setgain():
-    "Demo support: tell Mininet to adjust the gain for am amplifier"
-    net().restSetgainHandler( request.query )
+    "Set the gain of an amplifier and recompute the affected signals"
+    result = net().restSetgainHandler( request.query )
+    if result.endswith( 'not found' ):
+        abort( 404, result )
+    return result
+
+
+# Demo support (not part of SDN API)
 
 @get( '/set_ripple' )
 def set_ripple():
@@ -0,0 +1,196 @@
+"""
+sharedstate.py: monitor state in shared memory for reader processes
+
+MonitorStatePublisher copies the per-channel metrics of all monitors
+of a Network (power, ASE and NLI noise in linear units, OSNR and
+gOSNR in dB) into a multiprocessing.shared_memory segment after each
+propagation event (see Network.add_listener). Other processes (REST
+server, CLI, analytics) attach a MonitorStateReader to the segment
+by name and read it without calling into the simulator.
+
+Segment layout (all values little-endian int64/float64):
+
+    header   sequence, epoch, monitors, channels, names length
+    names    JSON list of monitor names (padded to 8 bytes)
+    data     float64 array [monitor, metric, channel]; NaN where a
+             monitor sees no signal on a channel (channel 1 is column 0)
+
+Writes are guarded by a seqlock: the sequence number is odd while
+the publisher writes, and readers retry until they copied the data
+between two reads of the same even sequence number:
+
+    publisher = MonitorStatePublisher(net)
+    # in another process:
+    reader = MonitorStateReader(publisher.name)
+    epoch, data = reader.snapshot()
+    gosnr = data[reader.monitors.index('r1-r2-amp1-monitor'), GOSNR]
+"""
+
+import json
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# the metric indices are part of the segment layout
+from mnoptical.metrics import (METRICS, POWER, ASE_NOISE, NLI_NOISE,
+                               OSNR, GOSNR, monitor_metrics)
+
+
+# header: sequence, epoch, monitors, channels, names length
+HEADER_SIZE = 64
+SEQUENCE, EPOCH, MONITORS, CHANNELS, NAMES = range(5)
+
+
+def attach_segment(name):
+    """
+    Attach to an existing shared memory segment without registering
+    it with the resource tracker, which would otherwise unlink the
+    segment of the publisher when this process exits
+    :param name: shared memory segment name
+    :return: SharedMemory object
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args: None
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = register
+
+
+class MonitorStatePublisher(object):
+    """
+    Publish the monitor state of a Network into shared memory
+    after each propagation event
+    """
+
+    def __init__(self, net, name=None, channels=90, attach=True):
+        """
+        :param net: Network object
+        :param name: shared memory segment name (default: random)
+        :param channels: int, number of channels published per monitor
+        :param attach: boolean, publish after each propagation event
+                       (False to call publish() explicitly)
+        """
+        self.net = net
+        self.monitors = net.monitors()
+        self.channels = channels
+        names = json.dumps([monitor.name for monitor in self.monitors]).encode()
+        names_size = -(-len(names) // 8) * 8
+        self.data_offset = HEADER_SIZE + names_size
+        size = self.data_offset + 8 * len(self.monitors) * len(METRICS) * channels
+        self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self.name = self.shm.name
+        self.header = np.ndarray(5, dtype='<i8', buffer=self.shm.buf)
+        self.header[:] = (0, net.epoch, len(self.monitors), channels, len(names))
+        self.shm.buf[HEADER_SIZE:HEADER_SIZE + len(names)] = names
+        self.data = np.ndarray((len(self.monitors), len(METRICS), channels), dtype='<f8',
+                               buffer=self.shm.buf, offset=self.data_offset)
+        self.data[:] = np.nan
+        self.attached = attach
+        if attach:
+            net.add_listener(self.publish)
+        self.publish()
+
+    def publish(self, net=None, origin=None):
+        """
+        Copy the current monitor state into shared memory
+        (called by the network after each propagation event)
+        :param net: Network object (listener argument, unused)
+        :param origin: node that started the event (unused)
+        """
+        data = np.stack([monitor_metrics(monitor, self.channels)
+                         for monitor in self.monitors]) if self.monitors else self.data
+        # odd sequence: write in progress
+        self.header[SEQUENCE] += 1
+        self.data[:] = data
+        self.header[EPOCH] = self.net.epoch
+        self.header[SEQUENCE] += 1
+
+    def close(self):
+        "Stop publishing and remove the shared memory segment"
+        if self.shm is None:
+            return
+        if self.attached:
+            self.net.remove_listener(self.publish)
+        self.header = self.data = None
+        self.shm.close()
+        self.shm.unlink()
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class MonitorStateReader(object):
+    "Read the monitor state published by a MonitorStatePublisher"
+
+    def __init__(self, name):
+        """
+        :param name: shared memory segment name (publisher.name)
+        """
+        self.shm = attach_segment(name)
+        self.header = np.ndarray(5, dtype='<i8', buffer=self.shm.buf)
+        monitors, channels, names = self.header[[MONITORS, CHANNELS, NAMES]].tolist()
+        self.monitors = json.loads(bytes(self.shm.buf[HEADER_SIZE:HEADER_SIZE + names]))
+        self.channels = channels
+        offset = HEADER_SIZE + -(-names // 8) * 8
+        self.data = np.ndarray((monitors, len(METRICS), channels), dtype='<f8',
+                               buffer=self.shm.buf, offset=offset)
+
+    def view(self):
+        """
+        Return a zero-copy view of the published data; it changes
+        with every publication and may be read mid-update
+        :return: float64 array [monitor, metric, channel]
+        """
+        return self.data
+
+    def snapshot(self, timeout=1.0):
+        """
+        Return a consistent copy of the published data
+        :param timeout: float, seconds to wait for a publication
+                        in progress before giving up
+        :return: (epoch, float64 array [monitor, metric, channel])
+        """
+        deadline = time.time() + timeout
+        while True:
+            sequence = int(self.header[SEQUENCE])
+            if not sequence % 2:
+                epoch = int(self.header[EPOCH])
+                data = self.data.copy()
+                if int(self.header[SEQUENCE]) == sequence:
+                    return epoch, data
+            if time.time() > deadline:
+                raise ValueError("MonitorStateReader.snapshot: timed out")
+
+    def monitor(self, name):
+        """
+        Return a consistent copy of the data of one monitor
+        :param name: monitor name
+        :return: dict of metric name to float64 array by channel
+        """
+        _epoch, data = self.snapshot()
+        row = data[self.monitors.index(name)]
+        return {metric: row[i] for i, metric in enumerate(METRICS)}
+
+    def close(self):
+        "Detach from the shared memory segment"
+        if self.shm is None:
+            return
+        self.header = self.data = None
+        self.shm.close()
+        self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,404 @@
+"""
+snapshot.py: compact snapshots of the dynamic state of a Network
+
+A Network consists of an immutable topology (nodes, links, spans and
+their ports) and of dynamic state (switch tables, amplifier gains,
+signal-to-port assignments and per-location signal states).
+NetworkSnapshot captures the dynamic state only, as flat NumPy arrays
+indexed by component and signal numbers, so that it can be restored
+(or shipped to another process holding a copy of the same topology)
+without walking the object graph as copy.deepcopy() would.
+
+Typical use:
+
+    snap = net.snapshot()
+    r1.install_switch_rule(...)   # what-if reconfiguration
+    ...
+    net.restore(snap)             # throw the result away
+
+Snapshot arrays are read-only, so a snapshot taken before forking
+worker processes is shared copy-on-write by all of them.
+"""
+
+import numpy as np
+
+from mnoptical.node import (LineTerminal, Roadm, Amplifier,
+                            OpticalSignal, SignalSet)
+
+
+# Signal state directions
+IN, OUT = 0, 1
+
+# Row layouts (columns) of the integer arrays
+# membership: component, direction, port, signal (-1 for an empty port)
+# states: location, direction, signal
+# rules: roadm, in_port, channel, out_port
+# rule_src: roadm, in_port, channel, src component (-1 for None),
+#           table (0: node_to_rule_id_in, 1: rule_id_to_node_in)
+# power_in: roadm, in_port, signal
+# port_in: roadm, signal, in_port (last input port of the signal)
+# tx: terminal, out_port, transceiver, signal
+# rx: terminal, in_port, transceiver, channel
+
+
+def network_components(net, nodes=None):
+    """
+    Return all the stateful components of a Network in a
+    deterministic order: nodes (including ROADM preamp/boost
+    amplifiers), then links followed by their spans and amplifiers.
+    The same topology always yields the same order, which is what
+    makes snapshots portable to copies of the network.
+    :param net: Network object
+    :param nodes: collection of nodes to restrict the result to
+                  (with the links leaving them); default: all
+    :return: list of components
+    """
+    components, seen = [], set()
+
+    def add(component):
+        if component is not None and id(component) not in seen:
+            seen.add(id(component))
+            components.append(component)
+
+    for node in net.name_to_node.values():
+        if nodes is not None and node not in nodes:
+            continue
+        add(node)
+        if isinstance(node, Roadm):
+            add(node.preamp)
+            add(node.boost)
+    for link in net.links:
+        if nodes is not None and link.src_node not in nodes:
+            continue
+        add(link)
+        add(link.boost_amp)
+        for span, amplifier in link.spans:
+            add(span)
+            add(amplifier)
+    return components
+
+
+def _array(rows, columns, dtype=np.int64):
+    "Return a read-only 2D array for a list of row tuples"
+    array = np.array(rows, dtype=dtype).reshape(-1, columns)
+    array.flags.writeable = False
+    return array
+
+
+class NetworkSnapshot(object):
+    """
+    Dynamic state of a Network stored in compact arrays.
+    Use Network.snapshot() and Network.restore() rather than
+    instantiating this class directly.
+    """
+
+    def __init__(self, net, components=None):
+        """
+        :param net: Network object
+        :param components: list of components to capture (default: all);
+                           restore() leaves other components untouched
+        """
+        all_components = network_components(net)
+        comp_id = {id(c): i for i, c in enumerate(all_components)}
+        if components is None:
+            components = all_components
+        self.component_count = len(all_components)
+        self.scope = np.array(sorted(comp_id[id(c)] for c in components),
+                              dtype=np.int32)
+        self.scope.flags.writeable = False
+        components = [all_components[i] for i in self.scope]
+
+        # Signal registry, identified by originating transceiver
+        origin = {}
+        for i, component in enumerate(all_components):
+            if isinstance(component, LineTerminal):
+                for pos, t in enumerate(component.transceivers):
+                    if t.optical_signal is not None:
+                        origin[t.optical_signal] = (i, pos)
+        signals, sig_id = [], {}
+
+        def sid(optical_signal):
+            if optical_signal not in sig_id:
+                sig_id[optical_signal] = len(signals)
+                signals.append(optical_signal)
+            return sig_id[optical_signal]
+
+        membership, states, values = [], [], []
+        rules, rule_src, power_in, power_in_values = [], [], [], []
+        port_in = []
+        tx, rx, transceivers, transceiver_values = [], [], [], []
+        amplifiers, amplifier_values, wdg = [], [], []
+        roadms, target_power, check_range = [], [], []
+
+        def src_id(node):
+            return -1 if node is None else comp_id.get(id(node), -1)
+
+        for component in components:
+            i = comp_id[id(component)]
+            # Port (or link/span) membership
+            if hasattr(component, 'port_to_optical_signal_in'):
+                for direction, ports in ((IN, component.port_to_optical_signal_in),
+                                         (OUT, component.port_to_optical_signal_out)):
+                    for port, optical_signals in ports.items():
+                        if not optical_signals:
+                            membership.append((i, direction, port, -1))
+                        for optical_signal in optical_signals:
+                            membership.append((i, direction, port, sid(optical_signal)))
+            else:
+                for optical_signal in component.optical_signals:
+                    membership.append((i, IN, -1, sid(optical_signal)))
+
+            if isinstance(component, Roadm):
+                roadms.append(i)
+                for (in_port, channel), out_port in component.switch_table.items():
+                    rules.append((i, in_port, channel, out_port))
+                for node, rule_ids in component.node_to_rule_id_in.items():
+                    for in_port, channel in rule_ids:
+                        rule_src.append((i, in_port, channel, src_id(node), 0))
+                for (in_port, channel), node in component.rule_id_to_node_in.items():
+                    rule_src.append((i, in_port, channel, src_id(node), 1))
+                for port, count in component.port_check_range_out.items():
+                    check_range.append((i, port, count))
+                for port, history in component.port_to_optical_signal_power_in.items():
+                    for optical_signal, power in history.items():
+                        power_in.append((i, port, sid(optical_signal)))
+                        power_in_values.append(power)
+                for optical_signal, in_port in component.optical_signal_to_port_in.items():
+                    port_in.append((i, sid(optical_signal), in_port))
+                target_power.append(component.target_output_power_dBm.copy())
+
+            if isinstance(component, Amplifier):
+                amplifiers.append(i)
+                amplifier_values.append((component.target_gain, component.system_gain))
+                wdg.append(component.wavelength_dependent_gain.copy())
+
+            if isinstance(component, LineTerminal):
+                for pos, t in enumerate(component.transceivers):
+                    signal = -1 if t.optical_signal is None else sid(t.optical_signal)
+                    transceivers.append((i, pos, signal))
+                    transceiver_values.append((t.operation_power, t.bits_per_symbol,
+                                               t.symbol_rate, t.rx_threshold_dB,
+                                               t.modulation_format))
+                position = {t: pos for pos, t in enumerate(component.transceivers)}
+                for out_port, entry in component.tx_to_channel.items():
+                    tx.append((i, out_port, position[entry['transceiver']],
+                               sid(entry['optical_signal'])))
+                for in_port, entry in component.rx_to_channel.items():
+                    for channel in entry['channel_id']:
+                        rx.append((i, in_port, position[entry['transceiver']], channel))
+
+        # Per-location signal states, restricted to captured components
+        in_scope = {id(c): comp_id[id(c)] for c in components}
+        for optical_signal in list(signals):
+            s = sig_id[optical_signal]
+            for direction, loc_to_state in ((IN, optical_signal.loc_in_to_state),
+                                            (OUT, optical_signal.loc_out_to_state)):
+                for loc, state in loc_to_state.items():
+                    if id(loc) in in_scope:
+                        states.append((in_scope[id(loc)], direction, s))
+                        values.append((state['power'], state['ase_noise'], state['nli_noise']))
+
+        self.membership = _array(membership, 4)
+        self.states = _array(states, 3)
+        self.state_values = _array(values, 3, dtype=np.float64)
+        self.rules = _array(rules, 4)
+        self.rule_src = _array(rule_src, 5)
+        self.check_range = _array(check_range, 3)
+        self.power_in = _array(power_in, 3)
+        self.power_in_values = _array(power_in_values, 1, dtype=np.float64)[:, 0]
+        self.port_in = _array(port_in, 3)
+        self.tx = _array(tx, 4)
+        self.rx = _array(rx, 4)
+        self.transceivers = _array(transceivers, 3)
+        self.transceiver_values = _array([v[:4] for v in transceiver_values], 4,
+                                         dtype=np.float64)
+        self.modulation_formats = tuple(v[4] for v in transceiver_values)
+        self.roadms = _array(roadms, 1)[:, 0]
+        self.target_power = tuple(target_power)
+        self.amplifiers = _array(amplifiers, 1)[:, 0]
+        self.gains = _array(amplifier_values, 2, dtype=np.float64)
+        self.wavelength_dependent_gain = tuple(wdg)
+
+        # Signal configuration and cached (launch/current) state
+        self.signal_origin = _array([origin.get(s, (-1, -1)) for s in signals], 2)
+        self.signal_index = _array([s.index for s in signals], 1)[:, 0]
+        self.signal_values = _array(
+            [(s.frequency, s.wavelength, s.wavelength2, s.symbol_rate,
+              s.bits_per_symbol, s.power_start, s.ase_noise_start,
+              s.nli_noise_start, s.power, s.ase_noise, s.nli_noise)
+             for s in signals], 11, dtype=np.float64)
+        self.signal_formats = tuple(s.modulation_format for s in signals)
+        # Signal objects are only meaningful in this process
+        self._signals = signals
+
+    def __getstate__(self):
+        "Don't pickle signal objects: they are resolved again on restore"
+        state = self.__dict__.copy()
+        state['_signals'] = None
+        return state
+
+    def __len__(self):
+        "Number of recorded signal states"
+        return len(self.states)
+
+    def nbytes(self):
+        "Return the approximate size of the snapshot arrays in bytes"
+        return sum(value.nbytes for value in vars(self).values()
+                   if isinstance(value, np.ndarray))
+
+    def resolve_signals(self, components):
+        """
+        Return the OpticalSignal objects of this snapshot: the original
+        objects if we are in the process that took the snapshot, otherwise
+        the signals of the originating transceivers (created if necessary).
+        :param components: list of network components (see network_components)
+        """
+        if self._signals is not None:
+            signals = self._signals
+        else:
+            signals = []
+            for s, (lt, pos) in enumerate(self.signal_origin.tolist()):
+                optical_signal = None
+                if lt >= 0:
+                    transceiver = components[lt].transceivers[pos]
+                    optical_signal = transceiver.optical_signal
+                    if (optical_signal is None or
+                            optical_signal.index != self.signal_index[s]):
+                        optical_signal = OpticalSignal(
+                            int(self.signal_index[s]), transceiver.channel_spacing_H,
+                            transceiver.channel_spacing_nm, self.signal_formats[s],
+                            transceiver.symbol_rate, transceiver.bits_per_symbol)
+                else:
+                    optical_signal = OpticalSignal(
+                        int(self.signal_index[s]), 50e9, 0.4 * 1e-9,
+                        self.signal_formats[s], 32.0e9, 4.0)
+                signals.append(optical_signal)
+        for optical_signal, values, modulation_format in zip(
+                signals, self.signal_values.tolist(), self.signal_formats):
+            (optical_signal.frequency, optical_signal.wavelength,
+             optical_signal.wavelength2, optical_signal.symbol_rate,
+             optical_signal.bits_per_symbol, optical_signal.power_start,
+             optical_signal.ase_noise_start, optical_signal.nli_noise_start,
+             optical_signal.power, optical_signal.ase_noise,
+             optical_signal.nli_noise) = values
+            optical_signal.modulation_format = modulation_format
+        return signals
+
+    def restore(self, net):
+        """
+        Restore the captured dynamic state into net, which must be
+        the network the snapshot was taken from or a copy of it.
+        :param net: Network object
+        """
+        components = network_components(net)
+        if len(components) != self.component_count:
+            raise ValueError("NetworkSnapshot.restore: topology mismatch "
+                             "(%d components, expected %d)" %
+                             (len(components), self.component_count))
+        signals = self.resolve_signals(components)
+        scope = [components[i] for i in self.scope.tolist()]
+        scope_ids = {id(c) for c in scope}
+
+        # Clear per-location states within scope for every signal
+        # we know about (including those created after the snapshot)
+        known = set(signals)
+        for component in scope:
+            if hasattr(component, 'port_to_optical_signal_in'):
+                for ports in (component.port_to_optical_signal_in,
+                              component.port_to_optical_signal_out):
+                    for optical_signals in ports.values():
+                        known.update(optical_signals)
+            else:
+                known.update(component.optical_signals)
+        for optical_signal in known:
+            for loc_to_state in (optical_signal.loc_in_to_state,
+                                 optical_signal.loc_out_to_state):
+                for loc in [loc for loc in loc_to_state if id(loc) in scope_ids]:
+                    del loc_to_state[loc]
+
+        # Membership
+        for component in scope:
+            if hasattr(component, 'port_to_optical_signal_in'):
+                component.port_to_optical_signal_in = {}
+                component.port_to_optical_signal_out = {}
+            else:
+                component.optical_signals = SignalSet()
+        for i, direction, port, s in self.membership.tolist():
+            component = components[i]
+            if hasattr(component, 'port_to_optical_signal_in'):
+                ports = (component.port_to_optical_signal_in if direction == IN
+                         else component.port_to_optical_signal_out)
+                optical_signals = ports.setdefault(port, SignalSet())
+                if s >= 0:
+                    optical_signals.add(signals[s])
+            else:
+                component.optical_signals.add(signals[s])
+
+        # Per-location states
+        for (i, direction, s), (power, ase_noise, nli_noise) in zip(
+                self.states.tolist(), self.state_values.tolist()):
+            loc_to_state = (signals[s].loc_in_to_state if direction == IN
+                            else signals[s].loc_out_to_state)
+            loc_to_state[components[i]] = {'power': power, 'ase_noise': ase_noise,
+                                           'nli_noise': nli_noise}
+
+        # ROADM switching state
+        for i, target_power in zip(self.roadms.tolist(), self.target_power):
+            roadm = components[i]
+            roadm.switch_table = {}
+            roadm.node_to_rule_id_in = {}
+            roadm.rule_id_to_node_in = {}
+            roadm.port_check_range_out = {}
+            roadm.port_to_optical_signal_power_in = {}
+            roadm.optical_signal_to_port_in = {}
+            roadm.target_output_power_dBm = target_power.copy()
+        for i, in_port, channel, out_port in self.rules.tolist():
+            components[i].switch_table[in_port, channel] = out_port
+        for i, in_port, channel, src, table in self.rule_src.tolist():
+            node = None if src < 0 else components[src]
+            if table == 0:
+                components[i].node_to_rule_id_in.setdefault(node, []).append(
+                    (in_port, channel))
+            else:
+                components[i].rule_id_to_node_in[in_port, channel] = node
+        for i, port, count in self.check_range.tolist():
+            components[i].port_check_range_out[port] = count
+        for (i, port, s), power in zip(self.power_in.tolist(),
+                                       self.power_in_values.tolist()):
+            components[i].port_to_optical_signal_power_in.setdefault(port, {})[signals[s]] = power
+        for i, s, in_port in self.port_in.tolist():
+            components[i].optical_signal_to_port_in[signals[s]] = in_port
+
+        # Amplifier gains
+        for i, (target_gain, system_gain), wdg in zip(
+                self.amplifiers.tolist(), self.gains.tolist(),
+                self.wavelength_dependent_gain):
+            amplifier = components[i]
+            amplifier.target_gain = target_gain
+            amplifier.system_gain = system_gain
+            amplifier.wavelength_dependent_gain = wdg.copy()
+
+        # Terminals and transceivers
+        for (i, pos, s), values, modulation_format in zip(
+                self.transceivers.tolist(), self.transceiver_values.tolist(),
+                self.modulation_formats):
+            transceiver = components[i].transceivers[pos]
+            (transceiver.operation_power, transceiver.bits_per_symbol,
+             transceiver.symbol_rate, transceiver.rx_threshold_dB) = values
+            transceiver.modulation_format = modulation_format
+            transceiver.optical_signal = None if s < 0 else signals[s]
+        terminals = {i for i, _, _ in self.transceivers.tolist()}
+        for i in terminals:
+            components[i].tx_to_channel = {}
+            components[i].rx_to_channel = {}
+        for i, out_port, pos, s in self.tx.tolist():
+            lt = components[i]
+            lt.tx_to_channel[out_port] = {'optical_signal': signals[s],
+                                          'transceiver': lt.transceivers[pos]}
+        for i, in_port, pos, channel in self.rx.tolist():
+            lt = components[i]
+            entry = lt.rx_to_channel.setdefault(
+                in_port, {'channel_id': [], 'transceiver': lt.transceivers[pos]})
+            entry['channel_id'].append(channel)
+        for i in terminals:
+            components[i].optical_signals_out = len(components[i].tx_to_channel)
@@ -0,0 +1,106 @@
+"""
+subscription.py: push-based notification of monitor changes
+
+Instead of polling monitors, callers subscribe to a set of monitors,
+channels and metrics of a Network. After each completed propagation
+event (see Network.add_listener) the subscription compares the
+current values with the last delivered ones and calls back with the
+changes beyond a threshold only:
+
+    def alarm(changes):
+        for change in changes:
+            if change.metric == 'gosnr' and change.new < 18:
+                print(change.monitor, change.channel, change.new)
+
+    subscription = net.subscribe(alarm, metrics=['gosnr'], threshold=0.5)
+    ...
+    net.unsubscribe(subscription)
+
+A channel appearing at (or disappearing from) a monitor is reported
+with old (or new) set to NaN.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from mnoptical.metrics import METRICS, monitor_metrics
+
+
+Change = namedtuple('Change', 'monitor channel metric old new')
+
+
+class Subscription(object):
+    "Deliver monitor value changes after propagation events"
+
+    def __init__(self, net, callback, monitors=None, channels=None,
+                 metrics=('osnr', 'gosnr'), threshold=0.1, num_channels=90):
+        """
+        :param net: Network object
+        :param callback: callable, called with a list of Change tuples
+        :param monitors: list of Monitor objects or monitor names
+                         (default: all monitors of net)
+        :param channels: list of channel indices (default: all)
+        :param metrics: list of metrics among metrics.METRICS
+        :param threshold: float, or dict of metric to float: minimum
+                          absolute change to report (power and noise
+                          in linear units, OSNR and gOSNR in dB)
+        :param num_channels: int, highest channel index monitored
+        """
+        for metric in metrics:
+            if metric not in METRICS:
+                raise ValueError("Subscription: unknown metric %s" % metric)
+        if monitors is None:
+            monitors = net.monitors()
+        by_name = {monitor.name: monitor for monitor in net.monitors()}
+        self.monitors = [by_name[m] if isinstance(m, str) else m for m in monitors]
+        self.net = net
+        self.callback = callback
+        self.metrics = list(metrics)
+        self.rows = np.array([METRICS.index(metric) for metric in metrics], dtype=int)
+        if channels is None:
+            channels = range(1, num_channels + 1)
+        self.channels = np.array(sorted(channels), dtype=int)
+        self.num_channels = max(num_channels, int(self.channels.max(initial=0)))
+        if not isinstance(threshold, dict):
+            threshold = {metric: threshold for metric in metrics}
+        self.threshold = np.array([threshold.get(metric, 0) for metric in metrics])[:, None]
+        self.values = [self.current(monitor) for monitor in self.monitors]
+        self.deliveries = 0
+
+    def current(self, monitor):
+        "Return the subscribed values of a monitor as [metric, channel]"
+        data = monitor_metrics(monitor, self.num_channels)
+        return data[np.ix_(self.rows, self.channels - 1)]
+
+    def changes(self):
+        """
+        Compare current and last delivered values, remembering
+        the current values of those reported
+        :return: list of Change tuples
+        """
+        changes = []
+        for i, monitor in enumerate(self.monitors):
+            old, new = self.values[i], self.current(monitor)
+            with np.errstate(invalid='ignore'):
+                changed = np.abs(new - old) > self.threshold
+            changed |= np.isnan(new) != np.isnan(old)
+            if not changed.any():
+                continue
+            for m, c in zip(*np.nonzero(changed)):
+                changes.append(Change(monitor.name, int(self.channels[c]), self.metrics[m],
+                                      float(old[m, c]), float(new[m, c])))
+            old[changed] = new[changed]
+        return changes
+
+    def update(self, net=None, origin=None):
+        """
+        Deliver the changes, if any
+        (called by the network after each propagation event)
+        :param net: Network object (listener argument, unused)
+        :param origin: node that started the event (unused)
+        """
+        changes = self.changes()
+        if changes:
+            self.deliveries += 1
+            self.callback(changes)
@@ -1,3 +1,5 @@
+import numpy as np
+from scipy.special import erfc, erfcinv
 
 # FIXME: (AD) need to add all modulation formats with correct values
 
@@ -9,12 +11,78 @@ rx_thresholds = {
 
 """bits per symbol"""
 bps = {
+    'QPSK': 2.0,
     '16QAM': 4.0,
     '64QAM': 6.0
 }
 
 """symbol rate"""
 sr = {
+    'QPSK': 32.0e9,
     '16QAM': 32.0e9,
     '64QAM': 25.0e9
-}
\ No newline at end of file
+}
+
+"""BER approximation (Gray coding) as a * erfc(sqrt(b * SNR)), SNR linear:
+    BPSK (exact): a = 1 / 2, b = 1
+    M-PSK (M >= 4): a = 1 / log2(M), b = sin(pi / M) ** 2
+    M-QAM: a = 2 / log2(M) * (1 - 1 / sqrt(M)), b = 3 / (2 * (M - 1))"""
+ber_params = {
+    'BPSK': (0.5, 1.0),
+    'QPSK': (0.5, 0.5),
+    '8PSK': (1 / 3, np.sin(np.pi / 8) ** 2),
+    '16PSK': (1 / 4, np.sin(np.pi / 16) ** 2),
+    '16QAM': (3 / 8, 1 / 10),
+    '64QAM': (7 / 24, 1 / 42)
+}
+
+
+def equal_ber_threshold(modulation_format, reference='16QAM'):
+    """
+    gOSNR (dB) at which a modulation format has the BER of another
+    one at its rx threshold (see ber_params)
+    :param modulation_format: key of ber_params
+    :param reference: key of ber_params and rx_thresholds
+    """
+    a, b = ber_params[reference]
+    ber = a * erfc(np.sqrt(b * 10 ** (rx_thresholds[reference] / 10)))
+    a, b = ber_params[modulation_format]
+    return float(10 * np.log10(erfcinv(ber / a) ** 2 / b))
+
+
+# QPSK: same pre-FEC BER as 16QAM at its threshold (about 13.1 dB)
+rx_thresholds['QPSK'] = equal_ber_threshold('QPSK')
+
+"""QoT record of qot(): BER, pre-FEC margin (dB) and pass/fail"""
+QOT_DTYPE = np.dtype([('ber', np.float64), ('margin', np.float64),
+                      ('success', np.bool_)])
+
+
+def qot(gosnr_dB, modulation_formats, thresholds_dB=None):
+    """
+    Compute BER, margin and pass/fail for many channels at once,
+    taking the gOSNR as the signal-to-noise ratio of the symbols
+    :param gosnr_dB: array of gOSNR values (dB)
+    :param modulation_formats: array of modulation format names
+                               (keys of ber_params), or one name
+    :param thresholds_dB: array of gOSNR thresholds (dB);
+                          default: rx_thresholds of the formats
+    :return: QOT_DTYPE array aligned with gosnr_dB
+    """
+    gosnr_dB = np.asarray(gosnr_dB, dtype=float)
+    formats = np.broadcast_to(np.asarray(modulation_formats), gosnr_dB.shape)
+    names, inverse = np.unique(formats.ravel(), return_inverse=True)
+    inverse = inverse.reshape(gosnr_dB.shape)
+    for name in names:
+        if name not in ber_params:
+            raise ValueError("terminal_params.qot: unknown modulation format %s" % name)
+    a, b = np.array([ber_params[name] for name in names]).reshape(-1, 2).T
+    if thresholds_dB is None:
+        thresholds_dB = np.array([rx_thresholds.get(name, np.nan) for name in names])[inverse]
+    thresholds_dB = np.asarray(thresholds_dB, dtype=float)
+    result = np.zeros(gosnr_dB.shape, dtype=QOT_DTYPE)
+    snr = 10 ** (gosnr_dB / 10)
+    result['ber'] = a[inverse] * erfc(np.sqrt(b[inverse] * snr))
+    result['margin'] = gosnr_dB - thresholds_dB
+    result['success'] = result['margin'] >= 0
+    return result
@@ -0,0 +1,157 @@
+"""
+timeseries.py: bounded in-process time series of monitor metrics
+
+MonitorTimeSeries samples the metrics of a set of monitors after each
+propagation event (see Network.add_listener) into preallocated ring
+buffers holding the last `samples` values per (monitor, channel,
+metric), so that its memory footprint is fixed however long the
+emulation runs. For example, for a gOSNR trend alarm:
+
+    series = MonitorTimeSeries(net, metrics=['gosnr'], samples=256)
+    ...
+    epochs, gosnr = series.series('r1-r2-amp1-monitor', 3, 'gosnr')
+    low = series.downsample('r1-r2-amp1-monitor', 3, 'gosnr', bins=8, how='min')
+
+Samples of a channel absent at a monitor are NaN.
+"""
+
+import time
+import warnings
+
+import numpy as np
+
+from mnoptical.metrics import METRICS, monitor_metrics
+
+
+class MonitorTimeSeries(object):
+    "Ring buffers of the last samples of monitor metrics"
+
+    reductions = {'min': np.nanmin, 'max': np.nanmax, 'mean': np.nanmean}
+
+    def __init__(self, net, monitors=None, metrics=('power', 'osnr', 'gosnr'),
+                 channels=90, samples=1024, attach=True):
+        """
+        :param net: Network object
+        :param monitors: list of Monitor objects or names (default: all)
+        :param metrics: list of metrics among metrics.METRICS
+        :param channels: int, number of channels recorded per monitor
+        :param samples: int, number of samples kept (ring buffer size)
+        :param attach: boolean, sample after each propagation event
+                       (False to call sample() explicitly)
+        """
+        for metric in metrics:
+            if metric not in METRICS:
+                raise ValueError("MonitorTimeSeries: unknown metric %s" % metric)
+        if monitors is None:
+            monitors = net.monitors()
+        by_name = {monitor.name: monitor for monitor in net.monitors()}
+        self.monitors = [by_name[m] if isinstance(m, str) else m for m in monitors]
+        self.monitor_index = {monitor.name: i for i, monitor in enumerate(self.monitors)}
+        self.net = net
+        self.metrics = list(metrics)
+        self.rows = [METRICS.index(metric) for metric in metrics]
+        self.channels = channels
+        self.samples = samples
+        self.values = np.full((samples, len(self.monitors), len(metrics), channels), np.nan)
+        self.epochs = np.zeros(samples, dtype=np.int64)
+        self.times = np.zeros(samples)
+        # total number of samples taken
+        self.count = 0
+        self.attached = attach
+        if attach:
+            net.add_listener(self.sample)
+
+    def sample(self, net=None, origin=None):
+        """
+        Record the current metrics, overwriting the oldest sample
+        when the buffers are full
+        (called by the network after each propagation event)
+        :param net: Network object (listener argument, unused)
+        :param origin: node that started the event (unused)
+        """
+        head = self.count % self.samples
+        for i, monitor in enumerate(self.monitors):
+            self.values[head, i] = monitor_metrics(monitor, self.channels)[self.rows]
+        self.epochs[head] = self.net.epoch
+        self.times[head] = time.time()
+        self.count += 1
+
+    def close(self):
+        "Stop sampling"
+        if self.attached:
+            self.net.remove_listener(self.sample)
+            self.attached = False
+
+    def __len__(self):
+        "Number of samples held"
+        return min(self.count, self.samples)
+
+    def order(self, last=None):
+        """
+        Return buffer positions from oldest to newest
+        :param last: int, only the last samples
+        """
+        size = len(self)
+        if last is not None:
+            size = min(size, last)
+        return np.arange(self.count - size, self.count) % self.samples
+
+    def series(self, monitor, channel, metric, last=None):
+        """
+        Return the recorded values of a metric, oldest first
+        :param monitor: Monitor object or name
+        :param channel: int, channel index
+        :param metric: string, metric name
+        :param last: int, only the last samples
+        :return: (epochs, values) arrays
+        """
+        position = self.order(last)
+        i, m, c = self.locate(monitor, channel, metric)
+        return self.epochs[position], self.values[position, i, m, c]
+
+    def window(self, last=None):
+        """
+        Return all recorded values, oldest first
+        :param last: int, only the last samples
+        :return: (epochs, values [sample, monitor, metric, channel])
+        """
+        position = self.order(last)
+        return self.epochs[position], self.values[position]
+
+    def downsample(self, monitor, channel, metric, bins, how='mean', last=None):
+        """
+        Reduce the recorded values of a metric to bins of
+        consecutive samples (the last bin may be shorter)
+        :param monitor: Monitor object or name
+        :param channel: int, channel index
+        :param metric: string, metric name
+        :param bins: int, number of bins
+        :param how: 'min', 'max' or 'mean' (NaN samples are ignored)
+        :param last: int, only the last samples
+        :return: (first epoch of each bin, reduced values) arrays
+        """
+        if how not in self.reductions:
+            raise ValueError("MonitorTimeSeries.downsample: unknown reduction %s" % how)
+        epochs, values = self.series(monitor, channel, metric, last)
+        if not len(values):
+            return epochs, values
+        size = -(-len(values) // bins)
+        padded = np.full(size * bins, np.nan)
+        padded[:len(values)] = values
+        starts = np.arange(0, len(values), size)
+        with warnings.catch_warnings():
+            # all-NaN bins reduce to NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            reduced = self.reductions[how](padded.reshape(bins, size)[:len(starts)], axis=1)
+        return epochs[starts], reduced
+
+    def locate(self, monitor, channel, metric):
+        "Return the buffer indices of a monitor, metric and channel"
+        name = monitor if isinstance(monitor, str) else monitor.name
+        if name not in self.monitor_index:
+            raise ValueError("MonitorTimeSeries: unknown monitor %s" % name)
+        if metric not in self.metrics:
+            raise ValueError("MonitorTimeSeries: metric %s not recorded" % metric)
+        if not 0 < channel <= self.channels:
+            raise ValueError("MonitorTimeSeries: channel %s not recorded" % channel)
+        return self.monitor_index[name], self.metrics.index(metric), channel - 1
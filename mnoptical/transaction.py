@@ -0,0 +1,247 @@
+"""
+transaction.py: batched reconfiguration of ROADMs and amplifiers
+
+Each Roadm.install_switch_rule(..., switch=True) or Amplifier.set_gain()
+call re-propagates the signals downstream of the reconfigured node, so
+provisioning many channels over a path propagates them many times.
+A Transaction queues reconfiguration operations instead (in the
+candidate operation format of parallel.py) and applies them on commit:
+
+    with net.batch() as batch:
+        for c in channels:
+            batch.install_switch_rule(r1, 4100 + c, 5211, [c])
+            batch.install_switch_rule(r2, 4111, 5211, [c])
+        batch.set_gain('r1-r2-amp1', 16)
+
+commit() first checks the queued operations for conflicts, then
+applies them without propagating (rule deletions first, then the other
+operations in order) and re-propagates, as a single propagation event,
+the line terminals whose signals reach the reconfigured nodes (see
+Transaction.sources). Propagation remains recursive per line terminal:
+a node downstream of several of them is recomputed once per terminal,
+rather than once per event in topological order.
+rollback() restores the state captured at commit time, so that a
+committed transaction can be undone as well; a failure during commit
+rolls it back automatically.
+"""
+
+from mnoptical.node import Roadm, LineTerminal
+from mnoptical.parallel import apply_operation
+
+
+class Transaction(object):
+    """
+    Queue of reconfiguration operations applied at once.
+    Use Network.begin() or Network.batch() rather than
+    instantiating this class directly.
+    """
+
+    # operation: (node type, number of arguments)
+    methods = {'install_switch_rule': (Roadm, (3,)),
+               'update_switch_rule': (Roadm, (3,)),
+               'delete_switch_rule': (Roadm, (2,)),
+               'set_reference_power': (Roadm, (1, 2)),
+               'set_gain': (None, (1,))}
+
+    def __init__(self, net):
+        """
+        :param net: Network object
+        """
+        self.net = net
+        self.operations = []
+        self.snapshot = None
+        # 'open', 'committed' or 'rolled back'
+        self.state = 'open'
+
+    def __len__(self):
+        return len(self.operations)
+
+    def add(self, operation):
+        """
+        Queue an operation
+        :param operation: tuple (method, node or node name, *args),
+                          see parallel.py
+        """
+        if self.state != 'open':
+            raise ValueError("Transaction.add: transaction is %s" % self.state)
+        method, node, args = operation[0], operation[1], operation[2:]
+        if method not in self.methods:
+            raise ValueError("Transaction.add: unknown method %s" % method)
+        node_type, arg_counts = self.methods[method]
+        node = self.net.find_node(node)
+        if node_type is None:
+            node_type = type(node) if hasattr(node, 'target_gain') else None
+        if node_type is None or not isinstance(node, node_type) or len(args) not in arg_counts:
+            raise ValueError("Transaction.add: invalid operation %s" % (operation,))
+        self.operations.append((method, node) + tuple(args))
+
+    def install_switch_rule(self, roadm, in_port, out_port, signal_indices):
+        """
+        Queue Roadm.install_switch_rule() (the source node is
+        the node connected to in_port)
+        :param roadm: Roadm object or name
+        :param signal_indices: int or list, signal index or indices
+        """
+        self.add(('install_switch_rule', roadm, in_port, out_port, signal_indices))
+
+    def update_switch_rule(self, roadm, in_port, signal_index, new_port_out):
+        "Queue Roadm.update_switch_rule()"
+        self.add(('update_switch_rule', roadm, in_port, signal_index, new_port_out))
+
+    def delete_switch_rule(self, roadm, in_port, signal_index):
+        "Queue Roadm.delete_switch_rule()"
+        self.add(('delete_switch_rule', roadm, in_port, signal_index))
+
+    def set_reference_power(self, roadm, ref_power_dBm, ch_index=None):
+        "Queue Roadm.set_reference_power() (VOA reference power)"
+        args = (ref_power_dBm,) if ch_index is None else (ref_power_dBm, ch_index)
+        self.add(('set_reference_power', roadm) + args)
+
+    def set_gain(self, amplifier, gain_dB):
+        """
+        Queue Amplifier.set_gain()
+        :param amplifier: Amplifier object or name (including
+                          ROADM preamp and boost amplifiers)
+        """
+        self.add(('set_gain', amplifier, gain_dB))
+
+    def validate(self):
+        """
+        Check that the queued operations do not conflict: deleted
+        rules exist; then, applied in order, a rule is installed once
+        per ROADM input port and channel, a channel is switched to an
+        output port from a single input port, and updated rules exist.
+        Deletions are applied first (see apply), so a transaction can
+        move a channel or port from one rule to another in any order.
+        :raise ValueError: describing the first conflict found
+        """
+        # switch tables as modified by the operations so far, and
+        # the rules installed by this transaction
+        tables, installed = {}, set()
+        for method, node, in_port, channel in self.deletions():
+            table = tables.setdefault(node, dict(node.switch_table))
+            if (in_port, channel) not in table:
+                raise ValueError("Transaction.validate: %s has no rule for channel %d "
+                                 "on port %d to delete" % (node, channel, in_port))
+            del table[in_port, channel]
+        for operation in self.operations:
+            method, node, args = operation[0], operation[1], operation[2:]
+            if method not in ('install_switch_rule', 'update_switch_rule'):
+                continue
+            table = tables.setdefault(node, dict(node.switch_table))
+            if method == 'install_switch_rule':
+                in_port, out_port, channels = args
+                if type(channels) not in (list, set, tuple):
+                    channels = [channels]
+                for channel in channels:
+                    for rule, rule_out_port in list(table.items()):
+                        if rule[1] != channel:
+                            continue
+                        if rule[0] == in_port and rule_out_port != out_port and \
+                                (node, rule) in installed:
+                            raise ValueError(
+                                "Transaction.validate: %s channel %d from port %d switched to "
+                                "ports %d and %d" % (node, channel, in_port, rule_out_port, out_port))
+                        if rule[0] != in_port and rule_out_port == out_port:
+                            if (node, rule) in installed:
+                                raise ValueError(
+                                    "Transaction.validate: %s channel %d switched to port %d "
+                                    "from ports %d and %d" % (node, channel, out_port, rule[0], in_port))
+                            # preempted, as by Roadm.check_switch_rule()
+                            del table[rule]
+                    table[in_port, channel] = out_port
+                    installed.add((node, (in_port, channel)))
+            else:
+                in_port, channel, out_port = args
+                if (in_port, channel) not in table:
+                    raise ValueError("Transaction.validate: %s has no rule for channel %d "
+                                     "on port %d to update" % (node, channel, in_port))
+                table[in_port, channel] = out_port
+
+    def deletions(self):
+        "Return the queued delete_switch_rule operations"
+        return [operation for operation in self.operations
+                if operation[0] == 'delete_switch_rule']
+
+    def affected_nodes(self):
+        "Return the LTs and ROADMs whose sub-networks the operations affect"
+        owners = {}
+        for roadm in self.net.roadms:
+            for amp in (roadm.preamp, roadm.boost):
+                if amp is not None:
+                    owners[amp] = roadm
+        nodes = set()
+        for operation in self.operations:
+            node = operation[1]
+            if node in owners:
+                node = owners[node]
+            elif not isinstance(node, (Roadm, LineTerminal)):
+                link = getattr(node, 'link', None)
+                if link is None:
+                    continue
+                node = link.src_node
+            nodes.add(node)
+        return nodes
+
+    def sources(self):
+        """
+        Return the transmitting LTs whose signals reach the affected
+        nodes, or which are connected to them, in network order;
+        as with direct calls, other signals are not re-propagated
+        """
+        transmitters = {}
+        for lt in self.net.line_terminals:
+            for tx in lt.tx_to_channel.values():
+                transmitters[tx['optical_signal']] = lt
+        sources = set()
+        for node in self.affected_nodes():
+            if isinstance(node, LineTerminal):
+                sources.add(node)
+                continue
+            for optical_signals in node.port_to_optical_signal_in.values():
+                sources.update(transmitters[optical_signal] for optical_signal in optical_signals
+                               if optical_signal in transmitters)
+            sources.update(src_node for src_node in node.port_to_node_in.values()
+                           if isinstance(src_node, LineTerminal))
+        return [lt for lt in self.net.line_terminals if lt in sources and lt.tx_to_channel]
+
+    def commit(self):
+        """
+        Validate and apply the queued operations, then propagate
+        their signals once (see Network.commit)
+        """
+        if self.state != 'open':
+            raise ValueError("Transaction.commit: transaction is %s" % self.state)
+        self.validate()
+        self.net.commit(self)
+
+    def apply(self):
+        """
+        Apply the operations and propagate from sources()
+        (called by Network.commit)
+        """
+        self.snapshot = self.net.snapshot()
+        try:
+            deletions = self.deletions()
+            for operation in deletions:
+                apply_operation(self.net, operation)
+            for operation in self.operations:
+                if operation[0] != 'delete_switch_rule':
+                    apply_operation(self.net, operation)
+            for lt in self.sources():
+                lt.turn_on(safe_switch=True)
+        except BaseException:
+            self.net.restore(self.snapshot)
+            self.state = 'rolled back'
+            raise
+        self.state = 'committed'
+
+    def rollback(self):
+        """
+        Discard the queued operations; if the transaction was
+        committed, restore the network state from before the commit
+        """
+        if self.state == 'committed':
+            self.net.restore(self.snapshot)
+        self.operations = []
+        self.state = 'rolled back'
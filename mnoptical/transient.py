@@ -0,0 +1,203 @@
+"""
+transient.py: time-stepped EDFA gain dynamics for add/drop transients
+
+Propagation computes the steady state, in which automatic gain control
+(AGC, see Amplifier.compute_power_excursions) corrects each amplifier
+instantly. EdfaCascade instead advances the gains of a cascade of
+amplifiers in time, starting from the current steady state, to study
+the power transients that follow the add or drop of channels:
+
+    cascade = EdfaCascade.from_path(net, ['r1', 'r2', 'r3'])
+    result = cascade.run(2e-3, events=[(1e-4, 'drop', range(1, 9))])
+    result.power_dBm['r2-r3-amp1-monitor']  # power of each channel over time
+
+Each amplifier has one gain state g (dB) that relaxes toward its
+saturated gain with time constant tau,
+
+    dg/dt = (g0 - 10 log10(1 + Pout/Psat) - g) / tau
+
+where Pout is its total output power and Psat its saturation output
+power; with AGC, the small-signal gain g0 is steered (time constant
+agc_tau) so that the mean channel gain returns to its initial value.
+Per-channel gain ripple and the losses between amplifiers (fiber
+spans, ROADMs) are taken from the steady-state signal states and
+remain fixed during the transient, so the channel powers of the whole
+cascade are computed by one cumulative sum per time step. Power
+trajectories are recorded at the monitors of the amplifiers, at their
+input or output according to the monitor mode.
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from mnoptical.node import LineTerminal, Roadm
+from mnoptical.units import abs_to_db
+
+
+# Trajectories of EdfaCascade.run(): recorded times (s), channel
+# indices, gain of each amplifier (time x amplifier), and dict of
+# monitor name to power (time x channel, nan when dropped)
+TransientResult = namedtuple('TransientResult', 'time channels gain_dB power_dBm')
+
+
+class EdfaCascade(object):
+    "Gain dynamics of a cascade of amplifiers"
+
+    def __init__(self, amplifiers, tau=1e-4, agc=True, agc_tau=1e-3,
+                 saturation_power_dBm=20.0):
+        """
+        :param amplifiers: list of Amplifier objects, in signal order,
+                           with the signal states of a propagation
+        :param tau: float or array (per amplifier), gain time constant (s)
+        :param agc: boolean, model automatic gain control
+        :param agc_tau: float or array, AGC time constant (s)
+        :param saturation_power_dBm: float or array, saturation
+                                     output power (dBm)
+        """
+        if not amplifiers:
+            raise ValueError("EdfaCascade: no amplifiers")
+        self.amplifiers = list(amplifiers)
+        # the channels through the whole cascade
+        first = self.amplifiers[0]
+        optical_signals = sorted((s for s in first.port_to_optical_signal_in.get(0, ())
+                                  if self.traverses(s)), key=lambda s: s.index)
+        if not optical_signals:
+            raise ValueError("EdfaCascade: no signal traverses %s" % self.amplifiers)
+        self.channels = np.array([s.index for s in optical_signals], dtype=int)
+        shape = (len(self.amplifiers), len(optical_signals))
+        power_in, power_out = np.empty(shape), np.empty(shape)
+        for k, amplifier in enumerate(self.amplifiers):
+            for i, optical_signal in enumerate(optical_signals):
+                power_in[k, i] = optical_signal.loc_in_to_state[amplifier]['power']
+                power_out[k, i] = optical_signal.loc_out_to_state[amplifier]['power']
+        power_in, power_out = abs_to_db(power_in * 1e3), abs_to_db(power_out * 1e3)
+        self.launch_dBm = power_in[0]
+        # loss from each amplifier output to the next amplifier input
+        self.loss_dB = np.zeros(shape)
+        self.loss_dB[1:] = power_out[:-1] - power_in[1:]
+        self.gain_dB = np.array([amplifier.system_gain for amplifier in self.amplifiers])
+        self.ripple_dB = power_out - power_in - self.gain_dB[:, None]
+        self.tau = np.broadcast_to(np.asarray(tau, dtype=float), self.gain_dB.shape)
+        self.agc = agc
+        self.agc_tau = np.broadcast_to(np.asarray(agc_tau, dtype=float), self.gain_dB.shape)
+        self.saturation_power = 10 ** (np.broadcast_to(
+            np.asarray(saturation_power_dBm, dtype=float), self.gain_dB.shape) / 10)
+
+    def traverses(self, optical_signal):
+        "Check whether a signal has states at all amplifiers"
+        return all(amplifier in optical_signal.loc_in_to_state and
+                   amplifier in optical_signal.loc_out_to_state
+                   for amplifier in self.amplifiers)
+
+    @classmethod
+    def from_path(cls, net, path, **params):
+        """
+        Build the cascade of the amplifiers along a path: ROADM
+        preamp and boost amplifiers, link boost and in-line amplifiers
+        :param net: Network object
+        :param path: list of nodes (or names)
+        :param params: further EdfaCascade options
+        """
+        path = [net.find_node(node) for node in path]
+        amplifiers = []
+        for node, next_node in zip(path, path[1:]):
+            link = net.find_link_from_nodes(node, next_node)
+            if link is None:
+                raise ValueError("EdfaCascade.from_path: no link from %s to %s" % (node, next_node))
+            hop = [node.boost if isinstance(node, Roadm) else None, link.boost_amp]
+            hop += [amplifier for _span, amplifier in link.spans]
+            if isinstance(next_node, Roadm) and not isinstance(node, LineTerminal):
+                hop.append(next_node.preamp)
+            amplifiers.extend(amplifier for amplifier in hop
+                              if amplifier is not None and amplifier not in amplifiers)
+        return cls(amplifiers, **params)
+
+    def power_dBm(self, gain_dB):
+        """
+        Compute the input and output power of all channels
+        at all amplifiers
+        :param gain_dB: array, gain of each amplifier
+        :return: input, output: (amplifier x channel) arrays
+        """
+        hop_dB = self.ripple_dB + gain_dB[:, None]
+        step_dB = -self.loss_dB
+        step_dB[1:] += hop_dB[:-1]
+        input_dBm = self.launch_dBm + np.cumsum(step_dB, axis=0)
+        return input_dBm, input_dBm + hop_dB
+
+    def monitors(self):
+        "Return the monitors of the amplifiers of the cascade"
+        return [amplifier.monitor for amplifier in self.amplifiers
+                if getattr(amplifier, 'monitor', None) is not None]
+
+    def run(self, duration, events=(), dt=1e-6, record=None, record_every=1):
+        """
+        Advance the gains of the cascade in time steps of dt, from
+        the steady state at time 0, with channels added and dropped
+        :param duration: float, simulated time (s)
+        :param events: list of (time, 'add' or 'drop', channels);
+                       channels are those of the steady state
+        :param dt: float, time step (s)
+        :param record: list of monitors (or names) of amplifiers of
+                       the cascade whose powers are recorded
+                       (default: all, see monitors())
+        :param record_every: int, record one of every record_every steps
+        :return: TransientResult
+        """
+        if not 0 < dt < min(self.tau.min(), self.agc_tau.min() if self.agc else np.inf):
+            raise ValueError("EdfaCascade.run: time step must be below the time constants")
+        monitors = {monitor.name: monitor for monitor in self.monitors()}
+        names = list(monitors) if record is None else \
+            [getattr(monitor, 'name', monitor) for monitor in record]
+        # (monitor, amplifier index, input side)
+        record = []
+        for name in names:
+            if name not in monitors:
+                raise ValueError("EdfaCascade.run: no monitor %s in the cascade" % name)
+            monitor = monitors[name]
+            record.append((monitor, self.amplifiers.index(monitor.component), monitor.mode == 'in'))
+        index = {channel: i for i, channel in enumerate(self.channels.tolist())}
+        schedule = []
+        for time, action, channels in sorted(events, key=lambda event: event[0]):
+            if action not in ('add', 'drop'):
+                raise ValueError("EdfaCascade.run: unknown event %s" % action)
+            unknown = set(np.atleast_1d(channels).tolist()) - set(index)
+            if unknown:
+                raise ValueError("EdfaCascade.run: unknown channels %s" % sorted(unknown))
+            schedule.append((int(round(time / dt)), action == 'add',
+                             [index[channel] for channel in np.atleast_1d(channels).tolist()]))
+
+        steps = int(round(duration / dt))
+        gain = self.gain_dB.copy()
+        active = np.ones(len(self.channels), dtype=bool)
+        _power_in, output = self.power_dBm(gain)
+        total = (10 ** (output / 10)).sum(axis=1)
+        # small-signal gain and AGC setpoint of the steady state
+        small_signal = gain + 10 * np.log10(1 + total / self.saturation_power)
+        setpoint = gain + self.ripple_dB.mean(axis=1)
+
+        times, gains = [], []
+        powers = [[] for _monitor in record]
+        for step in range(steps + 1):
+            while schedule and schedule[0][0] <= step:
+                _step, on, channels = schedule.pop(0)
+                active[channels] = on
+            power_in, output = self.power_dBm(gain)
+            if step % record_every == 0:
+                times.append(step * dt)
+                gains.append(gain.copy())
+                for (_monitor, k, side_in), power in zip(record, powers):
+                    power.append(np.where(active, (power_in if side_in else output)[k], np.nan))
+            if step == steps:
+                break
+            total = (10 ** (output / 10))[:, active].sum(axis=1)
+            saturated = small_signal - 10 * np.log10(1 + total / self.saturation_power)
+            if self.agc and active.any():
+                mean_gain = gain + self.ripple_dB[:, active].mean(axis=1)
+                small_signal = small_signal + dt * (setpoint - mean_gain) / self.agc_tau
+            gain = gain + dt * (saturated - gain) / self.tau
+
+        return TransientResult(
+            np.array(times), self.channels.copy(), np.array(gains),
+            {monitor.name: np.array(power) for (monitor, _k, _in), power in zip(record, powers)})
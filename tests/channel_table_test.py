@@ -0,0 +1,38 @@
+"""
+    This script builds a linear topology and checks that per-channel
+    parameter tables (amplifier noise figure and ripple, ROADM
+    insertion loss and target power) are shared between elements
+    with identical parameters, and copied when one element is
+    reconfigured.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+
+
+net = LinearTopology.build(op=0, non=3)
+r1, r2, r3 = net.roadms
+amps = [node for node in net.name_to_node.values() if hasattr(node, 'target_gain')]
+
+print("*** %d amplifiers and %d ROADMs" % (len(amps), len(net.roadms)))
+assert len({id(amp.noise_figure.array) for amp in amps}) == 1
+assert len({id(amp.wavelength_dependent_gain.array) for amp in amps}) == 1
+assert r1.target_output_power_dBm.array is r2.target_output_power_dBm.array
+assert amps[0].noise_figure[1] == amps[0].noise_figure[90] == 5.5
+assert r1.target_output_power_dBm[45] == -17
+
+print("*** Reconfiguring r2 channel 3")
+r2.set_reference_power(3, ch_index=3, switch=False)
+assert r2.target_output_power_dBm[3] == -14
+assert r2.target_output_power_dBm[4] == -17
+assert r1.target_output_power_dBm[3] == r3.target_output_power_dBm[3] == -17
+assert r1.target_output_power_dBm.array is r3.target_output_power_dBm.array
+assert r2.target_output_power_dBm.array is not r1.target_output_power_dBm.array
+
+print("*** Snapshot keeps r2 channel 3 after a later change")
+snapshot = net.snapshot()
+r2.set_reference_power(1, switch=False)
+assert r2.target_output_power_dBm[3] == -16
+net.restore(snapshot)
+assert r2.target_output_power_dBm[3] == -14
+assert r2.target_output_power_dBm[4] == -17
+print("*** Channel table tests passed")
@@ -0,0 +1,81 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+
+    It tests PowerEqualizer: the VOA targets of all the ROADM degrees
+    along the path are corrected at once, one propagation event per
+    iteration, until the channel powers match the target spectrum.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+from mnoptical.equalization import PowerEqualizer
+from mnoptical.units import abs_to_db
+import numpy as np
+
+
+num_wavelengths = 10
+channel_indexes = list(range(1, num_wavelengths + 1))
+# unequal launch powers
+powers = [-2 + 0.5 * (c % 4) for c in channel_indexes]
+
+net = LinearTopology.build(op=0, non=3)
+lt_1, lt_3 = net.name_to_node['lt_1'], net.name_to_node['lt_3']
+r1, r2, r3 = net.roadms
+for c, power in zip(channel_indexes, powers):
+    r1.install_switch_rule(4100 + c, 5211, [c], src_node=lt_1, switch=False)
+    r2.install_switch_rule(4111, 5211, [c], src_node=r1, switch=False)
+    r3.install_switch_rule(4111, 5200 + c, [c], src_node=r2, switch=False)
+lt_1.provision(channel_indexes, channel_indexes, out_ports=channel_indexes,
+               powers_dBm=powers, turn_on=False)
+lt_3.provision(channel_indexes, channel_indexes, in_ports=channel_indexes,
+               turn_on=False)
+lt_1.turn_on()
+lt_3.monitor.modify_mode('in')
+
+
+def spread(monitor):
+    power = abs_to_db(monitor.snapshot()['power'] * 1e3)
+    return power.max() - power.min()
+
+
+# the ROADMs level all channels to the same VOA target by default
+print("*** Power spread at lt_3 before: %.3f dB" % spread(lt_3.monitor))
+
+events = []
+net.add_listener(lambda net, origin: events.append(origin))
+# target spectrum: flat, except channel 5 at -1 dBm
+target = {c: -1 if c == 5 else 0 for c in channel_indexes}
+equalizer = PowerEqualizer.from_path(net, ['lt_1', 'r1', 'r2', 'r3', 'lt_3'],
+                                     target_dBm=target, tolerance_dB=0.01)
+assert [degree.roadm for degree in equalizer.degrees] == [r1, r2, r3]
+result = equalizer.run()
+print("*** Errors (dB):", np.round(result.errors_dB, 4))
+assert result.converged and 0 < result.iterations <= 5
+assert len(events) == result.iterations
+for roadm in (r1, r2, r3):
+    channels, power_dBm = PowerEqualizer.measure(equalizer.degrees[net.roadms.index(roadm)])
+    assert list(channels) == channel_indexes
+    assert np.allclose(power_dBm, [target[c] for c in channel_indexes], atol=0.01)
+
+# measured at the receiver instead: flat at lt_3, at its mean power
+monitors = {'r3': lt_3.monitor}
+equalizer = PowerEqualizer.from_path(net, ['r1', 'r2', 'r3', 'lt_3'], monitors=monitors)
+result = equalizer.run()
+print("*** Errors at lt_3 (dB):", np.round(result.errors_dB, 4))
+assert result.converged
+assert spread(lt_3.monitor) < 2 * equalizer.tolerance_dB
+
+# a single iteration reports that it has not converged
+r2.set_reference_power(np.array([1.0, 2.0]), [2, 7])
+assert np.isclose(r2.target_output_power_dBm[7] + r2.insertion_loss_dB[7], 2.0)
+result = PowerEqualizer(net, [(r2, 5211)], target_dBm=0, max_iterations=1,
+                        step=0.5).run()
+assert not result.converged and result.errors_dB[1] < result.errors_dB[0]
+
+try:
+    PowerEqualizer(net, [(r2, 4111)])
+    assert False, "input port accepted"
+except ValueError as e:
+    print("*** Rejected:", e)
+print("*** Equalization tests passed")
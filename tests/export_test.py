@@ -0,0 +1,95 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+
+    It tests ColumnarExporter: monitor sweeps and per-location signal
+    states are streamed in small chunks to npz and CSV files (and
+    Parquet when pyarrow is installed), and read back unchanged.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+from mnoptical.export import ColumnarExporter, npz_chunks, location_table, pyarrow
+from mnoptical.node import SignalTracing
+import numpy as np
+import os
+import tempfile
+
+
+num_wavelengths = 10
+channel_indexes = list(range(1, num_wavelengths + 1))
+
+net = LinearTopology.build(op=0, non=3)
+lt_1, lt_3 = net.name_to_node['lt_1'], net.name_to_node['lt_3']
+r1, r2, r3 = net.roadms
+for c in channel_indexes:
+    lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=c)
+    lt_3.assoc_rx_to_channel(lt_3.id_to_transceivers[c], c, in_port=c)
+    r1.install_switch_rule(4100 + c, 5211, [c], src_node=lt_1, switch=False)
+    r2.install_switch_rule(4111, 5211, [c], src_node=r1, switch=False)
+    r3.install_switch_rule(4111, 5200 + c, [c], src_node=r2, switch=False)
+lt_1.turn_on()
+
+tmp = tempfile.mkdtemp()
+sweeps = []
+npz_path, csv_path = os.path.join(tmp, 'sweep.npz'), os.path.join(tmp, 'sweep.csv')
+with ColumnarExporter(npz_path, chunk_rows=16) as npz, \
+        ColumnarExporter(csv_path, chunk_rows=16) as csv:
+    for step in range(3):
+        sweep = net.monitor_sweep()
+        sweeps.append(sweep)
+        npz.append(sweep, step=step)
+        csv.append(sweep, step=step)
+        r1.delete_switch_rule(4100 + step + 1, step + 1, switch=True)
+    # the buffer never holds more than one chunk
+    assert len(npz.buffer) == 16
+rows = sum(len(sweep) for sweep in sweeps)
+print("*** Exported", rows, "monitor rows in", npz.chunks, "chunks")
+assert npz.rows == rows and npz.chunks == -(-rows // 16)
+
+chunks = list(npz_chunks(npz_path))
+assert max(len(chunk) for chunk in chunks) == 16
+table = np.concatenate(chunks)
+assert table.dtype.names == ('step',) + sweeps[0].dtype.names
+expected = np.concatenate(sweeps)
+for field in sweeps[0].dtype.names:
+    assert np.array_equal(table[field], expected[field]), field
+assert np.array_equal(table['step'], np.repeat([0, 1, 2], [len(s) for s in sweeps]))
+
+loaded = np.genfromtxt(csv_path, delimiter=',', names=True, dtype=None, encoding='utf-8')
+assert len(loaded) == rows
+assert np.array_equal(loaded['monitor'], expected['monitor'])
+assert np.allclose(loaded['gosnr'], expected['gosnr'])
+
+# per-location state, with columns given as a dict
+locations = location_table(net)
+path = os.path.join(tmp, 'locations.npz')
+with ColumnarExporter(path, chunk_rows=100) as exporter:
+    exporter.append({'channel': locations['channel'], 'power': locations['power']})
+table = np.concatenate(list(npz_chunks(path)))
+assert np.array_equal(table['power'], locations['power'])
+assert set(locations['side']) == {'in', 'out'}
+# blocked channels only reach r1
+assert set(locations['channel']) == set(channel_indexes)
+assert set(locations['location'][locations['channel'] == 1]) <= {'lt_1', 'r1'} | \
+    {label for label in locations['location'] if label.startswith('(lt_1->r1)')}
+
+if pyarrow:
+    import pyarrow.parquet
+    path = os.path.join(tmp, 'sweep.parquet')
+    with ColumnarExporter(path, chunk_rows=16) as exporter:
+        exporter.append(sweeps[0])
+    assert pyarrow.parquet.read_table(path).num_rows == len(sweeps[0])
+
+# a signal's path as a table
+lt_3.monitor.modify_mode('in')
+signal = lt_3.monitor.get_optical_signals()[0]
+path = SignalTracing.signal_path(lt_1, signal)
+states = SignalTracing.path_table(signal, path)
+assert list(states['location']) == [getattr(loc, 'name', str(loc)) for loc in path]
+for row, entry in zip(states, SignalTracing.path_state(signal, path)):
+    if entry.outstate:
+        assert row['out_power'] == entry.outstate['power']
+    else:
+        assert np.isnan(row['out_power'])
+print("*** Export tests passed")
@@ -0,0 +1,146 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+
+    It tests gain changes with localized recomputation: Network.set_gain()
+    recomputes the signals from the amplifier onward, and stops at the
+    ROADM output ports whose signals keep their previous state.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+from mnoptical.node import Roadm, Amplifier
+import numpy as np
+
+
+num_wavelengths = 10
+channel_indexes = list(range(1, num_wavelengths + 1))
+
+# count ROADM switch events
+switched = []
+switch = Roadm.switch
+
+
+def counting_switch(self, *args, **kwargs):
+    switched.append(self.name)
+    return switch(self, *args, **kwargs)
+
+
+Roadm.switch = counting_switch
+
+
+def build():
+    net = LinearTopology.build(op=0, non=3)
+    lt_1, lt_3 = net.name_to_node['lt_1'], net.name_to_node['lt_3']
+    r1, r2, r3 = net.roadms
+    for c in channel_indexes:
+        lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=c)
+        lt_3.assoc_rx_to_channel(lt_3.id_to_transceivers[c], c, in_port=c)
+        r1.install_switch_rule(4100 + c, 5211, [c], src_node=lt_1, switch=False)
+        r2.install_switch_rule(4111, 5211, [c], src_node=r1, switch=False)
+        r3.install_switch_rule(4111, 5200 + c, [c], src_node=r2, switch=False)
+    lt_1.turn_on()
+    lt_3.monitor.modify_mode('in')
+    return net
+
+
+def received(net):
+    return net.name_to_node['lt_3'].monitor.snapshot()
+
+
+reference, net = build(), build()
+
+# same result as the full re-propagation of Amplifier.set_gain()
+amp = reference.name_to_node['r1-r2-amp1']
+amp.set_gain(amp.target_gain - 1)
+previous = net.set_gain('r1-r2-amp1', amp.target_gain)
+assert previous == amp.target_gain + 1
+expected, result = received(reference), received(net)
+for field in ('power', 'ase_noise', 'nli_noise', 'gosnr'):
+    assert np.allclose(result[field], expected[field], rtol=1e-12), field
+
+# setting the same gain again stops at r2, where nothing changed
+del switched[:]
+net.set_gain('r1-r2-amp1', amp.target_gain)
+print("*** Switched after an unchanged gain:", switched)
+assert switched == ['r2']
+assert np.array_equal(received(net), result)
+
+# r2 re-levels the signal power, but the noise it carries changes:
+# the recomputation goes on to the receivers
+del switched[:]
+net.set_gain('r1-r2-amp1', amp.target_gain - 1)
+print("*** Switched after a gain change:", switched)
+assert switched == ['r2', 'r3']
+assert not np.allclose(received(net)['ase_noise'], result['ase_noise'])
+# without skipping, even an unchanged gain propagates to the receivers
+del switched[:]
+net.set_gain('r1-r2-amp1', amp.target_gain - 1, skip_unchanged=False)
+assert switched == ['r2', 'r3']
+net.set_gain('r1-r2-amp1', amp.target_gain)
+
+# ROADM amplifiers: only the signals through the preamp are switched
+r2 = reference.roadms[1]
+r2.set_preamp_gain(r2.preamp.target_gain + 1)
+del switched[:]
+net.set_gain('r2-preamp', r2.preamp.target_gain)
+print("*** Switched after a preamp gain change:", switched)
+expected, result = received(reference), received(net)
+for field in ('power', 'ase_noise', 'nli_noise', 'gosnr'):
+    assert np.allclose(result[field], expected[field], rtol=1e-9), field
+try:
+    net.set_gain('r9-preamp', 10)
+    assert False, "unknown amplifier accepted"
+except ValueError as e:
+    print("*** Rejected:", e)
+
+# ROADM gain setters compute their amplifier once, when switching
+propagated = []
+propagate = Amplifier.propagate
+
+
+def counting_propagate(self, *args, **kwargs):
+    propagated.append(self.name)
+    return propagate(self, *args, **kwargs)
+
+
+Amplifier.propagate = counting_propagate
+r2 = net.roadms[1]
+r2.set_preamp_gain(r2.preamp.target_gain)
+assert propagated.count('r2-preamp') == 1, propagated
+del propagated[:]
+r2.set_boost_gain(r2.boost.target_gain)
+assert propagated.count('r2-boost') == 1, propagated
+
+# with two degrees into r2 (from r1 and r3), the preamp is still
+# computed once, and the signals of both degrees are switched
+net = LinearTopology.build(op=0, non=3, bidirectional=True)
+lt_1, lt_2, lt_3 = net.line_terminals
+r1, r2, r3 = net.roadms
+degrees = {r1: (lt_1, channel_indexes[:5]), r3: (lt_3, channel_indexes[5:])}
+for roadm, (lt, channels) in degrees.items():
+    out_port = net.find_link_and_out_port_from_nodes(roadm, r2)
+    in_port = net.find_link_and_in_port_from_nodes(roadm, r2)
+    for c in channels:
+        lt.assoc_tx_to_channel(lt.id_to_transceivers[c], c, out_port=c)
+        lt_2.assoc_rx_to_channel(lt_2.id_to_transceivers[c], c, in_port=c)
+        roadm.install_switch_rule(4100 + c, out_port, [c], src_node=lt)
+        r2.install_switch_rule(in_port, 5200 + c, [c], src_node=roadm)
+lt_1.turn_on()
+lt_3.turn_on()
+
+
+def preamp_power():
+    return {optical_signal.index: optical_signal.loc_out_to_state[r2.preamp]['power']
+            for optical_signal in r2.preamp.port_to_optical_signal_out[0]}
+
+
+before = preamp_power()
+del propagated[:]
+r2.set_preamp_gain(r2.preamp.target_gain + 1)
+assert propagated.count('r2-preamp') == 1, propagated
+after = preamp_power()
+assert sorted(after) == channel_indexes
+for c in channel_indexes:
+    assert np.isclose(after[c] / before[c], 10 ** 0.1), c
+print("*** Gain change tests passed")
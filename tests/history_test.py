@@ -0,0 +1,84 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+
+    It tests HistoryRecorder and History: the signal states after each
+    propagation event (turn on, gain change, rule deletion) are
+    appended to memory-mapped files and read back by location,
+    channel and epoch.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+from mnoptical.history import HistoryRecorder, History, IN, OUT
+import numpy as np
+import shutil
+import tempfile
+
+
+num_wavelengths = 10
+channel_indexes = list(range(1, num_wavelengths + 1))
+
+net = LinearTopology.build(op=0, non=3)
+lt_1, lt_3 = net.name_to_node['lt_1'], net.name_to_node['lt_3']
+r1, r2, r3 = net.roadms
+for c in channel_indexes:
+    lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=c)
+    lt_3.assoc_rx_to_channel(lt_3.id_to_transceivers[c], c, in_port=c)
+    r1.install_switch_rule(4100 + c, 5211, [c], src_node=lt_1, switch=False)
+    r2.install_switch_rule(4111, 5211, [c], src_node=r1, switch=False)
+    r3.install_switch_rule(4111, 5200 + c, [c], src_node=r2, switch=False)
+
+path = tempfile.mkdtemp()
+try:
+    # a tiny initial capacity exercises growing the records file
+    recorder = HistoryRecorder(net, path, capacity=16)
+    lt_1.turn_on()
+    turned_on = net.epoch
+    net.name_to_node['r1-r2-amp1'].set_gain(15)
+    r1.delete_switch_rule(4101, 1, switch=True)
+    live = net.name_to_node['r2-r3-amp1'].monitor.get_dict_power()
+    recorder.close()
+
+    history = History(path)
+    print("*** %d records in %d epochs, %d locations" %
+          (len(history), len(history.epochs), len(history.locations)))
+    assert len(history.epochs) == 3
+    assert list(history.epochs['epoch']) == [turned_on, turned_on + 1, turned_on + 2]
+
+    # all channels reach lt3 at first; channel 1 is blocked last
+    at_lt3 = history.select(locations=['lt_3'], side=IN)
+    first, last = (at_lt3[at_lt3['epoch'] == e] for e in history.epochs['epoch'][[0, -1]])
+    assert list(first['channel']) == channel_indexes
+    assert list(last['channel']) == channel_indexes[1:]
+
+    # the gain change shows at r2's input
+    ch5 = history.select(locations=['r2'], channels=[5], side=IN)
+    assert len(ch5) == 3 and ch5['power'][0] != ch5['power'][1]
+
+    # the last epoch matches a live amplifier monitor (output state)
+    amp_out = history.select(locations=['r2-r3-amp1'], epochs=[net.epoch], side=OUT)
+    power = {c: p for c, p in zip(amp_out['channel'].tolist(), amp_out['power'])}
+    assert len(power) == len(live)
+    for signal, value in live.items():
+        assert power[signal.index] == value
+    assert len(history.epoch(net.epoch)) == len(history.select(epochs=[net.epoch]))
+
+    # a channel-only query copies the matching records only
+    concatenate, copied = np.concatenate, []
+
+    def counting_concatenate(parts, *args, **kwargs):
+        copied.append(sum(len(part) for part in parts))
+        return concatenate(parts, *args, **kwargs)
+
+    np.concatenate = counting_concatenate
+    try:
+        ch5 = history.select(channels=[5])
+    finally:
+        np.concatenate = concatenate
+    assert len(ch5) == np.count_nonzero(history.records['channel'] == 5)
+    assert (ch5['channel'] == 5).all() and copied == [len(ch5)]
+    assert ch5.nbytes < history.records.nbytes / (num_wavelengths - 1)
+finally:
+    shutil.rmtree(path)
+print("*** History tests passed")
@@ -0,0 +1,32 @@
+"""
+    This script models a linear topology between line terminals
+    with twenty ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> ... ---> r20 ----> lt20
+
+    It tests the (src, dst) link index of Network: the link and port
+    lookups for every pair of nodes match a scan of net.links.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+
+
+net = LinearTopology.build(op=0, non=20)
+nodes = net.line_terminals + net.roadms
+lookups = 0
+for src in nodes:
+    for dst in nodes:
+        links = [link for link in net.links
+                 if link.src_node is src and link.dst_node is dst]
+        assert net.find_links_from_nodes(src, dst) == links
+        assert net.find_link_from_nodes(src, dst) is (links[0] if links else None)
+        out_port = net.find_link_and_out_port_from_nodes(src, dst)
+        in_port = net.find_link_and_in_port_from_nodes(src, dst)
+        if links:
+            assert out_port == src.node_to_port_out[dst][0]
+            assert in_port == dst.node_to_port_in[src][0]
+            lookups += len(links)
+        else:
+            assert out_port is None and in_port is None
+print("*** Checked", len(nodes) ** 2, "node pairs,", lookups, "links")
+assert lookups == len(net.links)
+print("*** Link index tests passed")
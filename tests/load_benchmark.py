@@ -0,0 +1,65 @@
+"""
+    This script benchmarks full-load propagation and teardown
+    on a linear topology with 90 channels:
+        lt1 ---> r1 ---> r2 ---> ... ---> rN ----> lt2
+
+    All channels are turned on at lt1 and received at lt2, then
+    torn down again with LineTerminal.turn_off(). Run with an
+    optional argument for the number of ROADMs (default 4).
+"""
+
+import mnoptical.network as network
+from mnoptical.node import Node, Transceiver
+from mnoptical.topo.linear import Span, add_amp, build_link, m
+import sys
+import time
+
+
+Node.debugger = False
+
+num_roadms = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+num_wavelengths = 90
+channel_indexes = list(range(1, num_wavelengths + 1))
+
+start = time.time()
+net = network.Network()
+transceivers = lambda: [Transceiver(c, 'tr%d' % c, operation_power=0) for c in channel_indexes]
+lt_1 = net.add_lt('lt_1', transceivers=transceivers())
+lt_2 = net.add_lt('lt_2', transceivers=transceivers())
+roadms = [net.add_roadm('r%d' % (i + 1), insertion_loss_dB=17, reference_power_dBm=0,
+                        preamp=add_amp(net, node_name='r%d' % (i + 1), type='preamp', gain_dB=17.6),
+                        boost=add_amp(net, node_name='r%d' % (i + 1), type='boost', gain_dB=17.0))
+          for i in range(num_roadms)]
+for c in channel_indexes:
+    net.add_link(lt_1, roadms[0], src_out_port=c, dst_in_port=1000 + c, spans=[Span(0 * m)])
+    net.add_link(roadms[-1], lt_2, src_out_port=2000 + c, dst_in_port=c, spans=[Span(0 * m)])
+for r1, r2 in zip(roadms, roadms[1:]):
+    build_link(net, r1, r2)
+line_out = {r: r.node_to_port_out[r2][0] for r, r2 in zip(roadms, roadms[1:])}
+line_in = {r: r.node_to_port_in[r1][0] for r1, r in zip(roadms, roadms[1:])}
+
+for c in channel_indexes:
+    lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=c)
+    lt_2.assoc_rx_to_channel(lt_2.id_to_transceivers[c], c, in_port=c)
+    for src_node, roadm in zip([lt_1] + roadms, roadms):
+        in_port = line_in.get(roadm, 1000 + c)
+        out_port = line_out.get(roadm, 2000 + c)
+        roadm.install_switch_rule(in_port, out_port, [c], src_node=src_node, switch=False)
+print("*** Built %d ROADMs with %d channels in %.2f ms" %
+      (num_roadms, num_wavelengths, (time.time() - start) * 1e3))
+
+start = time.time()
+lt_1.turn_on()
+print("*** Full-load turn_on in %.2f ms" % ((time.time() - start) * 1e3))
+received = sum(len(signals) for signals in lt_2.port_to_optical_signal_in.values())
+print("*** %d channels received" % received)
+assert received == num_wavelengths
+
+start = time.time()
+lt_1.turn_off(list(lt_1.tx_to_channel))
+print("*** Teardown in %.2f ms" % ((time.time() - start) * 1e3))
+remaining = sum(len(signals) for roadm in net.roadms
+                for signals in roadm.port_to_optical_signal_out.values())
+remaining += sum(len(link.optical_signals) for link in net.links)
+print("*** %d signals left at ROADM output ports and links" % remaining)
+assert remaining == 0
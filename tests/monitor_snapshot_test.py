@@ -0,0 +1,66 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+
+    It tests Monitor.snapshot(): the aligned per-channel arrays must
+    agree with the per-signal accessors (get_osnr, get_gosnr, ...)
+    for in-line amplifier (output) and line terminal (input) monitors,
+    and Network.monitor_sweep(), which gathers all monitors' snapshots
+    into one table.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+import numpy as np
+
+
+num_wavelengths = 10
+channel_indexes = list(range(1, num_wavelengths + 1))
+
+net = LinearTopology.build(op=0, non=3)
+lt_1, lt_3 = net.name_to_node['lt_1'], net.name_to_node['lt_3']
+r1, r2, r3 = net.roadms
+# configure in reverse order: snapshots are still sorted by channel
+for c in reversed(channel_indexes):
+    lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=c)
+    lt_3.assoc_rx_to_channel(lt_3.id_to_transceivers[c], c, in_port=c)
+    r1.install_switch_rule(4100 + c, 5211, [c], src_node=lt_1, switch=False)
+    r2.install_switch_rule(4111, 5211, [c], src_node=r1, switch=False)
+    r3.install_switch_rule(4111, 5200 + c, [c], src_node=r2, switch=False)
+lt_1.turn_on()
+
+lt_3.monitor.modify_mode('in')
+for monitor in net.name_to_node['r2-r3-amp1'].monitor, lt_3.monitor:
+    table = monitor.snapshot()
+    print("*** %s: %d channels" % (monitor.name, len(table)))
+    assert list(table['channel']) == channel_indexes
+    signals = {s.index: s for s in monitor.get_optical_signals()}
+    for row in table:
+        signal = signals[row['channel']]
+        assert row['frequency'] == signal.frequency
+        assert row['power'] == monitor.get_power(signal)
+        assert row['ase_noise'] == monitor.get_ase_noise(signal)
+        assert row['nli_noise'] == monitor.get_nli_noise(signal)
+        assert np.isclose(row['osnr'], monitor.get_osnr(signal))
+        assert np.isclose(row['gosnr'], monitor.get_gosnr(signal))
+    assert [s.index for s, _gosnr in monitor.get_list_gosnr()] == channel_indexes
+    osnr = {s.index: value for s, value in monitor.get_dict_osnr().items()}
+    assert osnr == dict(zip(table['channel'].tolist(), table['osnr']))
+
+# a single port, and a port without signals
+assert list(lt_3.monitor.snapshot(port=3)['channel']) == [3]
+assert len(lt_3.monitor.snapshot(port=num_wavelengths + 1)) == 0
+print("*** gOSNR at lt_3:", np.round(lt_3.monitor.snapshot()['gosnr'], 2))
+
+table = net.monitor_sweep()
+monitors = net.monitors()
+print("*** Sweep: %d rows from %d monitors" % (len(table), len(monitors)))
+assert len(table) == sum(len(monitor.snapshot()) for monitor in monitors)
+rows = table[table['monitor'] == 'lt_3-monitor']
+assert set(rows['component']) == {'lt_3'}
+for field in lt_3.monitor.snapshot_dtype.names:
+    assert np.array_equal(rows[field], lt_3.monitor.snapshot()[field]), field
+# e.g., channel 1 everywhere: its OSNR is lowest at the receiver
+first = table[table['channel'] == 1]
+assert first['osnr'].min() == rows['osnr'][0]
+print("*** Monitor snapshot tests passed")
@@ -0,0 +1,83 @@
+"""
+    This script models two independent linear sub-networks
+    in the same Network object:
+        lt1 ---> r1 ---> r2 ----> lt2
+        lt3 ---> r3 ---> r4 ----> lt4
+
+    It tests Network.connected_components() and Network.propagate():
+    both sub-networks are propagated in separate worker processes
+    and the merged result must be identical to a serial turn_on().
+"""
+
+import mnoptical.network as network
+from mnoptical.node import Transceiver
+from mnoptical.topo.linear import Span, add_amp, build_link, m
+from mnoptical.parallel import receiver_table
+import numpy as np
+
+
+num_wavelengths = 10
+channel_indexes = list(range(1, num_wavelengths + 1))
+
+
+def build(op=0):
+    "Build two disjoint lt -> roadm -> roadm -> lt chains"
+    net = network.Network()
+    for i in range(1, 5):
+        transceivers = [Transceiver(c, 'tr%d' % c, operation_power=op)
+                        for c in channel_indexes]
+        lt = net.add_lt('lt_%d' % i, transceivers=transceivers)
+        roadm = net.add_roadm('r%d' % i, insertion_loss_dB=17,
+                              reference_power_dBm=op,
+                              preamp=add_amp(net, node_name='r%d' % i, type='preamp', gain_dB=17.6),
+                              boost=add_amp(net, node_name='r%d' % i, type='boost', gain_dB=17.0))
+        for c in channel_indexes:
+            net.add_link(lt, roadm, src_out_port=c, dst_in_port=4100 + c, spans=[Span(0 * m)])
+            net.add_link(roadm, lt, src_out_port=5200 + c, dst_in_port=c, spans=[Span(0 * m)])
+    r1, r2, r3, r4 = net.roadms
+    build_link(net, r1, r2)
+    build_link(net, r3, r4)
+
+    for src, dst in ((1, 2), (3, 4)):
+        lt_src = net.name_to_node['lt_%d' % src]
+        lt_dst = net.name_to_node['lt_%d' % dst]
+        r_src, r_dst = net.roadms[src - 1], net.roadms[dst - 1]
+        for c in channel_indexes:
+            lt_src.assoc_tx_to_channel(lt_src.id_to_transceivers[c], c, out_port=c)
+            lt_dst.assoc_rx_to_channel(lt_dst.id_to_transceivers[c], c, in_port=c)
+            r_src.install_switch_rule(4100 + c, 5211, [c], src_node=lt_src)
+            r_dst.install_switch_rule(4111, 5200 + c, [c], src_node=r_src)
+    return net
+
+
+serial = build()
+components = serial.connected_components()
+print("*** Connected components:", [[node.name for node in nodes] for nodes in components])
+assert len(components) == 2
+assert {node.name for node in components[0]} == {'lt_1', 'lt_2', 'r1', 'r2'}
+
+for lt in serial.line_terminals:
+    if lt.tx_to_channel:
+        lt.turn_on()
+expected = receiver_table(serial)
+assert len(expected) == 2 * num_wavelengths
+
+print("*** Propagating 2 sub-networks in 2 worker processes")
+net = build()
+net.propagate(processes=2)
+result = receiver_table(net)
+assert np.array_equal(result, expected), "parallel and serial propagation differ"
+
+# The merged state is live: monitors and further reconfiguration work
+monitor = net.name_to_node['r1-r2-amp1'].monitor
+assert len(monitor.get_optical_signals()) == num_wavelengths
+net.name_to_node['r1-r2-amp1'].set_gain(14)
+degraded = receiver_table(net)
+assert degraded['gosnr'][:num_wavelengths].mean() < expected['gosnr'][:num_wavelengths].mean()
+assert np.array_equal(degraded[num_wavelengths:], expected[num_wavelengths:])
+
+print("*** Propagating in-process")
+net = build()
+net.propagate(processes=0)
+assert np.array_equal(receiver_table(net), expected)
+print("*** Parallel propagation tests passed")
@@ -0,0 +1,72 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+                         |
+                         +-------------> lt2
+
+    It checks that the r2 preamp is processed once per switch event
+    over its full input spectrum: its gain and the state of the
+    signals it amplifies do not depend on whether r2 forwards all
+    channels to r3 or drops half of them at lt2. With traffic from
+    both r1 and r3, switching one degree leaves the preamp state of
+    the other degree's signals alone.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+
+
+num_wavelengths = 10
+channel_indexes = list(range(1, num_wavelengths + 1))
+
+
+def run(drop_channels):
+    "Propagate all channels, dropping drop_channels at lt2"
+    net = LinearTopology.build(op=0, non=3)
+    lt_1, lt_2, lt_3 = net.line_terminals
+    r1, r2, r3 = net.roadms
+    for c in channel_indexes:
+        lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=c)
+        r1.install_switch_rule(4100 + c, 5211, [c], src_node=lt_1)
+        if c in drop_channels:
+            lt_2.assoc_rx_to_channel(lt_2.id_to_transceivers[c], c, in_port=c)
+            r2.install_switch_rule(4111, 5200 + c, [c], src_node=r1)
+        else:
+            lt_3.assoc_rx_to_channel(lt_3.id_to_transceivers[c], c, in_port=c)
+            r2.install_switch_rule(4111, 5211, [c], src_node=r1)
+            r3.install_switch_rule(4111, 5200 + c, [c], src_node=r2)
+    lt_1.turn_on()
+    preamp_out = {s.index: s.loc_out_to_state[r2.preamp]['power']
+                  for s in r2.port_to_optical_signal_in[4111]}
+    return r2.preamp.system_gain, preamp_out
+
+
+express_gain, express_out = run(drop_channels=[])
+drop_gain, drop_out = run(drop_channels=[6, 7, 8, 9, 10])
+print("*** r2 preamp system gain: express %.6f dB, add/drop %.6f dB" %
+      (express_gain, drop_gain))
+assert express_gain == drop_gain
+assert express_out == drop_out
+
+# r2 receives lt1 -> r1 channels 1-5 and lt3 -> r3 channels 6-10
+net = LinearTopology.build(op=0, non=3, bidirectional=True)
+lt_1, lt_2, lt_3 = net.line_terminals
+r1, r2, r3 = net.roadms
+degrees = {r1: (lt_1, channel_indexes[:5]), r3: (lt_3, channel_indexes[5:])}
+for roadm, (lt, channels) in degrees.items():
+    out_port = net.find_link_and_out_port_from_nodes(roadm, r2)
+    in_port = net.find_link_and_in_port_from_nodes(roadm, r2)
+    for c in channels:
+        lt.assoc_tx_to_channel(lt.id_to_transceivers[c], c, out_port=c)
+        lt_2.assoc_rx_to_channel(lt_2.id_to_transceivers[c], c, in_port=c)
+        roadm.install_switch_rule(4100 + c, out_port, [c], src_node=lt)
+        r2.install_switch_rule(in_port, 5200 + c, [c], src_node=roadm)
+lt_1.turn_on()
+from_r1 = net.find_link_and_in_port_from_nodes(r1, r2)
+states = {s: s.loc_out_to_state[r2.preamp] for s in r2.port_to_optical_signal_in[from_r1]}
+lt_3.turn_on()
+# channels 1-5 are not re-routed to lt2 by the lt3 event
+assert len(r2.preamp.port_to_optical_signal_out[0]) == num_wavelengths
+for optical_signal, state in states.items():
+    assert optical_signal.loc_out_to_state[r2.preamp] is state
+print("*** Preamp tests passed")
@@ -0,0 +1,94 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+
+    It tests LineTerminal.provision(): configuring and launching all
+    transceivers of a terminal at once gives the same signals as
+    configuring them one at a time, in a single propagation event.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+import numpy as np
+
+
+num_wavelengths = 10
+channel_indexes = list(range(1, num_wavelengths + 1))
+powers = [0 if c % 3 else -2 for c in channel_indexes]
+formats = ['QPSK' if c % 2 else '16QAM' for c in channel_indexes]
+
+
+def build():
+    net = LinearTopology.build(op=0, non=3)
+    r1, r2, r3 = net.roadms
+    lt_1 = net.name_to_node['lt_1']
+    for c in channel_indexes:
+        r1.install_switch_rule(4100 + c, 5211, [c], src_node=lt_1, switch=False)
+        r2.install_switch_rule(4111, 5211, [c], src_node=r1, switch=False)
+        r3.install_switch_rule(4111, 5200 + c, [c], src_node=r2, switch=False)
+    net.name_to_node['lt_3'].monitor.modify_mode('in')
+    return net
+
+
+# one call at a time
+reference = build()
+lt_1, lt_3 = reference.name_to_node['lt_1'], reference.name_to_node['lt_3']
+for c, power, mf in zip(channel_indexes, powers, formats):
+    lt_1.tx_config(lt_1.id_to_transceivers[c], power)
+    lt_1.set_modulation_format(lt_1.id_to_transceivers[c], mf)
+    lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=c)
+    lt_3.set_modulation_format(lt_3.id_to_transceivers[c], mf)
+    lt_3.assoc_rx_to_channel(lt_3.id_to_transceivers[c], c, in_port=c)
+lt_1.turn_on()
+expected = lt_3.monitor.snapshot()
+
+# bulk provisioning, from arrays
+net = build()
+lt_1, lt_3 = net.name_to_node['lt_1'], net.name_to_node['lt_3']
+events = []
+net.add_listener(lambda net, origin: events.append(origin))
+lt_3.provision(channel_indexes, channel_indexes, in_ports=channel_indexes,
+               modulation_formats=formats)
+signals = lt_1.provision(np.array(channel_indexes), np.array(channel_indexes),
+                         out_ports=np.array(channel_indexes), powers_dBm=powers,
+                         modulation_formats=formats)
+assert events == [lt_3, lt_1]
+assert [s.index for s in signals] == channel_indexes
+assert [s.modulation_format for s in signals] == formats
+snapshot = lt_3.monitor.snapshot()
+print("*** gOSNR at lt_3:", np.round(snapshot['gosnr'], 2))
+for field in ('channel', 'power', 'ase_noise', 'nli_noise', 'gosnr'):
+    assert np.allclose(snapshot[field], expected[field]), field
+table = lt_3.qot()
+assert list(table['channel']) == channel_indexes and table['success'].all()
+
+# provisioning again keeps the signals of unchanged channels
+assert lt_1.provision([1, 2], [1, 2], out_ports=[1, 2], powers_dBm=-1) == signals[:2]
+assert len(events) == 3 and lt_1.optical_signals_out == num_wavelengths
+assert np.isclose(signals[0].loc_out_to_state[lt_1]['power'], 10 ** (-1 / 10) * 1e-3)
+
+# moving a transmitting transceiver to a free output port moves its signal
+lt_1.disassoc_tx_to_channel(10)
+moved = lt_1.provision([9], [9], out_ports=[10])[0]
+assert moved is not signals[8] and lt_1.tx_to_channel[10]['optical_signal'] is moved
+assert 9 not in lt_1.tx_to_channel and lt_1.optical_signals_out == num_wavelengths - 1
+assert moved in lt_1.port_to_optical_signal_out[10] and not lt_1.port_to_optical_signal_out[9]
+
+# two transceivers swap their output ports in one call
+t1, t2 = lt_1.id_to_transceivers[1], lt_1.id_to_transceivers[2]
+swapped = lt_1.provision([t1, t2], [1, 2], out_ports=[2, 1])
+assert [lt_1.tx_to_channel[port]['transceiver'] for port in (2, 1)] == [t1, t2]
+assert [lt_1.tx_to_channel[port]['optical_signal'] for port in (2, 1)] == swapped
+assert lt_1.port_to_optical_signal_out[2] == {swapped[0]}
+assert lt_1.optical_signals_out == num_wavelengths - 1
+lt_1.provision([t1, t2], [1, 2], out_ports=[1, 2])
+
+# ports held by other transceivers are rejected
+for args in ([[1, 2], [1, 2], [1, 1]], [[1, 2], [1, 2], [1, 2000]], [[1], [1, 2], [1]],
+             [[3], [3], [4]], [[1, 2], [1, 2], [2, None]]):
+    try:
+        lt_1.provision(*args)
+        assert False, "invalid provisioning accepted"
+    except ValueError as e:
+        print("*** Rejected:", e)
+print("*** Provision tests passed")
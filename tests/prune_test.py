@@ -0,0 +1,61 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+                         |
+                         +-----> lt2
+
+    It tests that signal states are pruned at the locations a signal
+    no longer traverses: after deleting a switch rule at r1, after
+    rerouting a channel at r2 to lt2 and after a full teardown.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+
+
+num_wavelengths = 10
+channel_indexes = list(range(1, num_wavelengths + 1))
+
+net = LinearTopology.build(op=0, non=3)
+lt_1, lt_2, lt_3 = (net.name_to_node['lt_%d' % i] for i in (1, 2, 3))
+r1, r2, r3 = net.roadms
+for c in channel_indexes:
+    lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=c)
+    lt_3.assoc_rx_to_channel(lt_3.id_to_transceivers[c], c, in_port=c)
+    r1.install_switch_rule(4100 + c, 5211, [c], src_node=lt_1)
+    r2.install_switch_rule(4111, 5211, [c], src_node=r1)
+    r3.install_switch_rule(4111, 5200 + c, [c], src_node=r2)
+lt_2.assoc_rx_to_channel(lt_2.id_to_transceivers[2], 2, in_port=2)
+lt_1.turn_on()
+signals = {s.index: s for s in (t.optical_signal for t in lt_1.transceivers)}
+
+
+def locations(signal):
+    "All locations holding a state of signal"
+    return set(signal.loc_in_to_state) | set(signal.loc_out_to_state)
+
+
+full = locations(signals[3])
+print("*** %d locations per lightpath" % len(full))
+assert lt_3 in full
+
+# Blocking channel 1 at r1 leaves its state up to the r1 input only
+r1.delete_switch_rule(4101, 1, switch=True)
+add_link = lt_1.port_to_link_out[1]
+assert locations(signals[1]) == {lt_1, add_link, add_link.spans[0].span, r1}
+
+# Dropping channel 2 at r2 prunes the r2 -> r3 -> lt3 segment
+r2.update_switch_rule(4111, 2, 5202, switch=True)
+rerouted = locations(signals[2])
+assert lt_2 in rerouted and r3 not in rerouted and lt_3 not in rerouted
+assert r2.port_to_link_out[5211] not in rerouted
+assert lt_2.port_to_optical_signal_in[2] == [signals[2]]
+
+# Other lightpaths are unaffected
+assert locations(signals[3]) == full
+
+lt_1.turn_off(list(lt_1.tx_to_channel))
+remaining = sum(len(locations(s)) for s in signals.values())
+print("*** %d signal states left after teardown" % remaining)
+assert remaining == 0
+print("*** Pruning tests passed")
@@ -0,0 +1,71 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+
+    It tests the vectorized QoT stage: LineTerminal.qot() and
+    Monitor.qot() compute BER, margin and pass/fail for all channels
+    with per-channel modulation formats, matching the scalar
+    BER formulas and the receiver decisions.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+from mnoptical.terminal_params import ber_params, rx_thresholds
+from mnoptical import terminal_params
+from scipy.special import erfc
+from math import sqrt
+import numpy as np
+
+
+num_wavelengths = 10
+channel_indexes = list(range(1, num_wavelengths + 1))
+
+net = LinearTopology.build(op=0, non=3)
+lt_1, lt_3 = net.name_to_node['lt_1'], net.name_to_node['lt_3']
+r1, r2, r3 = net.roadms
+# even channels use QPSK
+for c in channel_indexes[1::2]:
+    lt_1.set_modulation_format(lt_1.id_to_transceivers[c], 'QPSK')
+    lt_3.set_modulation_format(lt_3.id_to_transceivers[c], 'QPSK')
+for c in channel_indexes:
+    lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=c)
+    lt_3.assoc_rx_to_channel(lt_3.id_to_transceivers[c], c, in_port=c)
+    r1.install_switch_rule(4100 + c, 5211, [c], src_node=lt_1, switch=False)
+    r2.install_switch_rule(4111, 5211, [c], src_node=r1, switch=False)
+    r3.install_switch_rule(4111, 5200 + c, [c], src_node=r2, switch=False)
+lt_1.turn_on()
+
+table = lt_3.qot()
+print("*** Margins at lt_3:", np.round(table['margin'], 2))
+assert list(table['channel']) == channel_indexes
+assert list(table['port']) == channel_indexes
+lt_3.monitor.modify_mode('in')
+snapshot = lt_3.monitor.snapshot()
+assert np.allclose(table['gosnr'], snapshot['gosnr'])
+for row in table:
+    mf = '16QAM' if row['channel'] % 2 else 'QPSK'
+    a, b = ber_params[mf]
+    assert np.isclose(row['ber'], a * erfc(sqrt(b * 10 ** (row['gosnr'] / 10))))
+    assert np.isclose(row['margin'], row['gosnr'] - rx_thresholds[mf])
+    assert row['success'] == (row['gosnr'] >= rx_thresholds[mf])
+# with similar gOSNR, QPSK is far more robust than 16QAM
+assert (table['ber'][1::2] < table['ber'][::2]).all()
+
+# Monitor: the signals' own formats, or one format for all channels
+monitor = net.name_to_node['r2-r3-amp1'].monitor
+qot = monitor.qot()
+assert np.array_equal(qot['channel'], channel_indexes)
+qot_16qam = monitor.qot('16QAM')
+assert np.array_equal(qot['ber'][::2], qot_16qam['ber'][::2])
+assert (qot['ber'][1::2] < qot_16qam['ber'][1::2]).all()
+ber = monitor.ber_table('QPSK')
+assert [s.index for s, _ber in ber] == channel_indexes
+a, b = ber_params['QPSK']
+assert np.allclose([value for _s, value in ber],
+                   a * erfc(np.sqrt(b * 10 ** (qot['gosnr'] / 10))))
+assert monitor.get_ber('qpsk') == ber
+assert [value for _s, value in monitor.get_ber()] == list(qot['ber'])
+# the QPSK threshold has the BER of 16QAM at its threshold
+equal = terminal_params.qot([rx_thresholds['QPSK'], rx_thresholds['16QAM']], ['QPSK', '16QAM'])
+assert np.isclose(equal['ber'][0], equal['ber'][1])
+print("*** QoT tests passed")
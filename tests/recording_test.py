@@ -0,0 +1,59 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+
+    It tests Network.set_recording(): with the 'monitored' and
+    'endpoints' policies, fewer signal states are kept but receivers,
+    ROADM monitors and amplifier gain changes give the same results
+    as with the default 'full' policy.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+from mnoptical.parallel import receiver_table
+import numpy as np
+
+
+num_wavelengths = 10
+ports = channel_indexes = list(range(1, num_wavelengths + 1))
+
+
+def run(policy):
+    "Propagate all channels, then change an in-line amplifier gain"
+    net = LinearTopology.build(op=0, non=3)
+    lt_1 = net.name_to_node['lt_1']
+    lt_3 = net.name_to_node['lt_3']
+    r1, r2, r3 = net.roadms
+    net.set_recording(policy)
+    for c, p in zip(channel_indexes, ports):
+        lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=p)
+        lt_3.assoc_rx_to_channel(lt_3.id_to_transceivers[c], c, in_port=p)
+        r1.install_switch_rule(4100 + p, 5211, [c], src_node=lt_1)
+        r2.install_switch_rule(4111, 5211, [c], src_node=r1)
+        r3.install_switch_rule(4111, 5200 + p, [c], src_node=r2)
+    lt_1.turn_on()
+    signals = [transceiver.optical_signal for transceiver in lt_1.transceivers]
+    states = sum(len(s.loc_in_to_state) + len(s.loc_out_to_state) for s in signals)
+    first = receiver_table(net)
+    net.name_to_node['r1-r2-amp1'].set_gain(15)
+    second = receiver_table(net)
+    return net, states, first, second
+
+
+full, full_states, full_first, full_second = run('full')
+for policy in 'monitored', 'endpoints':
+    net, states, first, second = run(policy)
+    print("*** %s: %d signal states (full: %d)" % (policy, states, full_states))
+    assert states < full_states
+    assert np.array_equal(first, full_first)
+    assert np.allclose(second['gosnr'], full_second['gosnr'], rtol=1e-9)
+    amp_monitor = net.name_to_node['r1-r2-amp1'].monitor
+    if policy == 'monitored':
+        assert len(amp_monitor.get_optical_signals()) == num_wavelengths
+    else:
+        assert amp_monitor.get_optical_signals() == []
+
+# Switching policy after propagation drops the states no longer kept
+full.set_recording('endpoints')
+assert full.name_to_node['r1-r2-amp1'].monitor.get_optical_signals() == []
+print("*** Recording tests passed")
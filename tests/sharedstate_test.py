@@ -0,0 +1,68 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+
+    It tests MonitorStatePublisher and MonitorStateReader: monitor
+    metrics are published into shared memory after each propagation
+    event and read back consistently by another process.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+from mnoptical.sharedstate import (MonitorStatePublisher, MonitorStateReader,
+                                   GOSNR, POWER)
+from multiprocessing import get_context
+import numpy as np
+
+
+num_wavelengths = 10
+channel_indexes = list(range(1, num_wavelengths + 1))
+monitor_name = 'r2-r3-amp1-monitor'
+
+
+def read(name, queue):
+    "Reader process: send a snapshot of the published state"
+    with MonitorStateReader(name) as reader:
+        epoch, data = reader.snapshot()
+        queue.put((epoch, reader.monitors, data))
+
+
+def remote_snapshot(name):
+    "Take a snapshot in a separate process"
+    ctx = get_context()
+    queue = ctx.Queue()
+    process = ctx.Process(target=read, args=(name, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+net = LinearTopology.build(op=0, non=3)
+lt_1, lt_3 = net.name_to_node['lt_1'], net.name_to_node['lt_3']
+r1, r2, r3 = net.roadms
+for c in channel_indexes:
+    lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=c)
+    lt_3.assoc_rx_to_channel(lt_3.id_to_transceivers[c], c, in_port=c)
+    r1.install_switch_rule(4100 + c, 5211, [c], src_node=lt_1, switch=False)
+    r2.install_switch_rule(4111, 5211, [c], src_node=r1, switch=False)
+    r3.install_switch_rule(4111, 5200 + c, [c], src_node=r2, switch=False)
+
+with MonitorStatePublisher(net) as publisher:
+    lt_1.turn_on()
+    epoch, monitors, data = remote_snapshot(publisher.name)
+    print("*** Epoch %d: %d monitors published" % (epoch, len(monitors)))
+    assert epoch == net.epoch
+    row = data[monitors.index(monitor_name)]
+    monitor = net.name_to_node['r2-r3-amp1'].monitor
+    for signal, gosnr in monitor.get_dict_gosnr().items():
+        assert np.isclose(row[GOSNR, signal.index - 1], gosnr)
+    assert np.isnan(row[POWER, num_wavelengths:]).all()
+
+    net.name_to_node['r1-r2-amp1'].set_gain(15)
+    epoch2, _monitors, data2 = remote_snapshot(publisher.name)
+    assert epoch2 == epoch + 1
+    row2 = data2[monitors.index(monitor_name)]
+    assert (row2[GOSNR, :num_wavelengths] < row[GOSNR, :num_wavelengths]).all()
+    print("*** gOSNR after gain change:", np.round(row2[GOSNR, :num_wavelengths], 2))
+print("*** Shared state tests passed")
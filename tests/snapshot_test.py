@@ -0,0 +1,111 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+
+    It tests Network.snapshot() and Network.restore():
+    a what-if reconfiguration (gain change, rule deletion) is
+    discarded and the monitored signal state must be identical to
+    the state before the reconfiguration. The snapshot is also
+    restored into a pickled copy of the network.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+import pickle
+import copy
+import time
+
+
+def monitored_state(net):
+    "Return {(monitor, channel): (power, osnr, gosnr)} for all monitors"
+    state = {}
+    for node in net.name_to_node.values():
+        monitor = getattr(node, 'monitor', None)
+        if not monitor:
+            continue
+        for signal in monitor.get_optical_signals():
+            state[monitor.name, signal.index] = (
+                monitor.get_power(signal), monitor.get_osnr(signal),
+                monitor.get_gosnr(signal))
+    return state
+
+
+net = LinearTopology.build(op=0, non=3)
+lt_1 = net.name_to_node['lt_1']
+lt_3 = net.name_to_node['lt_3']
+r1, r2, r3 = net.roadms
+
+num_wavelengths = 10
+ports = channel_indexes = list(range(1, num_wavelengths + 1))
+
+for c, p in zip(channel_indexes, ports):
+    lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=p)
+    lt_3.assoc_rx_to_channel(lt_3.id_to_transceivers[c], c, in_port=p)
+
+for c, p in zip(channel_indexes, ports):
+    r1.install_switch_rule(4100 + p, 5211, [c], src_node=lt_1)
+    r2.install_switch_rule(4111, 5211, [c], src_node=r1)
+    r3.install_switch_rule(4111, 5200 + p, [c], src_node=r2)
+
+lt_1.turn_on()
+before = monitored_state(net)
+assert before, "no monitored signals"
+
+start = time.time()
+snapshot = net.snapshot()
+print("*** Snapshot: %d signal states, %d bytes in %.2f ms" %
+      (len(snapshot), snapshot.nbytes(), (time.time() - start) * 1e3))
+
+# Pickled copy of the network taken before the what-if changes
+net_copy = pickle.loads(pickle.dumps(net))
+
+print("*** What-if: change r1-r2-amp1 gain and drop channel 1 at r2")
+net.name_to_node['r1-r2-amp1'].set_gain(10)
+r2.delete_switch_rule(4111, 1, switch=True)
+assert monitored_state(net) != before
+
+start = time.time()
+net.restore(snapshot)
+print("*** Restore in %.2f ms" % ((time.time() - start) * 1e3))
+assert monitored_state(net) == before, "restore did not recover state"
+
+start = time.time()
+copy.deepcopy(net)
+print("*** (deepcopy takes %.2f ms)" % ((time.time() - start) * 1e3))
+
+print("*** Re-propagating from restored state")
+lt_1.turn_on(safe_switch=True)
+after = monitored_state(net)
+for key, value in before.items():
+    for x, y in zip(value, after[key]):
+        assert x == y or abs(x - y) <= 1e-9 * abs(x), "%s: %s != %s" % (key, value, after[key])
+
+print("*** Restoring into a pickled copy of the network")
+net_copy.name_to_node['r1-r2-amp1'].set_gain(10)
+net_copy.restore(pickle.loads(pickle.dumps(snapshot)))
+assert monitored_state(net_copy) == before
+
+print("*** what_if() context")
+with net.what_if():
+    r1.delete_switch_rules()
+    lt_1.turn_on(safe_switch=True)
+assert monitored_state(net) == after
+
+print("*** ROADM input indexes after signal removal and restore")
+
+
+def input_indexes(roadm):
+    return (dict(roadm.optical_signal_to_port_in),
+            {port: dict(power) for port, power in roadm.port_to_optical_signal_power_in.items()})
+
+
+indexes = input_indexes(r2)
+snapshot = net.snapshot()
+r1.delete_switch_rules()
+lt_1.turn_on(safe_switch=True)
+signal_to_port, power_in = input_indexes(r2)
+assert not signal_to_port and not any(power_in.values())
+net.restore(snapshot)
+assert input_indexes(r2) == indexes
+
+print("*** Snapshot tests passed")
@@ -0,0 +1,95 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+
+    It tests Network.subscribe(): changes of the output power seen by
+    an in-line amplifier monitor are pushed after each propagation
+    event, only for the subscribed channels and beyond the threshold.
+    Events are reported for ROADM amplifiers not registered by name
+    and, per thread, while another thread is inside an event.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+from mnoptical.node import PropagationEvents
+import numpy as np
+import threading
+
+
+num_wavelengths = 10
+channel_indexes = list(range(1, num_wavelengths + 1))
+
+net = LinearTopology.build(op=0, non=3)
+lt_1, lt_3 = net.name_to_node['lt_1'], net.name_to_node['lt_3']
+r1, r2, r3 = net.roadms
+for c in channel_indexes:
+    lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=c)
+    lt_3.assoc_rx_to_channel(lt_3.id_to_transceivers[c], c, in_port=c)
+    r1.install_switch_rule(4100 + c, 5211, [c], src_node=lt_1, switch=False)
+    r2.install_switch_rule(4111, 5211, [c], src_node=r1, switch=False)
+    r3.install_switch_rule(4111, 5200 + c, [c], src_node=r2, switch=False)
+
+deliveries = []
+# report power changes beyond 0.1 mW
+subscription = net.subscribe(deliveries.append, monitors=['r1-r2-amp1-monitor'],
+                             channels=[1, 2, 3], metrics=['power'], threshold=1e-4)
+
+# channels appear
+lt_1.turn_on()
+assert len(deliveries) == 1
+assert [(c.channel, c.metric) for c in deliveries[-1]] == [(1, 'power'), (2, 'power'), (3, 'power')]
+assert all(np.isnan(c.old) for c in deliveries[-1])
+print("*** Initial (mW):", [(c.channel, round(c.new * 1e3, 3)) for c in deliveries[-1]])
+
+# a change below the threshold is not delivered
+amp = net.name_to_node['r1-r2-amp1']
+amp.set_gain(amp.target_gain - 0.1)
+assert len(deliveries) == 1
+
+# a larger one is, with the last delivered value as reference
+amp.set_gain(amp.target_gain - 2)
+assert len(deliveries) == 2 and len(deliveries[-1]) == 3
+for change in deliveries[-1]:
+    assert change.new < change.old - 1e-4
+print("*** After gain change (mW):", [(c.channel, round(c.old * 1e3, 3), round(c.new * 1e3, 3))
+                                      for c in deliveries[-1]])
+
+# blocking channel 1 at r1: it disappears
+r1.delete_switch_rule(4101, 1, switch=True)
+assert [c.channel for c in deliveries[-1]] == [1] and np.isnan(deliveries[-1][0].new)
+
+# configuration not affecting the subscribed values: nothing delivered
+r1.delete_switch_rule(4105, 5, switch=True)
+assert len(deliveries) == 3
+
+net.unsubscribe(subscription)
+lt_1.turn_off([2])
+assert len(deliveries) == 3
+
+events = []
+net.add_listener(lambda net, origin: events.append(origin))
+# a ROADM preamp created outside the network (as in cosmostutorial.py)
+preamp = r2.preamp
+del net.name_to_node[preamp.name]
+net.amplifiers.remove(preamp)
+preamp.set_gain(preamp.target_gain)
+assert events == [preamp]
+
+
+# an event in progress in another thread
+@PropagationEvents.entry_point
+def hold(net, started, release):
+    started.set()
+    release.wait()
+
+
+started, release = threading.Event(), threading.Event()
+thread = threading.Thread(target=hold, args=(net, started, release))
+thread.start()
+started.wait()
+amp.set_gain(amp.target_gain)
+assert events == [preamp, amp]
+release.set()
+thread.join()
+assert events == [preamp, amp, net]
+print("*** Subscription tests passed")
@@ -0,0 +1,64 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+
+    It tests MonitorTimeSeries: an amplifier gain is ramped down over
+    more propagation events than the ring buffers hold; only the last
+    samples are kept, and they can be queried and downsampled.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+from mnoptical.timeseries import MonitorTimeSeries
+import numpy as np
+
+
+num_wavelengths = 10
+channel_indexes = list(range(1, num_wavelengths + 1))
+samples = 8
+
+net = LinearTopology.build(op=0, non=3)
+lt_1, lt_3 = net.name_to_node['lt_1'], net.name_to_node['lt_3']
+r1, r2, r3 = net.roadms
+for c in channel_indexes:
+    lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=c)
+    lt_3.assoc_rx_to_channel(lt_3.id_to_transceivers[c], c, in_port=c)
+    r1.install_switch_rule(4100 + c, 5211, [c], src_node=lt_1, switch=False)
+    r2.install_switch_rule(4111, 5211, [c], src_node=r1, switch=False)
+    r3.install_switch_rule(4111, 5200 + c, [c], src_node=r2, switch=False)
+
+series = MonitorTimeSeries(net, monitors=['r1-r2-amp1-monitor', 'r2-r3-amp1-monitor'],
+                           metrics=['power', 'gosnr'], channels=num_wavelengths,
+                           samples=samples)
+footprint = series.values.nbytes
+lt_1.turn_on()
+amp = net.name_to_node['r1-r2-amp1']
+gains = [17.5 - 0.5 * i for i in range(12)]
+for gain in gains:
+    amp.set_gain(gain)
+assert series.count == len(gains) + 1 and len(series) == samples
+assert series.values.nbytes == footprint
+
+epochs, power = series.series('r1-r2-amp1-monitor', 5, 'power')
+print("*** Last %d epochs:" % len(epochs), epochs.tolist())
+assert list(epochs) == list(range(net.epoch - samples + 1, net.epoch + 1))
+# the amplifier output power follows the gain ramp
+assert (np.diff(power) < 0).all()
+
+last_epochs, last_power = series.series('r1-r2-amp1-monitor', 5, 'power', last=3)
+assert np.array_equal(last_power, power[-3:])
+
+starts, low = series.downsample('r1-r2-amp1-monitor', 5, 'power', bins=3, how='min')
+starts, high = series.downsample('r1-r2-amp1-monitor', 5, 'power', bins=3, how='max')
+starts, mean = series.downsample('r1-r2-amp1-monitor', 5, 'power', bins=3, how='mean')
+assert list(starts) == list(epochs[[0, 3, 6]])
+assert np.array_equal(low, [power[2], power[5], power[7]])
+assert np.array_equal(high, [power[0], power[3], power[6]])
+assert np.isclose(mean[-1], power[6:].mean())
+
+# blocked channels show up as NaN
+r1.delete_switch_rule(4101, 1, switch=True)
+epochs, gosnr = series.series('r2-r3-amp1-monitor', 1, 'gosnr', last=2)
+assert not np.isnan(gosnr[0]) and np.isnan(gosnr[1])
+series.close()
+print("*** Time series tests passed")
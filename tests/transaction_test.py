@@ -0,0 +1,155 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+
+    It tests Network.batch(): switch rules and gains queued in a
+    transaction are applied as one propagation event, with the same
+    result as configuring the nodes one call at a time; conflicting
+    transactions are rejected, transactions can be rolled back, and a
+    channel can be moved from one rule to another in either order.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+from mnoptical.node import Roadm
+import numpy as np
+
+
+num_wavelengths = 10
+channel_indexes = list(range(1, num_wavelengths + 1))
+
+# count ROADM switch events
+switches = [0]
+switch = Roadm.switch
+
+
+def counting_switch(self, *args, **kwargs):
+    switches[0] += 1
+    return switch(self, *args, **kwargs)
+
+
+Roadm.switch = counting_switch
+
+
+def build():
+    net = LinearTopology.build(op=0, non=3)
+    lt_1, lt_3 = net.name_to_node['lt_1'], net.name_to_node['lt_3']
+    for c in channel_indexes:
+        lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=c)
+        lt_3.assoc_rx_to_channel(lt_3.id_to_transceivers[c], c, in_port=c)
+    lt_3.monitor.modify_mode('in')
+    return net
+
+
+def gosnr(net):
+    snapshot = net.name_to_node['lt_3'].monitor.snapshot()
+    return dict(zip(snapshot['channel'].tolist(), snapshot['gosnr']))
+
+
+# reference: one call at a time, switching after each rule
+reference = build()
+r1, r2, r3 = reference.roadms
+reference.name_to_node['lt_1'].turn_on()
+switches[0] = 0
+for c in channel_indexes:
+    r1.install_switch_rule(4100 + c, 5211, [c], src_node=reference.name_to_node['lt_1'])
+    r2.install_switch_rule(4111, 5211, [c], src_node=r1)
+    r3.install_switch_rule(4111, 5200 + c, [c], src_node=r2)
+print("*** Switch events, one rule at a time:", switches[0])
+sequential = switches[0]
+
+net = build()
+r1, r2, r3 = net.roadms
+net.name_to_node['lt_1'].turn_on()
+events = []
+net.add_listener(lambda net, origin: events.append(origin))
+switches[0] = 0
+with net.batch() as batch:
+    for c in channel_indexes:
+        batch.install_switch_rule(r1, 4100 + c, 5211, [c])
+        batch.install_switch_rule('r2', 4111, 5211, [c])
+        batch.install_switch_rule(r3, 4111, 5200 + c, c)
+    assert len(batch) == 3 * num_wavelengths and not r1.switch_table
+print("*** Switch events, batched:", switches[0])
+assert switches[0] < sequential
+assert events == [net] and batch.state == 'committed'
+expected, result = gosnr(reference), gosnr(net)
+assert sorted(result) == channel_indexes
+for c in channel_indexes:
+    assert np.isclose(result[c], expected[c]), c
+
+# gains and rule deletions, against direct calls
+amp = net.name_to_node['r1-r2-amp1']
+reference.name_to_node['r1-r2-amp1'].set_gain(amp.target_gain - 1)
+reference.roadms[1].delete_switch_rule(4111, 3, switch=True)
+with net.batch() as batch:
+    batch.set_gain('r1-r2-amp1', amp.target_gain - 1)
+    batch.delete_switch_rule(r2, 4111, 3)
+assert len(events) == 2
+expected, result = gosnr(reference), gosnr(net)
+assert sorted(result) == sorted(expected) == [c for c in channel_indexes if c != 3]
+for c in result:
+    assert np.isclose(result[c], expected[c]), c
+
+# conflicts are rejected before anything is applied
+before = gosnr(net)
+for operations in ([(r2, 4112, 5211, [4]), (r2, 4113, 5211, [4])],
+                   [(r2, 4112, 5211, [3]), (r2, 4112, 5212, [3])]):
+    transaction = net.begin()
+    for operation in operations:
+        transaction.install_switch_rule(*operation)
+    try:
+        transaction.commit()
+        assert False, "conflict not detected"
+    except ValueError as e:
+        print("*** Rejected:", e)
+transaction = net.begin()
+transaction.delete_switch_rule(r2, 4111, 3)
+try:
+    transaction.commit()
+    assert False, "missing rule not detected"
+except ValueError as e:
+    print("*** Rejected:", e)
+assert len(events) == 2 and gosnr(net) == before
+
+# a failing block discards the transaction
+try:
+    with net.batch() as batch:
+        batch.set_gain(amp, 10)
+        raise RuntimeError
+except RuntimeError:
+    pass
+assert batch.state == 'rolled back' and amp.target_gain != 10
+
+# rolling back a committed transaction restores the previous state
+transaction = net.begin()
+transaction.set_gain(amp, amp.target_gain - 3)
+transaction.set_reference_power(r2, -2)
+transaction.commit()
+assert gosnr(net) != before
+transaction.rollback()
+after = gosnr(net)
+assert sorted(after) == sorted(before)
+for c in after:
+    assert np.isclose(after[c], before[c]), c
+
+# moving channel 4 from r1 to lt_2's add port at r2: the deletion
+# applies first, so the installation does not preempt it
+lt_2 = net.name_to_node['lt_2']
+lt_2.assoc_tx_to_channel(lt_2.id_to_transceivers[4], 4, out_port=4)
+with net.batch() as batch:
+    batch.install_switch_rule(r2, 4104, 5211, [4])
+    batch.delete_switch_rule(r2, 4111, 4)
+assert r2.switch_table[4104, 4] == 5211 and (4111, 4) not in r2.switch_table
+moved = gosnr(net)
+assert sorted(moved) == sorted(before) and moved[4] > before[4]
+
+# only the line terminals whose signals reach the reconfigured nodes
+# are re-propagated
+transaction = net.begin()
+transaction.set_gain(amp, amp.target_gain)
+assert transaction.sources() == [net.name_to_node['lt_1']]
+transaction.set_reference_power(r2, 0)
+assert transaction.sources() == [net.name_to_node['lt_1'], lt_2]
+transaction.rollback()
+print("*** Transaction tests passed")
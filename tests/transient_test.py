@@ -0,0 +1,104 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+
+    It tests EdfaCascade: the gain dynamics of the amplifiers from r1
+    to r3 after dropping channels, with and without AGC, as seen by
+    their monitors; with AGC the surviving channels settle at the
+    steady state of a propagation.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+from mnoptical.transient import EdfaCascade
+import numpy as np
+import time
+
+
+num_wavelengths = 10
+channel_indexes = list(range(1, num_wavelengths + 1))
+dropped = channel_indexes[:-2]
+
+net = LinearTopology.build(op=0, non=3)
+# fixed span losses, as in the transient model
+for link in net.links:
+    link.srs_model = None
+lt_1, lt_3 = net.name_to_node['lt_1'], net.name_to_node['lt_3']
+r1, r2, r3 = net.roadms
+for c in channel_indexes:
+    r1.install_switch_rule(4100 + c, 5211, [c], src_node=lt_1, switch=False)
+    r2.install_switch_rule(4111, 5211, [c], src_node=r1, switch=False)
+    r3.install_switch_rule(4111, 5200 + c, [c], src_node=r2, switch=False)
+lt_3.provision(channel_indexes, channel_indexes, in_ports=channel_indexes, turn_on=False)
+lt_1.provision(channel_indexes, channel_indexes, out_ports=channel_indexes)
+
+cascade = EdfaCascade.from_path(net, ['r1', 'r2', 'r3'])
+names = [amplifier.name for amplifier in cascade.amplifiers]
+print("*** Cascade:", names)
+assert names == ['r1-boost', 'r1-r2-amp1', 'r2-preamp', 'r2-boost', 'r2-r3-amp1', 'r3-preamp']
+assert list(cascade.channels) == channel_indexes
+monitors = [monitor.name for monitor in cascade.monitors()]
+assert monitors == [name + '-monitor' for name in names]
+
+# the steady state is an equilibrium
+result = cascade.run(1e-3, dt=2e-6)
+assert sorted(result.power_dBm) == sorted(monitors)
+for name in monitors:
+    power = result.power_dBm[name]
+    assert power.shape == (len(result.time), num_wavelengths)
+    assert np.allclose(power, power[0], atol=1e-9), name
+
+# without AGC, the power excursion of the surviving channels
+# accumulates along the cascade
+cascade.agc = False
+start = time.time()
+result = cascade.run(5e-3, events=[(2e-4, 'drop', dropped)], dt=2e-6)
+print("*** %d time steps, %.0f steps per second" % (len(result.time), len(result.time) / (time.time() - start)))
+excursions = [result.power_dBm[name][-1, -1] - result.power_dBm[name][0, -1] for name in monitors]
+print("*** Excursions without AGC (dB):", np.round(excursions, 3))
+assert 0 < excursions[0] and np.all(np.diff(excursions) > 0)
+assert np.isnan(result.power_dBm['r3-preamp-monitor'][-1, :len(dropped)]).all()
+
+# with AGC, the excursion is transient
+cascade.agc = True
+result = cascade.run(2e-2, events=[(2e-4, 'drop', dropped)], dt=2e-6, record_every=100)
+at_r3 = result.power_dBm['r3-preamp-monitor']
+peak = np.nanmax(np.abs(at_r3 - at_r3[0]))
+print("*** Peak excursion with AGC (dB): %.3f" % peak)
+assert peak > 1
+# and settles at the steady state (up to r2, whose VOAs re-level it)
+with net.batch() as batch:
+    for c in dropped:
+        batch.delete_switch_rule(r1, 4100 + c, c)
+for amplifier in cascade.amplifiers[:3]:
+    signals = sorted(amplifier.port_to_optical_signal_out[0], key=lambda s: s.index)
+    assert [s.index for s in signals] == channel_indexes[len(dropped):]
+    power = [10 * np.log10(s.loc_out_to_state[amplifier]['power'] * 1e3) for s in signals]
+    trajectory = result.power_dBm[amplifier.monitor.name]
+    assert np.allclose(power, trajectory[-1, len(dropped):], atol=1e-6)
+
+# adding the channels back restores the initial state
+result = EdfaCascade.from_path(net, ['r1', 'r2']).run(1e-3, dt=2e-6)
+assert list(result.channels) == channel_indexes[len(dropped):]
+result = cascade.run(4e-2, events=[(2e-4, 'drop', dropped), (1e-2, 'add', dropped)],
+                     dt=2e-6, record=['r3-preamp-monitor'], record_every=1000)
+at_r3 = result.power_dBm['r3-preamp-monitor']
+assert np.allclose(at_r3[-1], at_r3[0], atol=1e-3)
+
+# input monitors see the power before the amplifier
+monitor = cascade.amplifiers[1].monitor
+monitor.modify_mode('in')
+result = cascade.run(1e-3, dt=2e-6, record=[monitor])
+power = [10 * np.log10(s.loc_in_to_state[cascade.amplifiers[1]]['power'] * 1e3)
+         for s in sorted(cascade.amplifiers[1].port_to_optical_signal_in[0], key=lambda s: s.index)]
+assert np.allclose(result.power_dBm[monitor.name][0, len(dropped):], power)
+monitor.modify_mode('out')
+
+for args in ([1e-3, [(0, 'drop', [20])]], [1e-3, [(0, 'move', [1])]], [1e-3, (), 1e-3],
+             [1e-3, (), 1e-6, ['lt_3-monitor']]):
+    try:
+        cascade.run(*args)
+        assert False, "invalid run accepted"
+    except ValueError as e:
+        print("*** Rejected:", e)
+print("*** Transient tests passed")
@@ -0,0 +1,60 @@
+"""
+    This script models a linear topology between three line terminals
+    with three ROADMs in between:
+        lt1 ---> r1 ---> r2 ---> r3 ----> lt3
+
+    It evaluates candidate amplifier gains and launch powers with
+    WhatIfEvaluator, in a pool of worker processes and in-process,
+    and checks that both agree and leave the network untouched.
+"""
+
+from mnoptical.topo.linear import LinearTopology
+from mnoptical.parallel import WhatIfEvaluator, receiver_table
+import numpy as np
+
+
+net = LinearTopology.build(op=0, non=3)
+lt_1 = net.name_to_node['lt_1']
+lt_3 = net.name_to_node['lt_3']
+r1, r2, r3 = net.roadms
+
+num_wavelengths = 10
+ports = channel_indexes = list(range(1, num_wavelengths + 1))
+
+for c, p in zip(channel_indexes, ports):
+    lt_1.assoc_tx_to_channel(lt_1.id_to_transceivers[c], c, out_port=p)
+    lt_3.assoc_rx_to_channel(lt_3.id_to_transceivers[c], c, in_port=p)
+
+for c, p in zip(channel_indexes, ports):
+    r1.install_switch_rule(4100 + p, 5211, [c], src_node=lt_1)
+    r2.install_switch_rule(4111, 5211, [c], src_node=r1)
+    r3.install_switch_rule(4111, 5200 + p, [c], src_node=r2)
+
+lt_1.turn_on()
+baseline = receiver_table(net)
+assert len(baseline) == num_wavelengths
+
+candidates = [[('set_gain', 'r1-r2-amp1', gain)] for gain in (14, 16, 17.6, 19)]
+candidates.append([('tx_power', 'lt_1', 1, 3), ('set_gain', 'r2-r3-amp1', 16)])
+candidates.append([('delete_switch_rule', 'r2', 4111, 5)])
+
+print("*** Evaluating %d candidates in 2 worker processes" % len(candidates))
+with WhatIfEvaluator(net, processes=2) as evaluator:
+    pool_results = evaluator.evaluate(candidates)
+
+print("*** Evaluating %d candidates in-process" % len(candidates))
+serial_results = WhatIfEvaluator(net, processes=0).evaluate(candidates)
+
+for candidate, pool, serial in zip(candidates, pool_results, serial_results):
+    print(candidate, 'gOSNR:', np.round(pool['gosnr'], 2))
+    assert np.array_equal(pool, serial), "pool and in-process results differ"
+
+# Dropping channel 5 at r2 removes it from the receiver
+assert 5 not in pool_results[-1]['channel']
+assert len(pool_results[-1]) == num_wavelengths - 1
+# Lower gain on the first in-line amplifier degrades gOSNR
+assert pool_results[0]['gosnr'].mean() < pool_results[2]['gosnr'].mean()
+
+# The network itself is untouched
+assert np.array_equal(receiver_table(net), baseline)
+print("*** What-if tests passed")